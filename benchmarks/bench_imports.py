@@ -0,0 +1,212 @@
+"""Import time benchmark of the command line entry points.
+
+Each command runs in a fresh interpreter, and is measured from interpreter start to exit:
+
+- ``download --help``, ``visualize --help``, ``compare --help``, ``export --help``: argument
+  parsing only
+- ``visualize --list-series``: reading an EPW file, without plotting
+- ``worker``: what a download worker process imports to run a request (spawn start method)
+- ``import era5epw.main``: the Python API. Unlike the console scripts, it imports its processing
+  modules and loads pandas, numpy and tqdm: only the download and plotting dependencies are
+  forbidden
+
+Besides the time, the heavy dependencies loaded by each command are reported, and commands that
+load a dependency they don't need fail the benchmark. Like :mod:`benchmarks.bench_pipeline`,
+results are appended to an untracked history file, ``benchmarks/import_results.jsonl`` by default,
+whose last entry can be the baseline::
+
+    python -m benchmarks.bench_imports
+    python -m benchmarks.bench_imports --baseline benchmarks/import_results.jsonl
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.bench_pipeline import get_environment, load_results
+from tests.sample_epw import write_sample_epw_file
+
+HEAVY_MODULES = ["pandas", "numpy", "xarray", "netCDF4", "cdsapi", "plotly", "tqdm"]
+
+# command name -> (code run in a fresh interpreter, heavy modules it must not load)
+COMMANDS = {
+    "download --help": (
+        "import sys; sys.argv = ['era5epw_download', '--help']\n"
+        "from era5epw.cli import download; download()",
+        HEAVY_MODULES,
+    ),
+    "visualize --help": (
+        "import sys; sys.argv = ['era5epw_visualize', '--help']\n"
+        "from era5epw.cli import visualize_cli; visualize_cli()",
+        HEAVY_MODULES,
+    ),
+    "compare --help": (
+        "import sys; sys.argv = ['era5epw_compare', '--help']\n"
+        "from era5epw.cli import compare_cli; compare_cli()",
+        HEAVY_MODULES,
+    ),
+    "export --help": (
+        "import sys; sys.argv = ['era5epw_export', '--help']\n"
+        "from era5epw.cli import export_cli; export_cli()",
+        HEAVY_MODULES,
+    ),
+    "visualize --list-series": (
+        "import sys; sys.argv = ['era5epw_visualize', '{epw_file}', '--list-series']\n"
+        "from era5epw.cli import visualize_cli; visualize_cli()",
+        ["xarray", "netCDF4", "cdsapi", "plotly"],
+    ),
+    "worker": (
+        "from era5epw.utils import execute_download_request",
+        ["pandas", "numpy", "xarray", "netCDF4", "cdsapi", "plotly"],
+    ),
+    "import era5epw.main": ("import era5epw.main", ["xarray", "netCDF4", "cdsapi", "plotly"]),
+}
+
+# untracked, see .gitignore
+DEFAULT_HISTORY_FILE = os.path.join(os.path.dirname(__file__), "import_results.jsonl")
+
+# prints the heavy modules loaded by the command on exit, including on sys.exit() from argparse
+_REPORT_MODULES = (
+    "import atexit, json, sys\n"
+    "atexit.register(lambda: print(json.dumps([m for m in {modules!r} if m in sys.modules]), "
+    "file=sys.stderr))\n"
+)
+
+
+def run_command(code: str, repeat: int = 5) -> tuple[float, list[str]]:
+    """Run Python code in fresh interpreters.
+
+    :param code: The code to run.
+    :param repeat: Number of runs.
+    :return: Best wall time in seconds, and the heavy modules loaded by the code.
+    """
+    code = _REPORT_MODULES.format(modules=HEAVY_MODULES) + code
+    best = float("inf")
+    loaded = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        process = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=False
+        )
+        best = min(best, time.perf_counter() - start)
+        lines = process.stderr.strip().splitlines()
+        assert lines, f"Command failed: {process.stderr}"
+        loaded = json.loads(lines[-1])
+    return best, loaded
+
+
+def run_benchmark(repeat: int = 5) -> dict[str, any]:
+    """Measure each command.
+
+    :param repeat: Number of runs of each command, the best time is kept.
+    :return: Time and loaded heavy modules per command, and the interpreter startup time.
+    """
+    results = {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "environment": get_environment(),
+        "interpreter": run_command("pass", repeat)[0],
+        "commands": {},
+    }
+    with tempfile.TemporaryDirectory() as tmpdir:
+        epw_file = os.path.join(tmpdir, "sample.epw")
+        write_sample_epw_file(epw_file)
+        for name, (code, forbidden) in COMMANDS.items():
+            seconds, loaded = run_command(code.format(epw_file=epw_file), repeat)
+            results["commands"][name] = {
+                "seconds": seconds,
+                "loaded": loaded,
+                "unexpected": [module for module in loaded if module in forbidden],
+            }
+    return results
+
+
+def compare_results(
+    results: dict[str, any], baseline: dict[str, any], max_regression: float = 0.25
+) -> list[str]:
+    """Compare import times to a baseline.
+
+    :param results: Benchmark results.
+    :param baseline: Baseline benchmark results.
+    :param max_regression: Maximum allowed slowdown of a command, as a fraction of the
+        baseline time.
+    :return: A description of each regression exceeding the threshold.
+    """
+    regressions = []
+    for name, command in results["commands"].items():
+        baseline_seconds = baseline["commands"].get(name, {}).get("seconds")
+        if not baseline_seconds:
+            continue
+        ratio = command["seconds"] / baseline_seconds - 1
+        if ratio > max_regression:
+            regressions.append(
+                f"{name}: {command['seconds']:.3f}s vs {baseline_seconds:.3f}s in baseline "
+                f"(+{ratio:.0%})"
+            )
+    return regressions
+
+
+def print_results(results: dict[str, any]) -> None:
+    print(f"Interpreter startup: {results['interpreter']:.3f}s")
+    print(f"  {'command':<26}{'time (s)':>10}  heavy modules loaded")
+    for name, command in results["commands"].items():
+        print(f"  {name:<26}{command['seconds']:>10.3f}  {', '.join(command['loaded']) or '-'}")
+
+
+def create_args() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark the import time of the CLIs.")
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Runs of each command, the best time is kept."
+    )
+    parser.add_argument(
+        "--history-file",
+        type=str,
+        default=DEFAULT_HISTORY_FILE,
+        help="JSON lines file results are appended to.",
+    )
+    parser.add_argument(
+        "--baseline",
+        type=str,
+        default=None,
+        help="Results to compare to (JSON file, or last entry of a JSON lines history file).",
+    )
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=0.25,
+        help="Maximum allowed slowdown per command compared to the baseline (0.25 = 25%%).",
+    )
+    return parser
+
+
+def main() -> None:
+    args = create_args().parse_args()
+
+    baseline = load_results(args.baseline) if args.baseline else None
+    results = run_benchmark(args.repeat)
+    print_results(results)
+
+    if args.history_file:
+        with open(args.history_file, "a") as f:
+            f.write(json.dumps(results) + "\n")
+
+    failures = [
+        f"{name}: loads {', '.join(command['unexpected'])}"
+        for name, command in results["commands"].items()
+        if command["unexpected"]
+    ]
+    if baseline is not None:
+        failures += compare_results(results, baseline, args.max_regression)
+    if failures:
+        print("\nImport regressions:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,405 @@
+"""Benchmark suite for the EPW generation pipeline, on synthetic fixtures.
+
+Stages measured for each site-year:
+
+- ``decode``: loading the downloaded NetCDF files into DataFrames (ERA5 and CAMS)
+- ``assembly``: combining per month and per variable ERA5 DataFrames into a single one
+- ``epw_build``: aligning ERA5 and CAMS data, building EPW rows and header
+- ``epw_write``: writing the EPW file
+- ``read_epw``: reading the EPW file back
+- ``plot_2d``, ``plot_3d``, ``plot_heatmap``, ``plot_radar``: building each visualization figure
+
+Downloads are out of scope (see :mod:`benchmarks.fake_server` for the download orchestration).
+
+Fixtures are generated once and kept in a fixtures directory, so that only the pipeline itself is
+measured. Large scenarios can be sampled: a subset of site-years is measured, and the scenario total
+is extrapolated from the mean time per site-year, site-years being processed independently.
+
+Results are appended to a JSON lines history file, ``benchmarks/results.jsonl`` by default,
+which isn't tracked: timings depend on the machine, so baselines are measured locally, e.g. on the
+reference commit, then compared to (the last entry of a history file is the baseline)::
+
+    git checkout main && python -m benchmarks.bench_pipeline
+    git checkout - && python -m benchmarks.bench_pipeline --baseline benchmarks/results.jsonl
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from datetime import datetime
+
+from benchmarks.fixtures import make_response_payload
+from era5epw import ads, cds
+from era5epw.cache import make_cache_key
+from era5epw.epw import write_epw_file
+from era5epw.main import align_era5_and_cams_data, make_epw_dataframe, make_epw_header
+from era5epw.prefetch import make_sites_grid
+from era5epw.utils import unzip_and_load_netcdf_to_df
+from era5epw.visualize import (
+    create_2d_plot,
+    create_3d_plot,
+    create_heatmap_plot,
+    create_radar_plot,
+    read_epw_file,
+)
+
+STAGES = [
+    "decode",
+    "assembly",
+    "epw_build",
+    "epw_write",
+    "read_epw",
+    "plot_2d",
+    "plot_3d",
+    "plot_heatmap",
+    "plot_radar",
+]
+
+# name -> number of sites, years, and number of site-years measured by default (None for all)
+SCENARIOS = {
+    "1-site-year": {"sites": 1, "years": 1, "sample": None},
+    "1-site-25-years": {"sites": 1, "years": 25, "sample": None},
+    "500-sites-1-year": {"sites": 500, "years": 1, "sample": 10},
+}
+
+LAST_YEAR = 2023
+PLOT_SERIES = "Dry Bulb Temperature"
+DEFAULT_FIXTURES_DIR = os.path.join(tempfile.gettempdir(), "era5epw_bench_fixtures")
+# untracked, see .gitignore
+DEFAULT_HISTORY_FILE = os.path.join(os.path.dirname(__file__), "results.jsonl")
+
+
+def make_scenario_site_years(sites: int, years: int) -> list[tuple[float, float, int]]:
+    """List the (latitude, longitude, year) site-years of a scenario.
+
+    Sites are ERA5 grid points over western Europe, years end at LAST_YEAR.
+    """
+    grid = make_sites_grid(north=55.0, west=-5.0, south=40.0, east=15.0)
+    assert sites <= len(grid), f"At most {len(grid)} sites are supported."
+    # spread sites over the grid
+    stride = len(grid) // sites
+    return [
+        (latitude, longitude, year)
+        for latitude, longitude in grid[::stride][:sites]
+        for year in range(LAST_YEAR - years + 1, LAST_YEAR + 1)
+    ]
+
+
+def _write_fixture(fixtures_dir: str, dataset: str, request: dict[str, any]) -> str:
+    """Write the synthetic response to a request, unless it already exists."""
+    zipped = dataset != ads.dataset and "date" in request
+    file_path = os.path.join(fixtures_dir, make_cache_key(dataset, request))
+    if not os.path.exists(file_path):
+        fd, tmp_file = tempfile.mkstemp(dir=fixtures_dir, prefix=".tmp-")
+        with os.fdopen(fd, "wb") as f:
+            f.write(make_response_payload(dataset, request, zipped=zipped))
+        os.replace(tmp_file, file_path)
+    return file_path
+
+
+def make_site_year_fixtures(
+    fixtures_dir: str, latitude: float, longitude: float, year: int
+) -> tuple[list[str], str]:
+    """Generate the files that would be downloaded to build an EPW file for a site-year.
+
+    :param fixtures_dir: Directory where fixtures are stored.
+    :param latitude: Latitude of the site.
+    :param longitude: Longitude of the site.
+    :param year: Year.
+    :return: The ERA5 files, in request order, and the CAMS file.
+    """
+    os.makedirs(fixtures_dir, exist_ok=True)
+    era5_files = [
+        _write_fixture(fixtures_dir, cds_request["dataset"], cds_request)
+        for cds_request in cds.make_era5_requests(
+            variables=cds.epw_variables,
+            year=year,
+            latitude=latitude,
+            longitude=longitude,
+            dataset=None,
+        )
+    ]
+    cams_request = ads.make_cams_solar_radiation_request(
+        longitude=longitude, latitude=latitude, year=year
+    )
+    cams_file = _write_fixture(fixtures_dir, ads.dataset, cams_request)
+    return era5_files, cams_file
+
+
+def _timed(timings: dict[str, float], stage: str, func: Callable, *args, **kwargs) -> any:
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+    return result
+
+
+def run_site_year(
+    era5_files: list[str],
+    cams_file: str,
+    latitude: float,
+    longitude: float,
+    year: int,
+    workdir: str,
+) -> dict[str, float]:
+    """Run the pipeline for a site-year on fixtures, and time each stage.
+
+    :return: Time in seconds per stage.
+    """
+    timings = {}
+    era5_dfs = _timed(
+        timings,
+        "decode",
+        lambda: [unzip_and_load_netcdf_to_df(f, clean_up=True) for f in era5_files],
+    )
+    cams_df = _timed(timings, "decode", ads.load_cams_solar_radiation_data, cams_file)
+    era5_df = _timed(timings, "assembly", cds.combine_era5_dataframes, era5_dfs)
+
+    def build_epw():
+        aligned_era5_df, aligned_cams_df = align_era5_and_cams_data(era5_df, cams_df, year)
+        df = make_epw_dataframe(aligned_era5_df, aligned_cams_df, latitude, longitude)
+        header = make_epw_header(
+            df=df,
+            era5_df=aligned_era5_df,
+            year=year,
+            city_name="Benchmark",
+            latitude=latitude,
+            longitude=longitude,
+            time_zone=0,
+            elevation=0,
+        )
+        return df, header
+
+    df, header = _timed(timings, "epw_build", build_epw)
+    epw_file = os.path.join(workdir, "bench.epw")
+    _timed(timings, "epw_write", write_epw_file, epw_file, header, df)
+
+    epw_df = _timed(timings, "read_epw", read_epw_file, epw_file)
+    _timed(timings, "plot_2d", create_2d_plot, epw_df, PLOT_SERIES)
+    _timed(timings, "plot_3d", create_3d_plot, epw_df, PLOT_SERIES)
+    _timed(timings, "plot_heatmap", create_heatmap_plot, epw_df, PLOT_SERIES)
+    _timed(timings, "plot_radar", create_radar_plot, epw_df, PLOT_SERIES)
+
+    return timings
+
+
+def run_scenario(
+    name: str,
+    sites: int,
+    years: int,
+    sample: int | None = None,
+    fixtures_dir: str = DEFAULT_FIXTURES_DIR,
+    verbose: bool = True,
+) -> dict[str, any]:
+    """Run a benchmark scenario.
+
+    :param name: Name of the scenario.
+    :param sites: Number of sites.
+    :param years: Number of years per site.
+    :param sample: Number of site-years to measure, None to measure all of them.
+    :param fixtures_dir: Directory where fixtures are stored.
+    :param verbose: If True, print progress.
+    :return: The scenario results: per stage mean time per site-year and (extrapolated)
+        total.
+    """
+    site_years = make_scenario_site_years(sites, years)
+    measured = site_years
+    if sample is not None and sample < len(site_years):
+        stride = len(site_years) // sample
+        measured = site_years[::stride][:sample]
+
+    totals = {stage: 0.0 for stage in STAGES}
+    with tempfile.TemporaryDirectory() as workdir:
+        for i, (latitude, longitude, year) in enumerate(measured):
+            era5_files, cams_file = make_site_year_fixtures(fixtures_dir, latitude, longitude, year)
+            timings = run_site_year(era5_files, cams_file, latitude, longitude, year, workdir)
+            for stage, seconds in timings.items():
+                totals[stage] += seconds
+            if verbose:
+                print(
+                    f"[{name}] {i + 1}/{len(measured)} site-years: "
+                    f"{sum(timings.values()):.2f}s ({latitude}, {longitude}, {year})"
+                )
+
+    per_site_year = {stage: totals[stage] / len(measured) for stage in STAGES}
+    return {
+        "site_years": len(site_years),
+        "measured_site_years": len(measured),
+        "per_site_year": per_site_year,
+        "total": {stage: seconds * len(site_years) for stage, seconds in per_site_year.items()},
+    }
+
+
+def get_environment() -> dict[str, str]:
+    """Describe the environment the benchmark runs in, to only compare comparable results."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(__file__),
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": str(os.cpu_count()),
+    }
+
+
+def load_results(results_file: str) -> dict[str, any]:
+    """Load benchmark results: a JSON file, or the last entry of a JSON lines history file."""
+    with open(results_file) as f:
+        if results_file.endswith(".jsonl"):
+            lines = [line for line in f if line.strip()]
+            assert lines, f"No results in {results_file}."
+            return json.loads(lines[-1])
+        return json.load(f)
+
+
+def compare_results(
+    results: dict[str, any], baseline: dict[str, any], max_regression: float = 0.25
+) -> list[str]:
+    """Compare benchmark results to a baseline.
+
+    :param results: Benchmark results.
+    :param baseline: Baseline benchmark results.
+    :param max_regression: Maximum allowed slowdown of a stage, as a fraction of the
+        baseline time per site-year.
+    :return: A description of each regression exceeding the threshold.
+    """
+    regressions = []
+    for scenario, scenario_results in results["scenarios"].items():
+        baseline_scenario = baseline["scenarios"].get(scenario)
+        if baseline_scenario is None:
+            continue
+        for stage, seconds in scenario_results["per_site_year"].items():
+            baseline_seconds = baseline_scenario["per_site_year"].get(stage)
+            if not baseline_seconds:
+                continue
+            ratio = seconds / baseline_seconds - 1
+            if ratio > max_regression:
+                regressions.append(
+                    f"{scenario}/{stage}: {seconds:.4f}s per site-year vs "
+                    f"{baseline_seconds:.4f}s in baseline (+{ratio:.0%})"
+                )
+    return regressions
+
+
+def print_results(results: dict[str, any]) -> None:
+    for scenario, scenario_results in results["scenarios"].items():
+        print(
+            f"\n{scenario}: {scenario_results['site_years']} site-years "
+            f"({scenario_results['measured_site_years']} measured)"
+        )
+        print(f"  {'stage':<12}{'per site-year (s)':>20}{'total (s)':>14}")
+        for stage in STAGES:
+            print(
+                f"  {stage:<12}{scenario_results['per_site_year'][stage]:>20.4f}"
+                f"{scenario_results['total'][stage]:>14.2f}"
+            )
+
+
+def create_args() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark the EPW generation pipeline.")
+    parser.add_argument(
+        "--scenarios",
+        type=str,
+        nargs="+",
+        choices=list(SCENARIOS),
+        default=list(SCENARIOS),
+        help="Scenarios to run.",
+    )
+    parser.add_argument(
+        "--sample",
+        type=int,
+        default=None,
+        help="Number of site-years measured per scenario. Defaults to the scenario's own sample.",
+    )
+    parser.add_argument(
+        "--fixtures-dir",
+        type=str,
+        default=DEFAULT_FIXTURES_DIR,
+        help="Directory where generated fixtures are kept between runs.",
+    )
+    parser.add_argument(
+        "--history-file",
+        type=str,
+        default=DEFAULT_HISTORY_FILE,
+        help="JSON lines file results are appended to.",
+    )
+    parser.add_argument(
+        "--output", type=str, default=None, help="Also write results to this JSON file."
+    )
+    parser.add_argument(
+        "--baseline",
+        type=str,
+        default=None,
+        help="Results to compare to (JSON file, or last entry of a JSON lines history file).",
+    )
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=0.25,
+        help="Maximum allowed slowdown per stage compared to the baseline (0.25 = 25%%).",
+    )
+    return parser
+
+
+def main() -> None:
+    args = create_args().parse_args()
+
+    # loaded before the results are appended, the baseline can be the history file
+    baseline = load_results(args.baseline) if args.baseline else None
+    results = {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "environment": get_environment(),
+        "scenarios": {},
+    }
+    # warm up (imports done lazily by xarray and plotly, file system caches), not recorded
+    with tempfile.TemporaryDirectory() as workdir:
+        latitude, longitude, year = make_scenario_site_years(1, 1)[0]
+        era5_files, cams_file = make_site_year_fixtures(
+            args.fixtures_dir, latitude, longitude, year
+        )
+        run_site_year(era5_files, cams_file, latitude, longitude, year, workdir)
+
+    for name in args.scenarios:
+        scenario = SCENARIOS[name]
+        results["scenarios"][name] = run_scenario(
+            name=name,
+            sites=scenario["sites"],
+            years=scenario["years"],
+            sample=args.sample if args.sample is not None else scenario["sample"],
+            fixtures_dir=args.fixtures_dir,
+        )
+
+    print_results(results)
+
+    if args.history_file:
+        with open(args.history_file, "a") as f:
+            f.write(json.dumps(results) + "\n")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if baseline is not None:
+        regressions = compare_results(results, baseline, args.max_regression)
+        if regressions:
+            print("\nPerformance regressions:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"\nNo regression above {args.max_regression:.0%} compared to {args.baseline}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,496 @@
+"""Local stand-in for the CDS/ADS APIs, to benchmark the download orchestration without network.
+
+The server implements the endpoints used by cdsapi (through ecmwf-datastores-client): job
+submission, status polling, results and file download. Responses are synthetic NetCDF files shaped
+like the real ERA5 and CAMS ones (see :mod:`benchmarks.fixtures`).
+
+Queue latency, processing time, number of concurrently running jobs, download bandwidth and error
+rate are configurable, so that orchestration changes can be compared reproducibly.
+
+A session recorded against the real APIs (see :mod:`era5epw.recorder`) can be replayed instead,
+with its recorded payloads and its original or scaled queue, processing and download times.
+
+Usage from Python::
+
+    with run_fake_server(queue_latency=2, max_running_jobs=4) as server:
+        cds.url, ads.url = server.cds_url, server.ads_url
+        ...
+
+Or from the command line, then point the clients to it with the ERA5EPW_CDS_URL and
+ERA5EPW_ADS_URL environment variables::
+
+    python -m benchmarks.fake_server --port 8765 --queue-latency 2
+    python -m benchmarks.fake_server --port 8765 --cassette /path/to/record_dir --time-scale 0.1
+    ERA5EPW_CDS_URL=http://127.0.0.1:8765/cds/api ERA5EPW_ADS_URL=http://127.0.0.1:8765/ads/api \\
+        CDSADS_API_KEY=00000000-0000-0000-0000-000000000000 era5epw_download ...
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from datetime import UTC, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.fixtures import make_response_payload
+from era5epw.cache import make_cache_key
+from era5epw.recorder import get_recorded_timings, load_cassette
+
+# any key without ':' makes cdsapi use the new API client
+FAKE_API_KEY = "00000000-0000-0000-0000-000000000000"
+
+_JOB_PATH = re.compile(r"^/(?P<service>\w+)/api/retrieve/v1/jobs/(?P<job_id>[\w-]+)$")
+_RESULTS_PATH = re.compile(r"^/(?P<service>\w+)/api/retrieve/v1/jobs/(?P<job_id>[\w-]+)/results$")
+_PROCESS_PATH = re.compile(r"^/(?P<service>\w+)/api/retrieve/v1/processes/(?P<process_id>[\w.-]+)$")
+_EXECUTION_PATH = re.compile(
+    r"^/(?P<service>\w+)/api/retrieve/v1/processes/(?P<process_id>[\w.-]+)/execution$"
+)
+_DOWNLOAD_PATH = re.compile(r"^/(?P<service>\w+)/download/(?P<job_id>[\w-]+)$")
+_MESSAGES_PATH = re.compile(r"^/(?P<service>\w+)/api/catalogue/v1/messages$")
+
+_TIMESERIES_DATASETS = [
+    "reanalysis-era5-single-levels-timeseries",
+    "reanalysis-era5-land-timeseries",
+]
+
+
+def _isoformat(timestamp: float | None) -> str | None:
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, UTC).isoformat()
+
+
+class FakeJob:
+    """A job submitted to the fake server."""
+
+    def __init__(
+        self,
+        job_id: str,
+        dataset: str,
+        request: dict[str, any],
+        submitted: float,
+        queue_latency: float = 0.0,
+        processing_time: float = 0.0,
+        bandwidth: float = 0.0,
+        payload_file: str | None = None,
+    ):
+        self.job_id = job_id
+        self.dataset = dataset
+        self.request = request
+        self.status = "accepted"
+        # (status, timestamp) transitions
+        self.transitions = [("accepted", submitted)]
+        self.queue_latency = queue_latency
+        self.processing_time = processing_time
+        self.bandwidth = bandwidth
+        # recorded payload, when replaying a cassette
+        self.payload_file = payload_file
+        self.payload: bytes | None = None
+        self.error: str | None = None
+
+    def set_status(self, status: str, timestamp: float) -> None:
+        self.status = status
+        self.transitions.append((status, timestamp))
+
+    def timestamp(self, status: str) -> float | None:
+        return next((t for s, t in self.transitions if s == status), None)
+
+    def to_json(self) -> dict[str, any]:
+        return {
+            "jobID": self.job_id,
+            "processID": self.dataset,
+            "type": "process",
+            "status": self.status,
+            "created": _isoformat(self.timestamp("accepted")),
+            "started": _isoformat(self.timestamp("running")),
+            "finished": _isoformat(self.timestamp(self.status))
+            if self.status in ("successful", "failed")
+            else None,
+            "updated": _isoformat(self.transitions[-1][1]),
+            "metadata": {"request": {"ids": self.request}, "log": []},
+        }
+
+
+class FakeDataStore:
+    """State of the fake CDS/ADS services: jobs and their simulated scheduling."""
+
+    def __init__(
+        self,
+        queue_latency: float = 0.0,
+        processing_time: float = 0.0,
+        max_running_jobs: int = 0,
+        error_rate: float = 0.0,
+        bandwidth: float = 0.0,
+        zip_timeseries: bool = True,
+        seed: int | None = None,
+        payload_factory: Callable[[str, dict[str, any], bool], bytes] = make_response_payload,
+        cassette: dict[str, dict[str, any]] | None = None,
+        time_scale: float = 1.0,
+    ):
+        """
+        :param queue_latency: Minimum time in seconds a job stays queued ('accepted').
+        :param processing_time: Time in seconds a job stays 'running'.
+        :param max_running_jobs: Maximum number of jobs running at the same time, others stay
+            queued. 0 means unlimited.
+        :param error_rate: Fraction of jobs that fail.
+        :param bandwidth: Download bandwidth in bytes per second. 0 means unlimited.
+        :param zip_timeseries: If True, timeseries datasets responses are zipped, like the real
+            ones.
+        :param seed: Seed of the random generator deciding which jobs fail.
+        :param payload_factory: Function generating the response payload of a request.
+        :param cassette: Recorded session to replay (see :func:`era5epw.recorder.load_cassette`).
+            Recorded requests are answered with their recorded payload, queue, processing and
+            download times. Other requests are answered like without cassette.
+        :param time_scale: Factor applied to recorded times, e.g. 0.1 to replay 10 times faster.
+        """
+        self.queue_latency = queue_latency
+        self.processing_time = processing_time
+        self.max_running_jobs = max_running_jobs
+        self.error_rate = error_rate
+        self.bandwidth = bandwidth
+        self.zip_timeseries = zip_timeseries
+        self.payload_factory = payload_factory
+        self.cassette = cassette or {}
+        self.time_scale = time_scale
+        self.nb_unrecorded = 0
+        self.jobs: dict[str, FakeJob] = {}
+        self.lock = threading.Lock()
+        # the HDF5 library isn't thread safe, payloads are generated one at a time
+        self.payload_lock = threading.Lock()
+        self.random = random.Random(seed)
+
+    def submit(self, dataset: str, request: dict[str, any]) -> FakeJob:
+        entry = self.cassette.get(make_cache_key(dataset, request))
+        if entry is None:
+            job_params = {
+                "queue_latency": self.queue_latency,
+                "processing_time": self.processing_time,
+                "bandwidth": self.bandwidth,
+            }
+        else:
+            queue_time, processing_time, download_time = get_recorded_timings(entry)
+            download_time *= self.time_scale
+            job_params = {
+                "queue_latency": queue_time * self.time_scale,
+                "processing_time": processing_time * self.time_scale,
+                "bandwidth": entry["size"] / download_time if download_time > 0 else 0.0,
+                "payload_file": entry["payload"],
+            }
+
+        with self.lock:
+            if self.cassette and entry is None:
+                self.nb_unrecorded += 1
+            job = FakeJob(str(uuid.uuid4()), dataset, request, time.time(), **job_params)
+            self.jobs[job.job_id] = job
+            return job
+
+    def get_job(self, job_id: str) -> FakeJob | None:
+        self.advance()
+        return self.jobs.get(job_id)
+
+    def advance(self, now: float | None = None) -> None:
+        """Advance the simulated scheduler: finish jobs whose processing time has elapsed, then
+        start queued jobs in submission order while running slots are available."""
+        now = time.time() if now is None else now
+        with self.lock:
+            for job in self.jobs.values():
+                if (
+                    job.status == "running"
+                    and now - job.timestamp("running") >= job.processing_time
+                ):
+                    if self.random.random() < self.error_rate:
+                        job.error = "Simulated processing error"
+                        job.set_status("failed", now)
+                    else:
+                        job.set_status("successful", now)
+
+            nb_running = sum(1 for job in self.jobs.values() if job.status == "running")
+            for job in self.jobs.values():
+                if self.max_running_jobs and nb_running >= self.max_running_jobs:
+                    break
+                if (
+                    job.status == "accepted"
+                    and now - job.timestamp("accepted") >= job.queue_latency
+                ):
+                    job.set_status("running", now)
+                    nb_running += 1
+
+        # jobs with no processing time complete on the same poll
+        if any(job.status == "running" and job.processing_time == 0 for job in self.jobs.values()):
+            self.advance(now)
+
+    def get_payload(self, job: FakeJob) -> bytes:
+        if job.payload_file is not None:
+            with open(job.payload_file, "rb") as f:
+                return f.read()
+
+        with self.payload_lock:
+            if job.payload is None:
+                job.payload = self.payload_factory(
+                    job.dataset,
+                    job.request,
+                    self.zip_timeseries and job.dataset in _TIMESERIES_DATASETS,
+                )
+        return job.payload
+
+    def stats(self) -> dict[str, any]:
+        """Number of jobs by status, and mean queue and processing times."""
+        with self.lock:
+            jobs = list(self.jobs.values())
+        queue_times = [
+            job.timestamp("running") - job.timestamp("accepted")
+            for job in jobs
+            if job.timestamp("running") is not None
+        ]
+        by_status: dict[str, int] = {}
+        for job in jobs:
+            by_status[job.status] = by_status.get(job.status, 0) + 1
+        return {
+            "jobs": len(jobs),
+            "by_status": by_status,
+            "mean_queue_time": sum(queue_times) / len(queue_times) if queue_times else None,
+            "unrecorded": self.nb_unrecorded,
+        }
+
+
+class FakeServerRequestHandler(BaseHTTPRequestHandler):
+    """HTTP handler implementing the subset of the CDS/ADS API used by cdsapi."""
+
+    server: "FakeServer"
+
+    def log_message(self, format: str, *args: any) -> None:
+        # keep benchmark output clean
+        pass
+
+    def _send_json(self, content: dict[str, any], status: int = 200) -> None:
+        body = json.dumps(content).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_not_found(self) -> None:
+        self._send_json({"title": "not found", "detail": self.path}, status=404)
+
+    def _base_url(self, service: str) -> str:
+        return f"{self.server.url}/{service}"
+
+    def _path(self) -> str:
+        return self.path.split("?")[0]
+
+    def do_GET(self) -> None:
+        self._handle_get(send_body=True)
+
+    def do_HEAD(self) -> None:
+        self._handle_get(send_body=False)
+
+    def _handle_get(self, send_body: bool) -> None:
+        path = self._path()
+        datastore = self.server.datastore
+
+        if _MESSAGES_PATH.match(path):
+            return self._send_json({"messages": []})
+
+        if match := _PROCESS_PATH.match(path):
+            return self._send_json({"id": match["process_id"], "links": []})
+
+        if match := _JOB_PATH.match(path):
+            job = datastore.get_job(match["job_id"])
+            if job is None:
+                return self._send_not_found()
+            content = job.to_json()
+            content["links"] = [{"rel": "self", "href": f"{self.server.url}{path}"}]
+            return self._send_json(content)
+
+        if match := _RESULTS_PATH.match(path):
+            job = datastore.get_job(match["job_id"])
+            if job is None:
+                return self._send_not_found()
+            if job.status == "failed":
+                return self._send_json(
+                    {"type": "job failed", "title": "The job has failed", "detail": job.error},
+                    status=400,
+                )
+            if job.status != "successful":
+                return self._send_json({"title": "results not ready"}, status=404)
+            payload = datastore.get_payload(job)
+            return self._send_json(
+                {
+                    "asset": {
+                        "value": {
+                            "type": "application/netcdf",
+                            "href": f"{self._base_url(match['service'])}/download/{job.job_id}",
+                            "file:size": len(payload),
+                        }
+                    }
+                }
+            )
+
+        if match := _DOWNLOAD_PATH.match(path):
+            job = datastore.get_job(match["job_id"])
+            if job is None or job.status != "successful":
+                return self._send_not_found()
+            payload = datastore.get_payload(job)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            if send_body:
+                self._send_throttled(payload, job.bandwidth)
+            return
+
+        self._send_not_found()
+
+    def _send_throttled(
+        self, payload: bytes, bandwidth: float, chunk_size: int = 64 * 1024
+    ) -> None:
+        for start in range(0, len(payload), chunk_size):
+            chunk = payload[start : start + chunk_size]
+            self.wfile.write(chunk)
+            if bandwidth:
+                time.sleep(len(chunk) / bandwidth)
+
+    def do_POST(self) -> None:
+        path = self._path()
+        if match := _EXECUTION_PATH.match(path):
+            length = int(self.headers.get("Content-Length", 0))
+            inputs = json.loads(self.rfile.read(length) or b"{}").get("inputs", {})
+            job = self.server.datastore.submit(match["process_id"], inputs)
+            job_url = f"{self._base_url(match['service'])}/api/retrieve/v1/jobs/{job.job_id}"
+            content = job.to_json()
+            content["links"] = [{"rel": "monitor", "href": job_url}]
+            return self._send_json(content, status=201)
+
+        self._send_not_found()
+
+    def do_DELETE(self) -> None:
+        if _JOB_PATH.match(self._path()):
+            return self._send_json({})
+        self._send_not_found()
+
+
+class FakeServer(ThreadingHTTPServer):
+    """Threaded HTTP server serving a FakeDataStore."""
+
+    daemon_threads = True
+
+    def __init__(self, datastore: FakeDataStore, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), FakeServerRequestHandler)
+        self.datastore = datastore
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def cds_url(self) -> str:
+        """URL to use in place of the CDS API URL."""
+        return f"{self.url}/cds/api"
+
+    @property
+    def ads_url(self) -> str:
+        """URL to use in place of the ADS API URL."""
+        return f"{self.url}/ads/api"
+
+
+@contextmanager
+def run_fake_server(
+    host: str = "127.0.0.1", port: int = 0, datastore: FakeDataStore | None = None, **kwargs
+) -> Iterator[FakeServer]:
+    """Run a fake CDS/ADS server in a background thread.
+
+    :param host: Host to bind.
+    :param port: Port to bind. 0 picks a free port.
+    :param datastore: Datastore to serve. If None, one is created with the keyword arguments
+        (see :class:`FakeDataStore`).
+    :return: The running server.
+    """
+    server = FakeServer(datastore or FakeDataStore(**kwargs), host=host, port=port)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+def create_args() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Run a local stand-in CDS/ADS server.")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Host to bind.")
+    parser.add_argument("--port", type=int, default=8765, help="Port to bind.")
+    parser.add_argument(
+        "--queue-latency", type=float, default=0.0, help="Seconds a job stays queued."
+    )
+    parser.add_argument(
+        "--processing-time", type=float, default=0.0, help="Seconds a job stays running."
+    )
+    parser.add_argument(
+        "--max-running-jobs",
+        type=int,
+        default=0,
+        help="Maximum number of jobs running at the same time (0 for unlimited).",
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="Fraction of jobs that fail (0-1)."
+    )
+    parser.add_argument(
+        "--bandwidth",
+        type=float,
+        default=0.0,
+        help="Download bandwidth in bytes per second (0 for unlimited).",
+    )
+    parser.add_argument(
+        "--no-zip", action="store_true", help="Don't zip timeseries datasets responses."
+    )
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for job failures.")
+    parser.add_argument(
+        "--cassette",
+        type=str,
+        default=None,
+        help="Directory of a recorded session (see ERA5EPW_RECORD_DIR) to replay.",
+    )
+    parser.add_argument(
+        "--time-scale",
+        type=float,
+        default=1.0,
+        help="Factor applied to recorded times when replaying, e.g. 0.1 to replay 10x faster.",
+    )
+    return parser
+
+
+def main() -> None:
+    args = create_args().parse_args()
+    datastore = FakeDataStore(
+        queue_latency=args.queue_latency,
+        processing_time=args.processing_time,
+        max_running_jobs=args.max_running_jobs,
+        error_rate=args.error_rate,
+        bandwidth=args.bandwidth,
+        zip_timeseries=not args.no_zip,
+        seed=args.seed,
+        cassette=load_cassette(args.cassette) if args.cassette else None,
+        time_scale=args.time_scale,
+    )
+    server = FakeServer(datastore, host=args.host, port=args.port)
+    print(f"Fake CDS API at {server.cds_url}, fake ADS API at {server.ads_url}")
+    print(f"Use CDSADS_API_KEY={FAKE_API_KEY}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(datastore.stats(), indent=2))
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""Synthetic NetCDF fixtures shaped like the real ERA5 and CAMS responses.
+
+Values are deterministic for a given request, and plausible enough for the EPW pipeline to
+run on them (seasonal and diurnal cycles, positive radiation during daytime only, etc.).
+"""
+
+import io
+import os
+import tempfile
+import zipfile
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from era5epw.cache import make_cache_key
+
+# NetCDF short names of the ERA5 variables
+ERA5_SHORT_NAMES = {
+    "2m_temperature": "t2m",
+    "2m_dewpoint_temperature": "d2m",
+    "surface_pressure": "sp",
+    "10m_u_component_of_wind": "u10",
+    "10m_v_component_of_wind": "v10",
+    "total_cloud_cover": "tcc",
+    "uv_visible_albedo_for_direct_radiation": "aluvp",
+    "snow_depth": "sd",
+    "soil_temperature_level_1": "stl1",
+    "total_precipitation": "tp",
+}
+
+CAMS_VARIABLES = ["GHI", "BHI", "DHI", "BNI", "CLEAR_SKY_GHI", "CLEAR_SKY_BHI", "CLEAR_SKY_DHI"]
+
+
+def make_rng(dataset: str, request: dict[str, any]) -> np.random.Generator:
+    """Random generator seeded by the request, so that fixtures are deterministic."""
+    return np.random.default_rng(int(make_cache_key(dataset, request)[:16], 16))
+
+
+def snap_to_grid(value: float, step: float = 0.25) -> float:
+    """Snap a coordinate to the ERA5 grid, as CDS does for point extraction."""
+    return round(round(value / step) * step, 4)
+
+
+def _cos_zenith(times: pd.DatetimeIndex, latitude: float, longitude: float) -> np.ndarray:
+    """Approximate cosine of the solar zenith angle, clipped at 0."""
+    day_of_year = times.dayofyear.values
+    hour = times.hour.values + times.minute.values / 60
+    declination = np.radians(23.45) * np.sin(2 * np.pi * (284 + day_of_year) / 365)
+    hour_angle = np.radians(15 * (hour + longitude / 15 - 12))
+    lat = np.radians(latitude)
+    cos_zenith = np.sin(lat) * np.sin(declination) + np.cos(lat) * np.cos(declination) * np.cos(
+        hour_angle
+    )
+    return np.clip(cos_zenith, 0, None)
+
+
+def make_era5_series(
+    variable: str,
+    times: pd.DatetimeIndex,
+    latitude: float,
+    longitude: float,
+    rng: np.random.Generator,
+) -> np.ndarray:
+    """Generate a synthetic hourly series for an ERA5 variable, in the units of the NetCDF
+    responses."""
+    n = len(times)
+    season = np.cos(2 * np.pi * (times.dayofyear.values - 200) / 365.25)
+    diurnal = np.cos(2 * np.pi * (times.hour.values + longitude / 15 - 15) / 24)
+    t2m = 283.0 - 0.3 * (abs(latitude) - 45) + 9 * season + 4 * diurnal + rng.normal(0, 1.5, n)
+
+    match variable:
+        case "2m_temperature":
+            values = t2m
+        case "2m_dewpoint_temperature":
+            values = t2m - np.abs(rng.normal(4, 2, n))
+        case "surface_pressure":
+            values = 101325 + 800 * np.sin(np.arange(n) / 97) + rng.normal(0, 50, n)
+        case "10m_u_component_of_wind" | "10m_v_component_of_wind":
+            values = 2 * np.sin(np.arange(n) / 53 + rng.uniform(0, 6)) + rng.normal(0, 2, n)
+        case "total_cloud_cover":
+            values = np.clip(0.5 + 0.4 * np.sin(np.arange(n) / 31) + rng.normal(0, 0.2, n), 0, 1)
+        case "uv_visible_albedo_for_direct_radiation":
+            values = np.clip(0.06 + rng.normal(0, 0.005, n), 0, 1)
+        case "snow_depth":
+            values = np.clip(-season * 0.05 - 0.02, 0, None)
+        case "soil_temperature_level_1":
+            values = 284.0 + 7 * np.cos(2 * np.pi * (times.dayofyear.values - 215) / 365.25)
+        case "total_precipitation":
+            values = np.where(rng.uniform(0, 1, n) < 0.1, rng.exponential(0.0008, n), 0.0)
+        case _:
+            values = rng.normal(0, 1, n)
+
+    return values.astype("float32")
+
+
+def make_era5_timeseries_dataset(
+    variables: list[str],
+    start: str,
+    end: str,
+    latitude: float,
+    longitude: float,
+    rng: np.random.Generator,
+) -> xr.Dataset:
+    """Dataset shaped like the ERA5 timeseries responses: a 'valid_time' dimension and scalar
+    latitude/longitude coordinates."""
+    times = pd.date_range(f"{start} 00:00", f"{end} 23:00", freq="1h")
+    latitude, longitude = snap_to_grid(latitude), snap_to_grid(longitude)
+    return xr.Dataset(
+        {
+            ERA5_SHORT_NAMES.get(variable, variable): (
+                "valid_time",
+                make_era5_series(variable, times, latitude, longitude, rng),
+            )
+            for variable in variables
+        },
+        coords={"valid_time": times, "latitude": latitude, "longitude": longitude},
+    )
+
+
+def make_era5_single_levels_dataset(
+    variables: list[str],
+    year: int,
+    month: int,
+    days: list[int],
+    area: list[float],
+    rng: np.random.Generator,
+) -> xr.Dataset:
+    """Dataset shaped like the ERA5 single levels responses: 'valid_time', 'latitude' and
+    'longitude' dimensions."""
+    times = pd.DatetimeIndex(
+        [pd.Timestamp(year, month, day, hour) for day in sorted(days) for hour in range(24)]
+    )
+    north, west, south, east = area
+    latitude = snap_to_grid((north + south) / 2)
+    longitude = snap_to_grid((west + east) / 2)
+    return xr.Dataset(
+        {
+            ERA5_SHORT_NAMES.get(variable, variable): (
+                ("valid_time", "latitude", "longitude"),
+                make_era5_series(variable, times, latitude, longitude, rng).reshape(-1, 1, 1),
+            )
+            for variable in variables
+        },
+        coords={
+            "valid_time": times,
+            "latitude": [latitude],
+            "longitude": [longitude],
+            "number": 0,
+        },
+    )
+
+
+def make_cams_dataset(
+    start: str,
+    end: str,
+    latitude: float,
+    longitude: float,
+    rng: np.random.Generator,
+) -> xr.Dataset:
+    """Dataset shaped like the CAMS solar radiation timeseries responses: 'time', 'altitude',
+    'latitude' and 'longitude' dimensions, time marking the end of each hourly period."""
+    times = pd.date_range(
+        pd.Timestamp(start) + pd.Timedelta(hours=1),
+        pd.Timestamp(end) + pd.Timedelta(days=1),
+        freq="1h",
+    )
+    n = len(times)
+    # radiation integrated over the hour, evaluated at the middle of the period
+    cos_zenith = _cos_zenith(times - pd.Timedelta(minutes=30), latitude, longitude)
+    clear_sky_bni = 900 * np.exp(-0.15 / np.maximum(cos_zenith, 0.05)) * (cos_zenith > 0)
+    clear_sky_bhi = clear_sky_bni * cos_zenith
+    clear_sky_dhi = 0.12 * 1360 * cos_zenith
+    clearness = np.clip(rng.beta(2, 1.5, n), 0, 1)
+    bhi = clear_sky_bhi * clearness
+    dhi = clear_sky_dhi * (1 + 1.5 * (1 - clearness))
+    bni = np.where(cos_zenith > 0.05, bhi / np.maximum(cos_zenith, 0.05), 0)
+
+    values = {
+        "GHI": bhi + dhi,
+        "BHI": bhi,
+        "DHI": dhi,
+        "BNI": bni,
+        "CLEAR_SKY_GHI": clear_sky_bhi + clear_sky_dhi,
+        "CLEAR_SKY_BHI": clear_sky_bhi,
+        "CLEAR_SKY_DHI": clear_sky_dhi,
+    }
+    return xr.Dataset(
+        {
+            name: (("time", "altitude", "latitude", "longitude"), values[name].reshape(-1, 1, 1, 1))
+            for name in CAMS_VARIABLES
+        },
+        coords={
+            "time": times,
+            "altitude": [0.0],
+            "latitude": [latitude],
+            "longitude": [longitude],
+        },
+    )
+
+
+def make_dataset_for_request(dataset: str, request: dict[str, any]) -> xr.Dataset:
+    """Generate the synthetic dataset answering a CDS/ADS request."""
+    rng = make_rng(dataset, request)
+
+    if dataset == "cams-solar-radiation-timeseries":
+        start, end = request["date"][0].split("/")
+        location = request["location"]
+        return make_cams_dataset(start, end, location["latitude"], location["longitude"], rng)
+
+    if "date" in request:
+        start, end = request["date"][0].split("/")
+        location = request["location"]
+        return make_era5_timeseries_dataset(
+            request["variable"], start, end, location["latitude"], location["longitude"], rng
+        )
+
+    return make_era5_single_levels_dataset(
+        request["variable"],
+        int(request["year"][0]),
+        int(request["month"][0]),
+        [int(day) for day in request["day"]],
+        request["area"],
+        rng,
+    )
+
+
+def dataset_to_netcdf_bytes(ds: xr.Dataset) -> bytes:
+    """Serialize a dataset to NetCDF4 bytes."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "data.nc")
+        ds.to_netcdf(path, engine="netcdf4")
+        with open(path, "rb") as f:
+            return f.read()
+
+
+def make_response_payload(dataset: str, request: dict[str, any], zipped: bool = False) -> bytes:
+    """Generate the payload of the response to a CDS/ADS request.
+
+    :param dataset: The dataset the request is made on.
+    :param request: The request parameters.
+    :param zipped: If True, the NetCDF file is zipped, as in the ERA5 timeseries responses.
+    :return: The response payload.
+    """
+    payload = dataset_to_netcdf_bytes(make_dataset_for_request(dataset, request))
+    if not zipped:
+        return payload
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zip_file:
+        zip_file.writestr(f"{dataset}-{make_cache_key(dataset, request)[:8]}.nc", payload)
+    return buffer.getvalue()
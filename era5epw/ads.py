@@ -1,12 +1,16 @@
+import os
 import tempfile
+import time
 
 import pandas as pd
-import xarray as xr
 from tqdm.auto import tqdm
 
+from era5epw.profiling import profile_section
+from era5epw.report import RunReport
 from era5epw.utils import execute_download_request, now_utc
 
-url = "https://ads.atmosphere.copernicus.eu/api"
+# can be overridden, e.g. to target a local stand-in server for benchmarks
+url = os.getenv("ERA5EPW_ADS_URL", "https://ads.atmosphere.copernicus.eu/api")
 dataset = "cams-solar-radiation-timeseries"
 
 
@@ -64,6 +68,9 @@ def download_cams_solar_radiation_data(
     time_reference: str = "universal_time",
     clean_up: bool = True,
     time_zone: int | None = None,
+    cache_dir: str | None = None,
+    offline: bool = False,
+    report: RunReport | None = None,
 ) -> pd.DataFrame:
     """Download solar radiation data from the Copernicus Atmosphere Data Store (CAMS).
 
@@ -77,17 +84,26 @@ def download_cams_solar_radiation_data(
     :param clean_up: If True, remove the temporary file after processing.
     :param time_zone: Time zone offset from UTC. If provided, will adjust date range to
         fetch additional data needed for time zone conversion.
+    :param cache_dir: Directory of the download cache. If None, the ERA5EPW_CACHE_DIR
+        environment variable is used, and caching is disabled if it's not set.
+    :param offline: If True, data is only read from the download cache, and a missing entry
+        raises an error instead of being downloaded.
+    :param report: Run report to add the request trace and planning timing to.
     """
-    request = make_cams_solar_radiation_request(
-        longitude=longitude,
-        latitude=latitude,
-        year=year,
-        sky_type=sky_type,
-        altitude=altitude,
-        time_step=time_step,
-        time_reference=time_reference,
-        time_zone=time_zone,
-    )
+    if report is None:
+        report = RunReport()
+
+    with report.phase("planning"):
+        request = make_cams_solar_radiation_request(
+            longitude=longitude,
+            latitude=latitude,
+            year=year,
+            sky_type=sky_type,
+            altitude=altitude,
+            time_step=time_step,
+            time_reference=time_reference,
+            time_zone=time_zone,
+        )
 
     if request is None:
         raise ValueError("Cannot download data for future years.")
@@ -95,25 +111,46 @@ def download_cams_solar_radiation_data(
     with tempfile.NamedTemporaryFile(dir="/tmp", suffix=".nc", delete=clean_up) as temp_file:
         # Create progress bar for CAMS request
         cams_progress = tqdm(total=1, desc="CAMS request", unit="request", position=1, leave=False)
-        execute_download_request(
-            url=url,
-            dataset=dataset,
-            cds_request=request,
-            target_file=temp_file.name,
-        )
+        try:
+            trace = execute_download_request(
+                url=url,
+                dataset=dataset,
+                cds_request=request,
+                target_file=temp_file.name,
+                cache_dir=cache_dir,
+                offline=offline,
+            )
+        except Exception as e:
+            report.add_failure(dataset, e)
+            raise
         cams_progress.update(1)
         cams_progress.close()
 
         tqdm.write(f"Data downloaded to {temp_file.name}")
 
-        ds = xr.open_dataset(temp_file.name)
-        df = ds.to_dataframe()
-        df.index = pd.to_datetime(df.index.get_level_values("time"))
-        df = df.sort_index()
+        start = time.perf_counter()
+        with profile_section("decode"):
+            df = load_cams_solar_radiation_data(temp_file.name)
+        report.add_request(trace, decode_time=time.perf_counter() - start)
 
     return df
 
 
+def load_cams_solar_radiation_data(file_path: str) -> pd.DataFrame:
+    """Load a CAMS solar radiation NetCDF file into a DataFrame indexed by time.
+
+    :param file_path: Path to the NetCDF file.
+    :return: A DataFrame with one column per variable, sorted by time.
+    """
+    # xarray is slow to import, only import it when decoding
+    import xarray as xr
+
+    ds = xr.open_dataset(file_path)
+    df = ds.to_dataframe()
+    df.index = pd.to_datetime(df.index.get_level_values("time"))
+    return df.sort_index()
+
+
 if __name__ == "__main__":
     df_2024 = download_cams_solar_radiation_data(
         longitude=2.69022,
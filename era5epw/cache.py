@@ -0,0 +1,311 @@
+"""Persistent cache of CDS/ADS downloads.
+
+Downloaded files are stored in a cache directory, keyed by a hash of the dataset name and
+the request parameters. The cache size is capped: when it grows over the limit, least
+recently used entries are evicted first. Entries are written to a temporary file then
+atomically renamed, and concurrent processes coordinate through a lock file.
+"""
+
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+CACHE_DIR_ENV_VAR = "ERA5EPW_CACHE_DIR"
+CACHE_MAX_SIZE_ENV_VAR = "ERA5EPW_CACHE_MAX_SIZE"
+DEFAULT_MAX_SIZE = 10 * 1024**3  # 10 GiB
+
+# temporary files older than this are considered left over by a crashed writer
+STALE_TMP_FILE_AGE = 3600
+
+_DATA_SUFFIX = ".dat"
+_META_SUFFIX = ".json"
+_TMP_PREFIX = ".tmp-"
+_SIZE_UNITS = {"K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+
+
+def parse_size(size: str | int) -> int:
+    """Parse a size given in bytes or with a K, M, G or T suffix (e.g. '500M', '10G').
+
+    :param size: Size to parse.
+    :return: Size in bytes.
+    """
+    if isinstance(size, int):
+        return size
+
+    size = size.strip().upper().removesuffix("B").removesuffix("I")
+    if size and size[-1] in _SIZE_UNITS:
+        return int(float(size[:-1]) * _SIZE_UNITS[size[-1]])
+    return int(size)
+
+
+def format_size(size: int) -> str:
+    """Format a size in bytes as a human-readable string."""
+    value = float(size)
+    for unit in ["B", "KiB", "MiB", "GiB"]:
+        if value < 1024:
+            return f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} TiB"
+
+
+class MissingCacheEntriesError(FileNotFoundError):
+    """Raised in offline mode when some of the data needed isn't in the download cache."""
+
+    def __init__(self, missing: list[tuple[str, str, str, str]]) -> None:
+        """
+        :param missing: The missing entries, as (dataset, variable, month, cell) tuples.
+        """
+        self.missing = missing
+        super().__init__(
+            f"{len(missing)} entries missing from the download cache "
+            "(dataset, variable, month, cell):\n"
+            + "\n".join(f"  - {', '.join(entry)}" for entry in missing)
+        )
+
+    def __reduce__(self):
+        # errors raised in pool workers are pickled: rebuild them from the entries, not the
+        # message
+        return type(self), (self.missing,)
+
+
+def make_cache_key(dataset: str, request: dict[str, any]) -> str:
+    """Compute the cache key of a request.
+
+    :param dataset: The dataset the request is made on.
+    :param request: The request parameters.
+    :return: A hexadecimal digest identifying the request.
+    """
+    canonical = json.dumps({"dataset": dataset, "request": request}, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class DownloadCache:
+    """A size-capped cache of downloaded files, with least recently used eviction."""
+
+    def __init__(self, cache_dir: str, max_size: int | None = None) -> None:
+        """
+        :param cache_dir: Directory where cached files are stored. Created if missing.
+        :param max_size: Maximum total size of the cache in bytes. Defaults to the value of the
+            ERA5EPW_CACHE_MAX_SIZE environment variable, or 10 GiB.
+        """
+        if max_size is None:
+            max_size = parse_size(os.getenv(CACHE_MAX_SIZE_ENV_VAR, str(DEFAULT_MAX_SIZE)))
+
+        self.cache_dir = os.path.abspath(os.path.expanduser(cache_dir))
+        self.max_size = max_size
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def entry_path(self, key: str) -> str:
+        """Path of the data file of a cache entry."""
+        return os.path.join(self.cache_dir, key + _DATA_SUFFIX)
+
+    def _meta_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + _META_SUFFIX)
+
+    @contextmanager
+    def lock(self, exclusive: bool = False) -> Iterator[None]:
+        """Lock the cache. Readers take a shared lock, writers an exclusive one.
+
+        :param exclusive: If True, take an exclusive lock.
+        """
+        with open(os.path.join(self.cache_dir, ".lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def contains(self, dataset: str, request: dict[str, any]) -> bool:
+        """Check if a request is in the cache, without updating its access time."""
+        return os.path.exists(self.entry_path(make_cache_key(dataset, request)))
+
+    def get(self, dataset: str, request: dict[str, any], target_file: str) -> bool:
+        """Copy the cached file of a request to the target file.
+
+        :param dataset: The dataset the request is made on.
+        :param request: The request parameters.
+        :param target_file: Path where the cached file is copied.
+        :return: True if the request was in the cache, False otherwise.
+        """
+        path = self.entry_path(make_cache_key(dataset, request))
+        with self.lock():
+            if not os.path.exists(path):
+                return False
+            shutil.copyfile(path, target_file)
+            # track access explicitly, file systems are often mounted with noatime
+            os.utime(path)
+        return True
+
+    def put(self, dataset: str, request: dict[str, any], source_file: str) -> str:
+        """Store a downloaded file in the cache, then evict entries if the cache is too large.
+
+        :param dataset: The dataset the request is made on.
+        :param request: The request parameters.
+        :param source_file: Path of the downloaded file.
+        :return: Path of the cache entry.
+        """
+        key = make_cache_key(dataset, request)
+        tmp_data = self._make_tmp_file()
+        tmp_meta = self._make_tmp_file()
+        try:
+            shutil.copyfile(source_file, tmp_data)
+            with open(tmp_meta, "w") as f:
+                json.dump({"dataset": dataset, "request": request}, f, default=str)
+
+            with self.lock(exclusive=True):
+                os.replace(tmp_meta, self._meta_path(key))
+                os.replace(tmp_data, self.entry_path(key))
+                self._evict(self.max_size, keep=key)
+        finally:
+            for tmp_file in (tmp_data, tmp_meta):
+                if os.path.exists(tmp_file):
+                    os.remove(tmp_file)
+
+        return self.entry_path(key)
+
+    def _make_tmp_file(self) -> str:
+        fd, tmp_file = tempfile.mkstemp(dir=self.cache_dir, prefix=_TMP_PREFIX)
+        os.close(fd)
+        return tmp_file
+
+    def _list_entries(self) -> list[tuple[str, os.stat_result]]:
+        return [
+            (entry.name.removesuffix(_DATA_SUFFIX), entry.stat())
+            for entry in os.scandir(self.cache_dir)
+            if entry.name.endswith(_DATA_SUFFIX)
+        ]
+
+    def _remove_entry(self, key: str) -> None:
+        for path in (self.entry_path(key), self._meta_path(key)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _evict(self, max_size: int, keep: str | None = None) -> list[str]:
+        """Evict least recently used entries until the cache fits in max_size.
+
+        Must be called with the exclusive lock held.
+        """
+        entries = sorted(self._list_entries(), key=lambda entry: entry[1].st_atime)
+        total_size = sum(stat.st_size for _, stat in entries)
+
+        evicted = []
+        for key, stat in entries:
+            if total_size <= max_size:
+                break
+            if key == keep:
+                continue
+            self._remove_entry(key)
+            total_size -= stat.st_size
+            evicted.append(key)
+
+        return evicted
+
+    def prune(self, max_size: int | None = None) -> list[str]:
+        """Evict least recently used entries until the cache fits in max_size, and remove temporary
+        files left over by crashed writers.
+
+        :param max_size: Target size in bytes. Defaults to the cache size cap.
+        :return: Keys of the evicted entries.
+        """
+        with self.lock(exclusive=True):
+            now = time.time()
+            for entry in os.scandir(self.cache_dir):
+                if (
+                    entry.name.startswith(_TMP_PREFIX)
+                    and now - entry.stat().st_mtime > STALE_TMP_FILE_AGE
+                ):
+                    os.remove(entry.path)
+
+            return self._evict(self.max_size if max_size is None else max_size)
+
+    def stats(self) -> dict[str, any]:
+        """Return statistics about the cache content."""
+        with self.lock():
+            entries = self._list_entries()
+            by_dataset: dict[str, dict[str, int]] = {}
+            for key, stat in entries:
+                try:
+                    with open(self._meta_path(key)) as f:
+                        dataset = json.load(f)["dataset"]
+                except (FileNotFoundError, ValueError, KeyError):
+                    dataset = "unknown"
+                dataset_stats = by_dataset.setdefault(dataset, {"entries": 0, "size": 0})
+                dataset_stats["entries"] += 1
+                dataset_stats["size"] += stat.st_size
+
+        access_times = [stat.st_atime for _, stat in entries]
+        return {
+            "cache_dir": self.cache_dir,
+            "entries": len(entries),
+            "size": sum(stat.st_size for _, stat in entries),
+            "max_size": self.max_size,
+            "oldest_access": min(access_times) if access_times else None,
+            "newest_access": max(access_times) if access_times else None,
+            "datasets": by_dataset,
+        }
+
+
+def get_download_cache(cache_dir: str | None = None) -> DownloadCache | None:
+    """Return the download cache, or None if caching is disabled.
+
+    :param cache_dir: Cache directory. If None, the ERA5EPW_CACHE_DIR environment variable
+        is used. Caching is disabled if neither is set.
+    """
+    cache_dir = cache_dir or os.getenv(CACHE_DIR_ENV_VAR)
+    if not cache_dir:
+        return None
+    return DownloadCache(cache_dir)
+
+
+def cache_cli() -> None:
+    """Command-line interface for download cache management."""
+    parser = argparse.ArgumentParser(description="Manage the ERA5/CAMS download cache.")
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        default=os.getenv(CACHE_DIR_ENV_VAR),
+        help=f"Cache directory. Defaults to the {CACHE_DIR_ENV_VAR} environment variable.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("stats", help="Show cache statistics.")
+    prune_parser = subparsers.add_parser(
+        "prune", help="Evict least recently used entries until the cache fits the size cap."
+    )
+    prune_parser.add_argument(
+        "--max-size",
+        type=str,
+        help="Target cache size (e.g. '500M', '10G'). Defaults to the configured size cap.",
+    )
+
+    args = parser.parse_args()
+
+    if not args.cache_dir:
+        parser.error(f"--cache-dir is required when {CACHE_DIR_ENV_VAR} is not set.")
+
+    cache = DownloadCache(args.cache_dir)
+
+    if args.command == "stats":
+        stats = cache.stats()
+        print(f"Cache directory: {stats['cache_dir']}")
+        print(f"Entries: {stats['entries']}")
+        print(f"Size: {format_size(stats['size'])} / {format_size(stats['max_size'])}")
+        for dataset, dataset_stats in sorted(stats["datasets"].items()):
+            print(
+                f"  - {dataset}: {dataset_stats['entries']} entries, "
+                f"{format_size(dataset_stats['size'])}"
+            )
+    elif args.command == "prune":
+        max_size = parse_size(args.max_size) if args.max_size is not None else None
+        evicted = cache.prune(max_size=max_size)
+        print(f"Evicted {len(evicted)} entries. Cache size: {format_size(cache.stats()['size'])}")
+
+
+if __name__ == "__main__":
+    cache_cli()
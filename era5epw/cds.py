@@ -1,10 +1,13 @@
 import os
+import time
 from multiprocessing import Pool
 from tempfile import TemporaryDirectory
 
 import pandas as pd
 from tqdm.auto import tqdm
 
+from era5epw.profiling import profile_section
+from era5epw.report import RunReport
 from era5epw.utils import (
     execute_download_request,
     make_cds_days_list,
@@ -12,7 +15,8 @@ from era5epw.utils import (
     unzip_and_load_netcdf_to_df,
 )
 
-url = "https://cds.climate.copernicus.eu/api"
+# can be overridden, e.g. to target a local stand-in server for benchmarks
+url = os.getenv("ERA5EPW_CDS_URL", "https://cds.climate.copernicus.eu/api")
 datasets = [
     # new experimental dataset for timeseries data. Seems faster to download but not all variables are available.
     # first in the list so it is selected with higher priority.
@@ -22,6 +26,19 @@ datasets = [
     # the original dataset for single-level data. Contains all variables but is much slower to download.
     "reanalysis-era5-single-levels",
 ]
+# ERA5 variables needed to build an EPW file
+epw_variables = [
+    "2m_temperature",
+    "2m_dewpoint_temperature",
+    "surface_pressure",
+    "10m_u_component_of_wind",
+    "10m_v_component_of_wind",
+    "total_cloud_cover",
+    "uv_visible_albedo_for_direct_radiation",
+    "snow_depth",
+    "soil_temperature_level_1",
+    "total_precipitation",
+]
 supported_vars_by_dataset = {
     "reanalysis-era5-single-levels-timeseries": [
         "2m_dewpoint_temperature",
@@ -226,34 +243,26 @@ def make_intermediate_file_names(tmpdir: str, cds_requests: list[dict[str, any]]
     return intermediate_files
 
 
-def download_era5_data(
+def make_era5_requests(
     variables: [str],
     year: int,
     latitude: float,
     longitude: float,
     dataset: str | None = datasets[0],
-    parallel_exec_nb: int = 4,
-    clean_up: bool = True,
-    verbose: bool = False,
     time_zone: int | None = None,
-) -> pd.DataFrame:
-    """Download data from the Climate Data Store (CDS) for a specific variable and time and return
-    as a DataFrame.
+) -> list[dict[str, any]]:
+    """Create the list of CDS requests needed to download a full year of data, split by month and
+    variable.
 
-    :param variables: The variable to download (e.g., '2m_temperature').
-    :param year: The year of the data. Full year will be downloaded.
+    :param variables: The variables to download.
+    :param year: The year of the data.
     :param latitude: The latitude for the data point.
     :param longitude: The longitude for the data point.
-    :param dataset: The dataset to use, e.g., 'reanalysis-era5-single-levels-timeseries'. If
-        None, the first dataset supporting the variable will be selected.
-    :param parallel_exec_nb: Number of parallel executions for downloading data. Default is
-        12 (1 per month).
-    :param clean_up: If True, remove individual month files after combining them into the
-        target file.
-    :param verbose: If True, enable verbose logging from CDS client.
+    :param dataset: The dataset to use. If None, the first dataset supporting each variable
+        will be selected.
     :param time_zone: Time zone offset from UTC. If provided, will adjust date range to
         fetch additional data needed for time zone conversion.
-    :return: A DataFrame containing the downloaded data, combined on the 'time' dimension.
+    :return: The list of CDS requests.
     """
     # split the request by month and variable, handle time zone adjustments
     cds_requests = [
@@ -279,6 +288,74 @@ def download_era5_data(
             f"No valid CDS requests could be created for year {year} and variables {variables}."
         )
 
+    return cds_requests
+
+
+def _download_era5_request(
+    task: tuple[int, tuple],
+) -> tuple[int, dict[str, any] | None, Exception | None]:
+    """Execute a CDS request in a worker process.
+
+    :param task: An (index, :func:`era5epw.utils.execute_download_request` arguments) tuple.
+    :return: The index of the request, its trace, and the error it raised if it failed.
+    """
+    i, args = task
+    try:
+        return i, execute_download_request(*args), None
+    except Exception as e:
+        return i, None, e
+
+
+def download_era5_data(
+    variables: [str],
+    year: int,
+    latitude: float,
+    longitude: float,
+    dataset: str | None = datasets[0],
+    parallel_exec_nb: int = 4,
+    clean_up: bool = True,
+    verbose: bool = False,
+    time_zone: int | None = None,
+    cache_dir: str | None = None,
+    offline: bool = False,
+    report: RunReport | None = None,
+) -> pd.DataFrame:
+    """Download data from the Climate Data Store (CDS) for a specific variable and time and return
+    as a DataFrame.
+
+    :param variables: The variable to download (e.g., '2m_temperature').
+    :param year: The year of the data. Full year will be downloaded.
+    :param latitude: The latitude for the data point.
+    :param longitude: The longitude for the data point.
+    :param dataset: The dataset to use, e.g., 'reanalysis-era5-single-levels-timeseries'. If
+        None, the first dataset supporting the variable will be selected.
+    :param parallel_exec_nb: Number of parallel executions for downloading data. Default is
+        12 (1 per month).
+    :param clean_up: If True, remove individual month files after combining them into the
+        target file.
+    :param verbose: If True, enable verbose logging from CDS client.
+    :param time_zone: Time zone offset from UTC. If provided, will adjust date range to
+        fetch additional data needed for time zone conversion.
+    :param cache_dir: Directory of the download cache. If None, the ERA5EPW_CACHE_DIR
+        environment variable is used, and caching is disabled if it's not set.
+    :param offline: If True, data is only read from the download cache, and missing entries
+        raise an error instead of being downloaded.
+    :param report: Run report to add request traces and planning and assembly timings to.
+    :return: A DataFrame containing the downloaded data, combined on the 'time' dimension.
+    """
+    if report is None:
+        report = RunReport()
+
+    with report.phase("planning"):
+        cds_requests = make_era5_requests(
+            variables=variables,
+            year=year,
+            latitude=latitude,
+            longitude=longitude,
+            dataset=dataset,
+            time_zone=time_zone,
+        )
+
     tqdm.write(
         f"Running a total of {len(cds_requests)} requests "
         f"with {parallel_exec_nb} parallel requests for {year}..."
@@ -299,59 +376,76 @@ def download_era5_data(
             total=len(cds_requests), desc="ERA5 requests", unit="request", position=1, leave=False
         )
 
-        with Pool(parallel_exec_nb) as pool:
-            # Use starmap_async to execute in parallel while maintaining progress tracking
-            result = pool.starmap_async(
-                execute_download_request,
-                [
-                    (
-                        url,
-                        cds_request["dataset"],
-                        cds_request,
-                        intermediary_file,
-                        verbose,
-                    )
-                    for (cds_request, intermediary_file) in zip(cds_requests, intermediate_files)
-                ],
+        tasks = [
+            (
+                i,
+                (
+                    url,
+                    cds_request["dataset"],
+                    cds_request,
+                    intermediary_file,
+                    verbose,
+                    cache_dir,
+                    offline,
+                ),
             )
+            for i, (cds_request, intermediary_file) in enumerate(
+                zip(cds_requests, intermediate_files)
+            )
+        ]
+        traces = [None] * len(cds_requests)
+        errors = {}
+        with Pool(parallel_exec_nb) as pool:
+            # record the outcome of each request as it completes, whether it failed or not
+            for i, trace, error in pool.imap_unordered(_download_era5_request, tasks):
+                if error is None:
+                    traces[i] = trace
+                else:
+                    errors[i] = error
+                    report.add_failure(cds_requests[i]["dataset"], error)
+                era5_progress.update(1)
 
-            # Poll for completion and update progress
-            while not result.ready():
-                # Count completed files to update progress
-                completed = sum(1 for f in intermediate_files if os.path.exists(f))
-                era5_progress.n = completed
-                era5_progress.refresh()
-                result.wait(timeout=1)  # Check every second
+        era5_progress.close()
 
-            # Final update
-            era5_progress.n = len(cds_requests)
-            era5_progress.refresh()
-            _result = result.get()
+        if errors:
+            for trace in traces:
+                if trace is not None:
+                    report.add_request(trace)
+            raise errors[min(errors)]
 
-        era5_progress.close()
+        dfs = []
+        for trace, file_path in zip(traces, intermediate_files):
+            start = time.perf_counter()
+            with profile_section("decode"):
+                dfs.append(unzip_and_load_netcdf_to_df(file_path, clean_up=clean_up))
+            report.add_request(trace, decode_time=time.perf_counter() - start)
 
-        dfs = [
-            unzip_and_load_netcdf_to_df(file_path, clean_up=clean_up)
-            for file_path in intermediate_files
-        ]
+        with report.phase("assembly"), profile_section("assembly"):
+            return combine_era5_dataframes(dfs)
 
-        # concatenate all DataFrames into a single DataFrame
-        # 1. group by year and month, then concatenate along the variable axis
-        dfs_by_year_month = {}
-        for df in dfs:
-            idx = (df.index[0].year, df.index[0].month)
-            if idx not in dfs_by_year_month:
-                dfs_by_year_month[idx] = []
-            dfs_by_year_month[idx].append(df)
-
-        dfs = [
-            pd.concat(year_month_dfs, axis=1)
-            for year_month_dfs in dfs_by_year_month.values()
-            if len(year_month_dfs) > 0
-        ]
 
-        # 2. concatenate along the index (time) axis
-        return pd.concat(dfs, axis=0, ignore_index=False).sort_index().drop_duplicates()
+def combine_era5_dataframes(dfs: list[pd.DataFrame]) -> pd.DataFrame:
+    """Combine the DataFrames of per month and per variable requests into a single DataFrame.
+
+    :param dfs: DataFrames loaded from the downloaded files, one per month and variable.
+    :return: A DataFrame with one column per variable, sorted by time.
+    """
+    # 1. group by year and month, then concatenate along the variable axis
+    dfs_by_year_month = {}
+    for df in dfs:
+        idx = (df.index[0].year, df.index[0].month)
+        if idx not in dfs_by_year_month:
+            dfs_by_year_month[idx] = []
+        dfs_by_year_month[idx].append(df)
+
+    dfs = [
+        pd.concat(year_month_dfs, axis=1)
+        for year_month_dfs in dfs_by_year_month.values()
+        if len(year_month_dfs) > 0
+    ]
+
+    # 2. concatenate along the index (time) axis
+    return pd.concat(dfs, axis=0, ignore_index=False).sort_index().drop_duplicates()
 
 
 if __name__ == "__main__":
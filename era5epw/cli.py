@@ -0,0 +1,374 @@
+"""Command line entry points of era5epw_download, era5epw_visualize, era5epw_compare and
+era5epw_export.
+
+Arguments are parsed before the processing modules are imported, so that ``--help`` and argument
+errors don't pay for importing pandas, xarray, cdsapi and plotly. Keep the imports of this module
+light.
+"""
+
+import argparse
+import os
+import sys
+from contextlib import nullcontext
+from datetime import datetime
+from pathlib import Path
+
+from era5epw.metrics import METRICS_FILE_ENV_VAR
+from era5epw.profiling import add_profile_arguments, make_profiler, profile_section
+
+
+def create_args() -> argparse.ArgumentParser:
+    """Create argument parser for command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Generate a full year EPW file from ERA5 and CAMS data."
+    )
+    parser.add_argument(
+        "--year", type=int, default=2024, help="Year for which to generate the EPW file."
+    )
+    parser.add_argument("--latitude", type=float, default=49.5, help="Latitude of the location.")
+    parser.add_argument("--longitude", type=float, default=2.5, help="Longitude of the location.")
+    parser.add_argument(
+        "--parallel-requests",
+        type=int,
+        default=10,
+        required=False,
+        help="Number of parallel requests to make on CDS API.",
+    )
+    parser.add_argument(
+        "--city-name", type=str, default="Paris", help="Name of the city for the EPW file."
+    )
+    parser.add_argument("--time-zone", type=int, default=1, help="Time zone offset from UTC.")
+    parser.add_argument(
+        "--elevation", type=int, default=35, help="Elevation of the location in meters."
+    )
+    parser.add_argument(
+        "--output_file",
+        type=str,
+        default=f"/tmp/era5epw_{datetime.now().strftime('%Y%m%d_%H%M%S')}.epw",
+        help="Output file path for the generated EPW file.",
+    )
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help="Enable verbose logging from CDS client.",
+    )
+    parser.add_argument(
+        "--apply-time-zone-to-data",
+        action="store_true",
+        help="Apply time zone offset to data timestamps. If false (default), UTC time is kept.",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        default=None,
+        help="Directory of the download cache. Defaults to the ERA5EPW_CACHE_DIR environment "
+        "variable. Caching is disabled if neither is set.",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Only use data from the download cache, never call the CDS/ADS APIs. "
+        "Fails with the list of missing cache entries if some data isn't cached.",
+    )
+    parser.add_argument(
+        "--report-json",
+        type=str,
+        default=None,
+        help="Write a JSON run report to this file: duration of each phase, and queue wait, "
+        "processing, transfer and decode times of each CDS/ADS request.",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        type=str,
+        default=None,
+        help="Add Prometheus metrics of the run (requests, cache hits, latencies, bytes "
+        "downloaded, EPW files written) to this textfile, for node_exporter's textfile "
+        f"collector. Defaults to the {METRICS_FILE_ENV_VAR} environment variable.",
+    )
+    add_profile_arguments(parser, default_output_file="era5epw_download.prof")
+    return parser
+
+
+def download() -> None:
+    """Command-line interface for EPW generation."""
+    args = create_args().parse_args()
+
+    from tqdm.auto import tqdm
+
+    from era5epw.cache import MissingCacheEntriesError
+    from era5epw.logcfg import init_logging
+    from era5epw.main import download_and_make_epw
+
+    # Initialize logging with verbosity setting
+    init_logging(verbose=args.verbose)
+
+    tqdm.write(
+        f"Generating EPW file for {args.city_name} ({args.latitude}, {args.longitude}) in {args.year}..."
+    )
+
+    if os.path.exists(args.output_file):
+        tqdm.write(f"Output file {args.output_file} already exists. It will be overwritten.")
+
+    profiler = make_profiler(args)
+    try:
+        with profiler or nullcontext():
+            download_and_make_epw(
+                year=args.year,
+                latitude=args.latitude,
+                longitude=args.longitude,
+                city_name=args.city_name,
+                time_zone=args.time_zone,
+                elevation=args.elevation,
+                output_file=args.output_file,
+                parallel_exec_nb=args.parallel_requests,
+                verbose=args.verbose,
+                apply_time_zone_to_data=args.apply_time_zone_to_data,
+                cache_dir=args.cache_dir,
+                offline=args.offline,
+                report_file=args.report_json,
+                metrics_file=args.metrics_file,
+            )
+    except MissingCacheEntriesError as e:
+        sys.exit(f"Offline mode: {e}")
+
+    if profiler is not None:
+        tqdm.write(profiler.summary())
+
+
+def create_visualize_args() -> argparse.ArgumentParser:
+    """Create argument parser for the EPW visualization command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Visualize EPW (EnergyPlus Weather) file data with interactive plots."
+    )
+    parser.add_argument(
+        "epw_file",
+        type=str,
+        help="Path to the EPW file to visualize.",
+    )
+    parser.add_argument(
+        "--series",
+        type=str,
+        default="Dry Bulb Temperature",
+        help="Weather series to visualize (e.g., 'Dry Bulb Temperature', 'Wind Speed').",
+    )
+    parser.add_argument(
+        "--type",
+        type=str,
+        choices=["2D", "3D", "heatmap", "radar"],
+        default="2D",
+        help="Type of visualization: 2D (line plot), 3D (surface plot), heatmap (hour by day "
+        "heatmap, a lighter alternative to 3D), or radar (polar plot).",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        help="Path to save the plot as an HTML file. If not provided, opens in browser.",
+    )
+    parser.add_argument(
+        "--list-series",
+        action="store_true",
+        help="List all available weather series in the EPW file and exit.",
+    )
+    add_profile_arguments(parser, default_output_file="era5epw_visualize.prof")
+    return parser
+
+
+def visualize_cli() -> None:
+    """Command-line interface for EPW visualization."""
+    args = create_visualize_args().parse_args()
+
+    # Check if file exists
+    if not Path(args.epw_file).exists():
+        print(f"Error: EPW file not found: {args.epw_file}")
+        return
+
+    from era5epw.epw_cache import read_epw_file_cached
+    from era5epw.visualize import UNITS, get_visible_series, visualize_epw
+
+    # List series if requested
+    if args.list_series:
+        df = read_epw_file_cached(args.epw_file)
+        visible_series = get_visible_series(df)
+        print("Available weather series:")
+        for series in visible_series:
+            unit = UNITS.get(series, "")
+            print(f"  - {series}" + (f" ({unit})" if unit else ""))
+        return
+
+    # Create single visualization
+    profiler = make_profiler(args)
+    try:
+        with profiler or nullcontext():
+            fig = visualize_epw(
+                epw_file_path=args.epw_file,
+                series_name=args.series,
+                plot_type=args.type,
+                show=False,
+            )
+
+            if args.output:
+                with profile_section("write_html"):
+                    fig.write_html(args.output)
+                print(f"Visualization saved to {args.output}")
+            else:
+                fig.show()
+
+        if profiler is not None:
+            print(profiler.summary())
+
+    except Exception as e:
+        print(f"Error creating visualization: {e}")
+        import traceback
+
+        traceback.print_exc()
+
+
+def create_compare_args() -> argparse.ArgumentParser:
+    """Create argument parser for the EPW comparison command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Compare a weather series of several EPW files with interactive plots."
+    )
+    parser.add_argument("epw_files", type=str, nargs="+", help="Paths to the EPW files to compare.")
+    parser.add_argument(
+        "--series",
+        type=str,
+        default="Dry Bulb Temperature",
+        help="Weather series to compare (e.g., 'Dry Bulb Temperature', 'Wind Speed').",
+    )
+    parser.add_argument(
+        "--type",
+        type=str,
+        choices=["overlay", "difference", "distribution"],
+        default="overlay",
+        help="Type of comparison: overlay (series of each file), difference (difference to the "
+        "first file), or distribution (box plots).",
+    )
+    parser.add_argument(
+        "--labels",
+        type=str,
+        nargs="+",
+        help="Label of each file, in the same order. Defaults to the file names.",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        help="Path to save the plot as an HTML file. If not provided, opens in browser.",
+    )
+    add_profile_arguments(parser, default_output_file="era5epw_compare.prof")
+    return parser
+
+
+def compare_cli() -> None:
+    """Command-line interface for EPW comparison."""
+    parser = create_compare_args()
+    args = parser.parse_args()
+
+    missing_files = [epw_file for epw_file in args.epw_files if not Path(epw_file).exists()]
+    if missing_files:
+        print(f"Error: EPW file not found: {', '.join(missing_files)}")
+        return
+    if args.labels is not None and len(args.labels) != len(args.epw_files):
+        parser.error(f"{len(args.labels)} labels for {len(args.epw_files)} EPW files.")
+
+    from era5epw.compare import compare_epw
+
+    profiler = make_profiler(args)
+    try:
+        with profiler or nullcontext():
+            fig = compare_epw(
+                epw_file_paths=args.epw_files,
+                series_name=args.series,
+                plot_type=args.type,
+                labels=args.labels,
+                show=False,
+            )
+
+            if args.output:
+                with profile_section("write_html"):
+                    fig.write_html(args.output)
+                print(f"Comparison saved to {args.output}")
+            else:
+                fig.show()
+
+        if profiler is not None:
+            print(profiler.summary())
+
+    except Exception as e:
+        print(f"Error creating comparison: {e}")
+        import traceback
+
+        traceback.print_exc()
+
+
+def create_export_args() -> argparse.ArgumentParser:
+    """Create argument parser for the batch export command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Export plots of many EPW files as HTML files (and optionally images)."
+    )
+    parser.add_argument(
+        "epw_files",
+        type=str,
+        nargs="+",
+        help="EPW files, or glob patterns of EPW files (e.g. 'output/**/*.epw').",
+    )
+    parser.add_argument(
+        "--output-dir", type=str, required=True, help="Directory where plots are written."
+    )
+    parser.add_argument(
+        "--series",
+        type=str,
+        nargs="+",
+        default=["Dry Bulb Temperature"],
+        help="Weather series to plot.",
+    )
+    parser.add_argument(
+        "--types",
+        type=str,
+        nargs="+",
+        choices=["2D", "3D", "heatmap", "radar"],
+        default=["2D"],
+        help="Types of plot to export.",
+    )
+    parser.add_argument(
+        "--image-format",
+        type=str,
+        choices=["png", "jpeg", "webp", "svg", "pdf"],
+        default=None,
+        help="Also export each plot as a static image of this format (requires kaleido).",
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=None,
+        help="Number of worker processes. Defaults to the number of CPUs.",
+    )
+    return parser
+
+
+def export_cli() -> None:
+    """Command-line interface for the batch export of EPW plots."""
+    parser = create_export_args()
+    args = parser.parse_args()
+
+    from era5epw.export import expand_epw_files, export_plots
+
+    epw_files = expand_epw_files(args.epw_files)
+    if not epw_files:
+        parser.error(f"No EPW files match {' '.join(args.epw_files)}")
+
+    errors = export_plots(
+        epw_files,
+        args.output_dir,
+        series_names=args.series,
+        plot_types=args.types,
+        image_format=args.image_format,
+        processes=args.processes,
+    )
+    print(
+        f"Exported plots of {len(epw_files) - len(errors)} EPW files to {args.output_dir}"
+        + (f", {len(errors)} failed:" if errors else "")
+    )
+    for epw_file, error in sorted(errors.items()):
+        print(f"  - {epw_file}: {error}")
+    if errors:
+        sys.exit(1)
@@ -0,0 +1,310 @@
+"""Comparison of several EPW files, e.g. ERA5 years against a TMY file.
+
+Only the compared series of the files is parsed, in parallel through the cache of parsed EPW
+files, then the series of all files are aligned on a common hour-of-year axis, in a single
+(files, hours) array that all comparison plots are made from.
+"""
+
+import os
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Literal
+
+import numpy as np
+import pandas as pd
+
+from era5epw.epw import EPW_COLUMNS
+from era5epw.epw_cache import get_epw_file_cache
+from era5epw.profiling import profile_section
+from era5epw.visualize import UNITS, get_visible_series
+
+if TYPE_CHECKING:
+    import plotly.graph_objects as go
+
+HOURS_PER_YEAR = 8760
+
+# Year of the timestamps of the hour-of-year axis, a non-leap year
+_REFERENCE_YEAR = 2001
+
+# Colors of the compared files, plotly's default sequence
+_COLORS = [
+    "rgb(31, 119, 180)",
+    "rgb(255, 127, 14)",
+    "rgb(44, 160, 44)",
+    "rgb(214, 39, 40)",
+    "rgb(148, 103, 189)",
+    "rgb(140, 86, 75)",
+    "rgb(227, 119, 194)",
+    "rgb(127, 127, 127)",
+    "rgb(188, 189, 34)",
+    "rgb(23, 190, 207)",
+]
+
+
+def read_epw_files(
+    epw_file_paths: Sequence[str],
+    max_workers: int | None = None,
+    columns: list[str] | None = None,
+) -> list[pd.DataFrame]:
+    """Read EPW files in parallel, through the shared cache of parsed files.
+
+    :param epw_file_paths: Paths to the EPW files.
+    :param max_workers: Number of reading threads. Defaults to one per file, up to 8.
+    :param columns: EPW fields to load, all of them if None.
+    :return: DataFrame of each file, see :func:`era5epw.epw.read_epw_file`.
+    """
+    cache = get_epw_file_cache()
+    # the C parser releases the GIL while tokenizing, threads are enough
+    with ThreadPoolExecutor(max_workers or min(8, len(epw_file_paths)) or 1) as executor:
+        return list(executor.map(lambda path: cache.read(path, columns), epw_file_paths))
+
+
+def hour_of_year(index: pd.DatetimeIndex) -> np.ndarray:
+    """Hour of the year of EPW timestamps, from 0 to 8759.
+
+    Values are for the hour ending at their timestamp: 01:00 on January 1st is hour 0. February
+    29th of leap years has no hour of year (-1), so that all years are aligned on 365 days.
+
+    :param index: Timestamps.
+    :return: Hour of the year of each timestamp, -1 for February 29th.
+    """
+    hour_start = pd.DatetimeIndex(index) - pd.Timedelta(hours=1)
+    day = hour_start.dayofyear.to_numpy() - 1
+    leap = hour_start.is_leap_year
+    # February 29th is the 60th day of leap years
+    feb_29 = leap & (day == 59)
+    day = day - (leap & (day > 59))
+    return np.where(feb_29, -1, day * 24 + hour_start.hour.to_numpy())
+
+
+def align_hour_of_year(dfs: Sequence[pd.DataFrame], series_name: str) -> np.ndarray:
+    """Stack a series of several EPW files on a common hour-of-year axis.
+
+    Files of several years have several values per hour of the year: their mean is used, e.g. to
+    compare a multi-year file against a typical year.
+
+    :param dfs: DataFrames of the files, with a datetime index.
+    :param series_name: Name of the series to stack.
+    :return: Values of shape (files, 8760), NaN where a file has no value.
+    """
+    stacked = np.full((len(dfs), HOURS_PER_YEAR), np.nan)
+    for i, df in enumerate(dfs):
+        hours = hour_of_year(df.index)
+        values = df[series_name].to_numpy(dtype=float)
+        aligned = (hours >= 0) & ~np.isnan(values)
+        counts = np.bincount(hours[aligned], minlength=HOURS_PER_YEAR)
+        sums = np.bincount(hours[aligned], weights=values[aligned], minlength=HOURS_PER_YEAR)
+        with np.errstate(invalid="ignore"):
+            stacked[i] = sums / counts
+    return stacked
+
+
+def make_labels(epw_file_paths: Sequence[str]) -> list[str]:
+    """Labels of compared files: their names, or their paths if names aren't unique."""
+    names = [os.path.basename(path) for path in epw_file_paths]
+    return names if len(set(names)) == len(names) else list(epw_file_paths)
+
+
+def _hour_of_year_axis() -> pd.DatetimeIndex:
+    return pd.date_range(f"{_REFERENCE_YEAR}-01-01 01:00", periods=HOURS_PER_YEAR, freq="h")
+
+
+def _series_title(series_name: str) -> str:
+    unit = UNITS.get(series_name, "")
+    return f"{series_name} ({unit})" if unit else series_name
+
+
+def create_overlay_plot(
+    stacked: np.ndarray,
+    labels: Sequence[str],
+    series_name: str,
+    width: int = 1200,
+    height: int = 500,
+) -> "go.Figure":
+    """Create a line plot of the series of each file over the year.
+
+    :param stacked: Values of shape (files, 8760), see :func:`align_hour_of_year`.
+    :param labels: Label of each file.
+    :param series_name: Name of the compared series.
+    :param width: Width of the plot in pixels.
+    :param height: Height of the plot in pixels.
+    :return: Plotly Figure object.
+    """
+    import plotly.graph_objects as go
+
+    x = _hour_of_year_axis()
+    fig = go.Figure(
+        data=[
+            go.Scattergl(
+                x=x,
+                y=values,
+                mode="lines",
+                name=label,
+                line=dict(color=_COLORS[i % len(_COLORS)], width=1),
+            )
+            for i, (label, values) in enumerate(zip(labels, stacked))
+        ]
+    )
+    fig.update_layout(
+        title=dict(text=f"{series_name} Comparison", font=dict(size=16)),
+        xaxis=dict(title="Date", tickformat="%b %d", automargin=True),
+        yaxis=dict(title=_series_title(series_name), automargin=True),
+        width=width,
+        height=height,
+        margin=dict(t=50, r=20, b=50, l=60),
+        hovermode="x unified",
+    )
+    return fig
+
+
+def create_difference_plot(
+    stacked: np.ndarray,
+    labels: Sequence[str],
+    series_name: str,
+    width: int = 1200,
+    height: int = 500,
+) -> "go.Figure":
+    """Create a line plot of the difference between each file and the first one.
+
+    :param stacked: Values of shape (files, 8760), see :func:`align_hour_of_year`. At least 2
+        files.
+    :param labels: Label of each file, the first one being the reference.
+    :param series_name: Name of the compared series.
+    :param width: Width of the plot in pixels.
+    :param height: Height of the plot in pixels.
+    :return: Plotly Figure object.
+    """
+    import plotly.graph_objects as go
+
+    if len(stacked) < 2:
+        raise ValueError("A difference plot needs at least 2 files.")
+
+    x = _hour_of_year_axis()
+    differences = stacked[1:] - stacked[0]
+    fig = go.Figure(
+        data=[
+            go.Scattergl(
+                x=x,
+                y=values,
+                mode="lines",
+                name=f"{label} - {labels[0]}",
+                line=dict(color=_COLORS[(i + 1) % len(_COLORS)], width=1),
+            )
+            for i, (label, values) in enumerate(zip(labels[1:], differences))
+        ]
+    )
+    fig.add_hline(y=0, line=dict(color="gray", width=1))
+    fig.update_layout(
+        title=dict(text=f"{series_name} Difference to {labels[0]}", font=dict(size=16)),
+        xaxis=dict(title="Date", tickformat="%b %d", automargin=True),
+        yaxis=dict(title=f"Difference of {_series_title(series_name)}", automargin=True),
+        width=width,
+        height=height,
+        margin=dict(t=50, r=20, b=50, l=60),
+        hovermode="x unified",
+    )
+    return fig
+
+
+def create_distribution_plot(
+    stacked: np.ndarray,
+    labels: Sequence[str],
+    series_name: str,
+    width: int = 900,
+    height: int = 500,
+) -> "go.Figure":
+    """Create box plots of the distribution of the series of each file.
+
+    Quartiles are computed for all files at once, and only the statistics are put in the
+    figure, not the hourly values.
+
+    :param stacked: Values of shape (files, 8760), see :func:`align_hour_of_year`.
+    :param labels: Label of each file.
+    :param series_name: Name of the compared series.
+    :param width: Width of the plot in pixels.
+    :param height: Height of the plot in pixels.
+    :return: Plotly Figure object.
+    """
+    import plotly.graph_objects as go
+
+    lowest, q1, median, q3, highest = np.nanpercentile(stacked, [0, 25, 50, 75, 100], axis=1)
+    fig = go.Figure(
+        data=[
+            go.Box(
+                x=list(labels),
+                lowerfence=lowest,
+                q1=q1,
+                median=median,
+                q3=q3,
+                upperfence=highest,
+                mean=np.nanmean(stacked, axis=1),
+                marker=dict(color=_COLORS[0]),
+                showlegend=False,
+            )
+        ]
+    )
+    fig.update_layout(
+        title=dict(text=f"{series_name} Distribution", font=dict(size=16)),
+        yaxis=dict(title=_series_title(series_name), automargin=True),
+        width=width,
+        height=height,
+        margin=dict(t=50, r=20, b=50, l=60),
+    )
+    return fig
+
+
+def compare_epw(
+    epw_file_paths: Sequence[str],
+    series_name: str = "Dry Bulb Temperature",
+    plot_type: Literal["overlay", "difference", "distribution"] = "overlay",
+    labels: Sequence[str] | None = None,
+    show: bool = True,
+    renderer: Literal["notebook", "browser", "iframe"] = "notebook",
+) -> "go.Figure":
+    """Compare a weather series of several EPW files with interactive plots.
+
+    :param epw_file_paths: Paths to the EPW files.
+    :param series_name: Name of the weather series to compare.
+    :param plot_type: Type of plot: "overlay" (series of each file), "difference"
+        (difference to the first file), or "distribution" (box plots).
+    :param labels: Label of each file. Defaults to the file names.
+    :param show: If True, display the plot immediately (useful in Jupyter).
+    :param renderer: Renderer to use for displaying the plot ("notebook", "browser", or
+        "iframe").
+    :return: Plotly Figure object.
+    """
+    if not epw_file_paths:
+        raise ValueError("No EPW files to compare.")
+    labels = list(labels) if labels is not None else make_labels(epw_file_paths)
+    if len(labels) != len(epw_file_paths):
+        raise ValueError(f"{len(labels)} labels for {len(epw_file_paths)} EPW files.")
+
+    # all EPW files have the same fields: the series is checked once for all of them, before
+    # parsing any
+    visible_series = get_visible_series(pd.DataFrame(columns=EPW_COLUMNS))
+    if series_name not in visible_series:
+        raise ValueError(
+            f"Series '{series_name}' not found. Available series: {', '.join(visible_series)}"
+        )
+
+    with profile_section("read_epw"):
+        dfs = read_epw_files(epw_file_paths, columns=[series_name])
+
+    with profile_section("plot"):
+        stacked = align_hour_of_year(dfs, series_name)
+        if plot_type == "overlay":
+            fig = create_overlay_plot(stacked, labels, series_name)
+        elif plot_type == "difference":
+            fig = create_difference_plot(stacked, labels, series_name)
+        elif plot_type == "distribution":
+            fig = create_distribution_plot(stacked, labels, series_name)
+        else:
+            raise ValueError(
+                f"Invalid plot_type: {plot_type}. Must be 'overlay', 'difference', or "
+                "'distribution'."
+            )
+
+    if show:
+        fig.show(renderer=renderer)
+
+    return fig
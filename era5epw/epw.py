@@ -0,0 +1,487 @@
+"""EPW data rows reading and writing.
+
+EPW files are read with pandas' C CSV parser, with explicit column types, and timestamps are
+computed with numpy. Header lines can be read alone, and data rows by chunks, so that scanning
+many files only reads what is needed.
+
+pandas' ``DataFrame.to_csv`` formats every cell through its generic object path. EPW rows are
+written column by column instead: each column is converted to text once with numpy, columns
+holding a single value (most of the 35 EPW fields) are formatted once and repeated, and rows
+are joined into a single block written in one call. The output is identical to
+``df.to_csv(index=False, header=False)``.
+"""
+
+import itertools
+import os
+from collections.abc import Iterator
+
+import numpy as np
+import pandas as pd
+
+# EPW column names as per EnergyPlus EPW format specification
+EPW_COLUMNS = [
+    "Year",
+    "Month",
+    "Day",
+    "Hour",
+    "Minute",
+    "Data Source and Uncertainty Flags",
+    "Dry Bulb Temperature",
+    "Dew Point Temperature",
+    "Relative Humidity",
+    "Atmospheric Station Pressure",
+    "Extraterrestrial Horizontal Radiation",
+    "Extraterrestrial Direct Normal Radiation",
+    "Horizontal Infrared Radiation Intensity",
+    "Global Horizontal Radiation",
+    "Direct Normal Radiation",
+    "Diffuse Horizontal Radiation",
+    "Global Horizontal Illuminance",
+    "Direct Normal Illuminance",
+    "Diffuse Horizontal Illuminance",
+    "Zenith Luminance",
+    "Wind Direction",
+    "Wind Speed",
+    "Total Sky Cover",
+    "Opaque Sky Cover",
+    "Visibility",
+    "Ceiling Height",
+    "Present Weather Observation",
+    "Present Weather Codes",
+    "Precipitable Water",
+    "Aerosol Optical Depth",
+    "Snow Depth",
+    "Days Since Last Snowfall",
+    "Albedo",
+    "Liquid Precipitation Depth",
+    "Liquid Precipitation Quantity",
+]
+
+
+# Number of header lines before the data rows
+EPW_HEADER_LINES = 8
+
+# Time fields are integers, flags and weather codes are read as text, other fields as floats
+EPW_DTYPES = (
+    {column: "float64" for column in EPW_COLUMNS}
+    | {column: "int64" for column in ["Year", "Month", "Day", "Hour", "Minute"]}
+    | {"Data Source and Uncertainty Flags": str, "Present Weather Codes": str}
+)
+
+# Smaller types for analyses of many files: measurements as single precision floats, time fields
+# as small integers, and flags and weather codes, which take few distinct values, as categories
+EPW_COMPACT_DTYPES = (
+    {column: "float32" for column in EPW_COLUMNS}
+    | {"Year": "int16", "Month": "int8", "Day": "int8", "Hour": "int8", "Minute": "int8"}
+    | {"Data Source and Uncertainty Flags": "category", "Present Weather Codes": "category"}
+)
+
+# Fields the datetime index is made from
+_TIME_COLUMNS = ["Year", "Month", "Day", "Hour"]
+
+# Rows of the chunks of iter_epw_file: a month of hourly data
+DEFAULT_CHUNK_SIZE = 24 * 31
+
+
+def make_epw_datetime_index(
+    year: np.ndarray, month: np.ndarray, day: np.ndarray, hour: np.ndarray
+) -> pd.DatetimeIndex:
+    """Make the timestamps of EPW data rows.
+
+    EPW hours go from 1 to 24, hour 24 being midnight of the next day.
+
+    :param year: Year of each row.
+    :param month: Month of each row.
+    :param day: Day of each row.
+    :param hour: Hour of each row.
+    :return: Timestamp of each row.
+    """
+    year, month, day, hour = (
+        np.asarray(values, dtype=np.int64) for values in (year, month, day, hour)
+    )
+    months = (year - 1970) * 12 + month - 1
+    days = months.astype("datetime64[M]").astype("datetime64[D]") + (day - 1)
+    timestamps = days.astype("datetime64[ns]") + hour.astype("timedelta64[h]")
+    return pd.DatetimeIndex(timestamps, name="Datetime")
+
+
+def _read_csv_options(
+    columns: list[str] | None, compact: bool
+) -> tuple[dict[str, any], dict[str, any]]:
+    """Options of ``pd.read_csv`` to read EPW data rows, see :func:`read_epw_file`.
+
+    :return: Column types, and the other options.
+    """
+    if columns is not None:
+        unknown_columns = [column for column in columns if column not in EPW_DTYPES]
+        if unknown_columns:
+            raise ValueError(f"Unknown EPW fields: {', '.join(unknown_columns)}")
+    # time fields are always read, for the index
+    usecols = (
+        EPW_COLUMNS
+        if columns is None
+        else [column for column in EPW_COLUMNS if column in columns or column in _TIME_COLUMNS]
+    )
+    dtypes = EPW_COMPACT_DTYPES if compact else EPW_DTYPES
+    return {column: dtypes[column] for column in usecols}, dict(
+        skiprows=EPW_HEADER_LINES,
+        header=None,
+        names=EPW_COLUMNS,
+        usecols=usecols,
+        index_col=False,
+        engine="c",
+    )
+
+
+def _coerce_dtypes(df: pd.DataFrame, dtypes: dict[str, any]) -> pd.DataFrame:
+    """Convert data rows read as text to their types, invalid numbers becoming missing values."""
+    for column, dtype in dtypes.items():
+        if dtype == "category":
+            df[column] = df[column].astype(dtype)
+        elif dtype != str:
+            df[column] = pd.to_numeric(df[column], errors="coerce").astype(dtype)
+    return df
+
+
+def _set_epw_index(df: pd.DataFrame, columns: list[str] | None) -> pd.DataFrame:
+    """Index data rows by timestamp, and keep the requested columns."""
+    index = make_epw_datetime_index(*(df[column] for column in _TIME_COLUMNS))
+    if columns is not None:
+        df = df[list(columns)]
+    df.index = index
+    return df
+
+
+def read_epw_file(
+    epw_file_path: str, columns: list[str] | None = None, compact: bool = False
+) -> pd.DataFrame:
+    """Read and parse an EPW file into a DataFrame.
+
+    :param epw_file_path: Path to the EPW file.
+    :param columns: EPW fields to load, in the order of the returned columns. All fields are
+        loaded if None.
+    :param compact: If True, use the smaller types of :data:`EPW_COMPACT_DTYPES` instead of
+        :data:`EPW_DTYPES`, e.g. to load many files at once.
+    :return: DataFrame with datetime index and weather data columns.
+    """
+    dtypes, read_csv_options = _read_csv_options(columns, compact)
+    try:
+        df = pd.read_csv(epw_file_path, dtype=dtypes, **read_csv_options)
+    except ValueError:
+        # invalid numbers, e.g. from other EPW sources, are read as missing values
+        df = _coerce_dtypes(pd.read_csv(epw_file_path, dtype=str, **read_csv_options), dtypes)
+    return _set_epw_index(df, columns)
+
+
+def iter_epw_file(
+    epw_file_path: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    columns: list[str] | None = None,
+    compact: bool = False,
+) -> Iterator[pd.DataFrame]:
+    """Read the data rows of an EPW file by chunks, without loading the whole file in memory.
+
+    :param epw_file_path: Path to the EPW file.
+    :param chunk_size: Number of rows of each chunk.
+    :param columns: EPW fields to load, see :func:`read_epw_file`.
+    :param compact: If True, use smaller types, see :func:`read_epw_file`. Text fields are read
+        as text rather than as categories though, as categories would differ between chunks.
+    :return: DataFrames of consecutive rows, as returned by :func:`read_epw_file`.
+    """
+    dtypes, read_csv_options = _read_csv_options(columns, compact)
+    dtypes = {column: str if dtype == "category" else dtype for column, dtype in dtypes.items()}
+    rows = 0
+    with pd.read_csv(
+        epw_file_path, dtype=dtypes, chunksize=chunk_size, **read_csv_options
+    ) as reader:
+        try:
+            for df in reader:
+                rows += len(df)
+                yield _set_epw_index(df, columns)
+            return
+        except ValueError:
+            pass
+
+    # invalid numbers: the file is read again as text, and the rows that weren't yielded yet are
+    # converted. Rows already yielded are skipped by count of parsed rows rather than of lines, as
+    # blank lines aren't rows
+    with pd.read_csv(epw_file_path, dtype=str, chunksize=chunk_size, **read_csv_options) as reader:
+        for df in reader:
+            if rows >= len(df):
+                rows -= len(df)
+                continue
+            if rows:
+                df, rows = df.iloc[rows:].copy(), 0
+            yield _set_epw_index(_coerce_dtypes(df, dtypes), columns)
+
+
+def read_epw_header(epw_file_path: str) -> "EpwData":
+    """Read the header lines of an EPW file, without its data rows, e.g. to filter files by
+    location or data period.
+
+    :param epw_file_path: Path to the EPW file.
+    :return: The header, with no data rows.
+    """
+    with open(epw_file_path) as f:
+        header = [line.rstrip("\r\n") for line in itertools.islice(f, EPW_HEADER_LINES)]
+    if len(header) < EPW_HEADER_LINES:
+        raise ValueError(
+            f"Invalid EPW file {epw_file_path}: {len(header)} lines, "
+            f"expected {EPW_HEADER_LINES} header lines"
+        )
+    return EpwData(header)
+
+
+def format_epw_column(values: np.ndarray) -> np.ndarray:
+    """Convert a column to text, the way ``DataFrame.to_csv`` does: floats with their shortest
+    representation, other values with ``str``, missing values as empty strings.
+
+    EPW fields are rounded and take few distinct values, so numbers are formatted once per
+    distinct value.
+
+    :param values: Column values.
+    :return: Text of each value.
+    """
+    if values.dtype.kind in "fiu":
+        # distinct values by bit pattern, so that -0.0 isn't formatted as 0.0
+        bits = values.view(f"i{values.dtype.itemsize}")
+        codes, unique_bits = pd.factorize(bits)
+        unique_values = unique_bits.view(values.dtype)
+        unique_text = unique_values.astype(str).astype(object)
+        if values.dtype.kind == "f":
+            unique_text[np.isnan(unique_values)] = ""
+        return unique_text[codes]
+    if values.dtype.kind == "b":
+        return values.astype(str)
+
+    text = np.array([str(value) for value in values], dtype=object)
+    text[pd.isna(values)] = ""
+    return text
+
+
+def _is_constant(values: np.ndarray) -> bool:
+    """Check if all values of a column are the same, and would be formatted the same."""
+    if values.dtype.kind in "fiu":
+        # -0.0 == 0.0, but they are formatted differently
+        values = values.view(f"i{values.dtype.itemsize}")
+    elif values.dtype.kind == "O" and pd.isna(values).any():
+        # pd.NA can't be compared
+        return False
+    return bool((values == values[0]).all())
+
+
+def format_epw_rows(df: pd.DataFrame, lineterminator: str = os.linesep) -> str:
+    """Format EPW data rows.
+
+    :param df: EPW data rows, one column per EPW field.
+    :param lineterminator: Line terminator, written after each row.
+    :return: The rows as text, identical to ``df.to_csv(index=False, header=False)``.
+    """
+    if df.empty:
+        return ""
+
+    # constant columns are formatted once
+    columns = []
+    for i in range(df.shape[1]):
+        column = df.iloc[:, i]
+        # nullable extension types are written like Python objects
+        values = column.to_numpy(
+            dtype=object if pd.api.types.is_extension_array_dtype(column) else None
+        )
+        if _is_constant(values):
+            columns.append(format_epw_column(values[:1])[0])
+        else:
+            columns.append(format_epw_column(values).tolist())
+    return _join_rows(columns, len(df), lineterminator)
+
+
+def _join_rows(columns: list[list[str] | str], nb_rows: int, lineterminator: str) -> str:
+    """Join formatted columns into rows.
+
+    Consecutive constant columns are joined once, and the constant columns ending the rows
+    are written with the line terminator as a precomputed suffix of each row.
+
+    :param columns: Text of each column, or a single string for constant columns.
+    :param nb_rows: Number of rows.
+    :param lineterminator: Line terminator, written after each row.
+    :return: The rows as text.
+    """
+    segments = []
+    for column in columns:
+        if isinstance(column, str) and segments and isinstance(segments[-1], str):
+            segments[-1] += "," + column
+        else:
+            segments.append(column)
+
+    if isinstance(segments[-1], str):
+        suffix = "," + segments.pop() + lineterminator
+        if not segments:
+            return suffix[1:] * nb_rows
+    else:
+        suffix = lineterminator
+    segments = [
+        itertools.repeat(segment) if isinstance(segment, str) else segment for segment in segments
+    ]
+    return suffix.join(map(",".join, zip(*segments))) + suffix
+
+
+def format_epw_sites_rows(
+    fields: dict[str, np.ndarray | int | str], lineterminator: str = os.linesep
+) -> list[str]:
+    """Format EPW data rows of several sites at once.
+
+    Each field is formatted once for all sites: sites share most values, so there are few more
+    distinct values to format than for a single site.
+
+    :param fields: EPW fields in EPW order, see :func:`era5epw.main.make_epw_fields`: (sites,
+        hours) arrays, (hours,) arrays shared by all sites, or constants.
+    :param lineterminator: Line terminator, written after each row.
+    :return: The rows of each site as text, identical to :func:`format_epw_rows` on the
+        DataFrame of the site.
+    """
+    sites = max((np.shape(value)[0] for value in fields.values() if np.ndim(value) == 2), default=1)
+
+    # formatted columns of each field, one per site
+    columns = []
+    nb_rows = 1
+    for value in fields.values():
+        values = np.asarray(value)
+        if values.ndim == 0:
+            columns.append([format_epw_column(values.reshape(1))[0]] * sites)
+        elif values.ndim == 1:
+            columns.append([format_epw_column(values).tolist()] * sites)
+        else:
+            columns.append(format_epw_column(values.ravel()).reshape(values.shape).tolist())
+        if values.ndim > 0:
+            nb_rows = values.shape[-1]
+
+    return [
+        _join_rows(list(site_columns), nb_rows, lineterminator) for site_columns in zip(*columns)
+    ]
+
+
+def write_epw_rows(output_file: str, epw_header: list[str], rows: str) -> None:
+    """Write an EPW file from formatted data rows.
+
+    :param output_file: Path of the EPW file.
+    :param epw_header: Header lines, see :func:`era5epw.main.make_epw_header`.
+    :param rows: Data rows, see :func:`format_epw_rows`.
+    """
+    with open(output_file, "w") as f:
+        f.write("".join(line + os.linesep for line in epw_header) + rows)
+
+
+def write_epw_file(output_file: str, epw_header: list[str], df: pd.DataFrame) -> None:
+    """Write an EPW file.
+
+    :param output_file: Path of the EPW file.
+    :param epw_header: Header lines, see :func:`era5epw.main.make_epw_header`.
+    :param df: EPW data rows, see :func:`era5epw.main.make_epw_dataframe`.
+    """
+    write_epw_rows(output_file, epw_header, format_epw_rows(df))
+
+
+class EpwData:
+    """An EPW file in memory: header lines and data rows.
+
+    Serialized on demand, to the same bytes :func:`write_epw_file` writes.
+    """
+
+    def __init__(self, header: list[str], data: pd.DataFrame | None = None):
+        """
+        :param header: Header lines, see :func:`era5epw.main.make_epw_header`.
+        :param data: Data rows, one column per EPW field, see
+            :func:`era5epw.main.make_epw_dataframe`. None when only the header was read, see
+            :func:`read_epw_header`.
+        """
+        self.header = header
+        self.data = data
+
+    @classmethod
+    def read(
+        cls, epw_file_path: str, columns: list[str] | None = None, compact: bool = False
+    ) -> "EpwData":
+        """Read an EPW file.
+
+        :param epw_file_path: Path to the EPW file.
+        :param columns: EPW fields to load, see :func:`read_epw_file`.
+        :param compact: If True, use smaller types, see :func:`read_epw_file`.
+        """
+        return cls(
+            read_epw_header(epw_file_path).header,
+            read_epw_file(epw_file_path, columns=columns, compact=compact),
+        )
+
+    @property
+    def header_fields(self) -> dict[str, list[str]]:
+        """Fields of each header line, by header line name (LOCATION, GROUND TEMPERATURES, ...)."""
+        return {name: fields for name, *fields in (line.split(",") for line in self.header)}
+
+    @property
+    def location(self) -> dict[str, str | float]:
+        """Fields of the LOCATION header line."""
+        (
+            city,
+            state,
+            country,
+            source,
+            wmo,
+            latitude,
+            longitude,
+            time_zone,
+            elevation,
+        ) = self.header_fields["LOCATION"]
+        return {
+            "city": city,
+            "state": state,
+            "country": country,
+            "source": source,
+            "wmo": wmo,
+            "latitude": float(latitude),
+            "longitude": float(longitude),
+            "time_zone": float(time_zone),
+            "elevation": float(elevation),
+        }
+
+    @property
+    def data_periods(self) -> list[dict[str, str | int]]:
+        """Data periods of the DATA PERIODS header line: name, records per hour, day of week of
+        the first day, and first and last days (month/day)."""
+        periods, records_per_hour, *fields = self.header_fields["DATA PERIODS"]
+        return [
+            {
+                "name": name,
+                "records_per_hour": int(records_per_hour),
+                "start_day_of_week": start_day_of_week,
+                "start": start,
+                "end": end,
+            }
+            for name, start_day_of_week, start, end in zip(*[iter(fields)] * 4)
+        ][: int(periods)]
+
+    def to_text(self, lineterminator: str = os.linesep) -> str:
+        """Serialize to EPW text.
+
+        :param lineterminator: Line terminator, written after each line.
+        """
+        if self.data is None:
+            raise ValueError("No data rows, only the EPW header was read")
+        return "".join(line + lineterminator for line in self.header) + format_epw_rows(
+            self.data, lineterminator=lineterminator
+        )
+
+    def to_bytes(self, lineterminator: str = os.linesep) -> bytes:
+        """Serialize to EPW bytes, e.g. to send them over HTTP.
+
+        :param lineterminator: Line terminator, written after each line.
+        """
+        return self.to_text(lineterminator).encode()
+
+    def write(self, output_file: str) -> None:
+        """Write to an EPW file.
+
+        :param output_file: Path of the EPW file.
+        """
+        if self.data is None:
+            raise ValueError("No data rows, only the EPW header was read")
+        write_epw_file(output_file, self.header, self.data)
@@ -0,0 +1,225 @@
+"""Cache of parsed EPW files.
+
+Plotting several series of the same EPW file, e.g. in a notebook, would parse it every time.
+Parsed files are kept in an in-process least recently used cache, and optionally in columnar
+sidecar files (numpy ``.npz``) stored in a cache directory, so that new processes skip parsing
+too.
+
+Files can also be read with only some of their fields, e.g. to compare a series of many files:
+only those fields are parsed, or projected from a file already cached with all its fields.
+
+Entries are invalidated when the EPW file size or modification time changes. A sidecar whose
+modification time doesn't match is still used if the content hash of the file matches, e.g.
+after the file was copied or touched.
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from era5epw.epw import EPW_COLUMNS, EPW_DTYPES, make_epw_datetime_index, read_epw_file
+
+EPW_CACHE_DIR_ENV_VAR = "ERA5EPW_EPW_CACHE_DIR"
+DEFAULT_MAX_ENTRIES = 8
+
+_SIDECAR_SUFFIX = ".npz"
+_TMP_PREFIX = ".tmp-"
+# sidecar arrays that aren't EPW columns
+_SIZE_KEY = "__size__"
+_MTIME_KEY = "__mtime_ns__"
+_SHA256_KEY = "__sha256__"
+# fields the index is made of, always loaded
+_INDEX_COLUMNS = ["Year", "Month", "Day", "Hour"]
+
+
+def hash_file(file_path: str) -> str:
+    """Compute the SHA-256 hexadecimal digest of a file content."""
+    with open(file_path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+class EpwFileCache:
+    """A cache of parsed EPW files, in process and optionally on disk."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, sidecar_dir: str | None = None):
+        """
+        :param max_entries: Maximum number of parsed files kept in process.
+        :param sidecar_dir: Directory where sidecar files are stored. Created if missing. If None,
+            parsed files are only cached in process.
+        """
+        self.max_entries = max_entries
+        self.sidecar_dir = None
+        if sidecar_dir:
+            self.sidecar_dir = os.path.abspath(os.path.expanduser(sidecar_dir))
+            os.makedirs(self.sidecar_dir, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        # (absolute path, fields or None for all of them) -> ((size, modification time),
+        # DataFrame), most recently used last
+        self._entries: OrderedDict[
+            tuple[str, tuple[str, ...] | None], tuple[tuple[int, int], pd.DataFrame]
+        ] = OrderedDict()
+        # files can be read from several threads, see era5epw.compare
+        self._lock = threading.Lock()
+
+    def read(self, epw_file_path: str, columns: list[str] | None = None) -> pd.DataFrame:
+        """Read an EPW file, see :func:`era5epw.epw.read_epw_file`.
+
+        :param epw_file_path: Path to the EPW file.
+        :param columns: EPW fields to load, in the order of the returned columns. All fields are
+            loaded if None. A file already cached with all its fields isn't parsed again.
+        :return: A copy of the cached DataFrame, that callers are free to modify.
+        """
+        path = os.path.abspath(epw_file_path)
+        stat = os.stat(path)
+        stamp = (stat.st_size, stat.st_mtime_ns)
+        key = (path, tuple(columns) if columns is not None else None)
+
+        with self._lock:
+            for cached_key in dict.fromkeys([key, (path, None)]):
+                entry = self._entries.get(cached_key)
+                # unknown fields are left to read_epw_file to report
+                if (
+                    entry is not None
+                    and entry[0] == stamp
+                    and (cached_key == key or set(columns) <= set(entry[1].columns))
+                ):
+                    self._entries.move_to_end(cached_key)
+                    self.hits += 1
+                    # only the requested fields are copied
+                    return (entry[1] if cached_key == key else entry[1][columns]).copy()
+
+        # files are parsed outside of the lock, so that different files are parsed in parallel
+        df = self._read_sidecar(path, stamp, columns) if self.sidecar_dir else None
+        hit = df is not None
+        if not hit:
+            df = read_epw_file(path, columns)
+            # sidecars hold all the fields
+            if self.sidecar_dir and columns is None:
+                self._write_sidecar(path, stamp, df)
+
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self._entries[key] = (stamp, df)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return df.copy()
+
+    def clear(self) -> None:
+        """Clear the in-process cache.
+
+        Sidecar files are kept.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def sidecar_path(self, epw_file_path: str) -> str:
+        """Path of the sidecar file of an EPW file."""
+        key = hashlib.sha256(os.path.abspath(epw_file_path).encode()).hexdigest()
+        return os.path.join(self.sidecar_dir, key + _SIDECAR_SUFFIX)
+
+    def _read_sidecar(
+        self, path: str, stamp: tuple[int, int], columns: list[str] | None = None
+    ) -> pd.DataFrame | None:
+        """Load the parsed EPW file from its sidecar, or return None if it's missing or stale.
+
+        :param columns: EPW fields to load, all of them if None. Only their arrays are read.
+        """
+        # unknown fields aren't in the sidecar: left to read_epw_file to report
+        loaded_columns = (
+            EPW_COLUMNS if columns is None else list(dict.fromkeys(_INDEX_COLUMNS + columns))
+        )
+        try:
+            with np.load(self.sidecar_path(path)) as sidecar:
+                size, mtime_ns = int(sidecar[_SIZE_KEY]), int(sidecar[_MTIME_KEY])
+                sha256 = str(sidecar[_SHA256_KEY])
+                if size != stamp[0]:
+                    return None
+                if mtime_ns != stamp[1] and sha256 != hash_file(path):
+                    return None
+                arrays = {column: sidecar[column] for column in loaded_columns}
+        except (OSError, ValueError, KeyError):
+            # missing, or written by another version
+            return None
+
+        for column in loaded_columns:
+            if EPW_DTYPES[column] is str:
+                # missing text values are stored as empty strings
+                values = arrays[column].astype(object)
+                values[values == ""] = np.nan
+                arrays[column] = values
+        df = pd.DataFrame(
+            {column: arrays[column] for column in (EPW_COLUMNS if columns is None else columns)},
+            index=make_epw_datetime_index(*(arrays[column] for column in _INDEX_COLUMNS)),
+            copy=False,
+        )
+        if mtime_ns != stamp[1] and columns is None:
+            # same content, e.g. a copied or touched file: store the new modification time, so
+            # that the file isn't hashed again on the next reads
+            self._write_sidecar(path, stamp, df, sha256=sha256)
+        return df
+
+    def _write_sidecar(
+        self, path: str, stamp: tuple[int, int], df: pd.DataFrame, sha256: str | None = None
+    ) -> None:
+        """Store a parsed EPW file in its sidecar. Errors are ignored, the sidecar is optional.
+
+        :param sha256: Hash of the EPW file, computed if None.
+        """
+        columns = {
+            column: (df[column].fillna("").to_numpy(dtype=str) if dtype is str else df[column])
+            for column, dtype in EPW_DTYPES.items()
+        }
+        tmp_file = None
+        try:
+            fd, tmp_file = tempfile.mkstemp(dir=self.sidecar_dir, prefix=_TMP_PREFIX)
+            with os.fdopen(fd, "wb") as f:
+                np.savez(
+                    f,
+                    **columns,
+                    **{
+                        _SIZE_KEY: stamp[0],
+                        _MTIME_KEY: stamp[1],
+                        _SHA256_KEY: sha256 if sha256 is not None else hash_file(path),
+                    },
+                )
+            os.replace(tmp_file, self.sidecar_path(path))
+        except OSError:
+            if tmp_file is not None and os.path.exists(tmp_file):
+                os.remove(tmp_file)
+
+
+_default_cache: EpwFileCache | None = None
+
+
+def get_epw_file_cache() -> EpwFileCache:
+    """Return the cache of parsed EPW files shared in the process.
+
+    Sidecar files are stored in the directory given by the ERA5EPW_EPW_CACHE_DIR environment
+    variable, if set.
+    """
+    global _default_cache
+    sidecar_dir = os.getenv(EPW_CACHE_DIR_ENV_VAR)
+    if sidecar_dir:
+        sidecar_dir = os.path.abspath(os.path.expanduser(sidecar_dir))
+    if _default_cache is None or _default_cache.sidecar_dir != (sidecar_dir or None):
+        _default_cache = EpwFileCache(sidecar_dir=sidecar_dir)
+    return _default_cache
+
+
+def read_epw_file_cached(epw_file_path: str) -> pd.DataFrame:
+    """Read an EPW file through the shared cache, see :func:`get_epw_file_cache`.
+
+    :param epw_file_path: Path to the EPW file.
+    :return: DataFrame with datetime index and weather data columns.
+    """
+    return get_epw_file_cache().read(epw_file_path)
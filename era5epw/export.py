@@ -0,0 +1,174 @@
+"""Batch export of EPW visualizations, e.g. for the QA of generated EPW files.
+
+Each EPW file is handled by a worker process, which parses it once and writes the plots of
+all the requested series and plot types. Workers import plotly once, and reuse it for all
+the files they handle. HTML files reference a single plotly.js bundle written next to them,
+instead of embedding it in each file.
+"""
+
+import glob
+import os
+import re
+from collections.abc import Sequence
+from multiprocessing import Pool
+
+PLOT_TYPES = ["2D", "3D", "heatmap", "radar"]
+IMAGE_FORMATS = ["png", "jpeg", "webp", "svg", "pdf"]
+
+
+def expand_epw_files(patterns: Sequence[str]) -> list[str]:
+    """List the EPW files matching glob patterns, e.g. 'output/**/*.epw'.
+
+    :param patterns: Glob patterns or file paths.
+    :return: Matching files, sorted and without duplicates.
+    """
+    return sorted({path for pattern in patterns for path in glob.glob(pattern, recursive=True)})
+
+
+def make_epw_names(epw_files: Sequence[str]) -> list[str]:
+    """Names of EPW files in plot file names: their file names without extension, or their paths
+    relative to their common directory if file names aren't unique, e.g. 'site_a_2024'.
+
+    :param epw_files: Paths to the EPW files.
+    :return: Name of each file.
+    """
+    names = [os.path.splitext(os.path.basename(epw_file))[0] for epw_file in epw_files]
+    if len(set(names)) < len(names):
+        paths = [os.path.abspath(epw_file) for epw_file in epw_files]
+        common_dir = os.path.commonpath([os.path.dirname(path) for path in paths])
+        names = [
+            os.path.splitext(os.path.relpath(path, common_dir))[0].replace(os.sep, "_")
+            for path in paths
+        ]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(
+            f"Several EPW files would have the same plot names: {', '.join(duplicates)}"
+        )
+    return names
+
+
+def make_plot_file_name(epw_name: str, series_name: str, plot_type: str) -> str:
+    """Name of the file of a plot, without extension, e.g. 'paris_2024_dry_bulb_temperature_2d'.
+
+    :param epw_name: Name of the EPW file, see :func:`make_epw_names`.
+    :param series_name: Name of the plotted series.
+    :param plot_type: Type of plot.
+    """
+    series = re.sub(r"[^a-z0-9]+", "_", series_name.lower()).strip("_")
+    return f"{epw_name}_{series}_{plot_type.lower()}"
+
+
+def _export_epw_file(
+    task: tuple[str, str, list[str], list[str], str, str | None]
+) -> tuple[str, list[str], str | None]:
+    """Write the plots of an EPW file.
+
+    :param task: An (EPW file, EPW name, series names, plot types, output directory, image
+        format) tuple.
+    :return: The EPW file, the written files, and an error message if plotting failed.
+    """
+    from era5epw.epw import read_epw_file
+    from era5epw.visualize import (
+        create_2d_plot,
+        create_3d_plot,
+        create_heatmap_plot,
+        create_radar_plot,
+    )
+
+    epw_file, epw_name, series_names, plot_types, output_dir, image_format = task
+    create_plot = {
+        "2D": create_2d_plot,
+        "3D": create_3d_plot,
+        "heatmap": create_heatmap_plot,
+        "radar": create_radar_plot,
+    }
+    written = []
+    try:
+        df = read_epw_file(epw_file)
+        for series_name in series_names:
+            for plot_type in plot_types:
+                fig = create_plot[plot_type](df, series_name)
+                output_file = os.path.join(
+                    output_dir, make_plot_file_name(epw_name, series_name, plot_type)
+                )
+                fig.write_html(output_file + ".html", include_plotlyjs="directory")
+                written.append(output_file + ".html")
+                if image_format is not None:
+                    fig.write_image(f"{output_file}.{image_format}")
+                    written.append(f"{output_file}.{image_format}")
+    except Exception as e:
+        return epw_file, written, f"{type(e).__name__}: {e}"
+    return epw_file, written, None
+
+
+def _init_worker() -> None:
+    """Import plotly and load its default template once per worker process."""
+    import plotly.graph_objects as go
+
+    go.Figure()
+
+
+def export_plots(
+    epw_files: Sequence[str],
+    output_dir: str,
+    series_names: Sequence[str] = ("Dry Bulb Temperature",),
+    plot_types: Sequence[str] = ("2D",),
+    image_format: str | None = None,
+    processes: int | None = None,
+) -> dict[str, str]:
+    """Export the plots of several EPW files.
+
+    For each EPW file, series and plot type, an HTML file is written in the output directory,
+    with a plotly.min.js bundle shared by all of them. Files are named after the EPW files, see
+    :func:`make_epw_names`.
+
+    :param epw_files: Paths to the EPW files.
+    :param output_dir: Directory where plots are written. Created if missing.
+    :param series_names: Names of the series to plot.
+    :param plot_types: Types of plot: "2D", "3D", "heatmap", or "radar".
+    :param image_format: If set, also write each plot as a static image of this format (one of
+        :data:`IMAGE_FORMATS`). Requires kaleido.
+    :param processes: Number of worker processes. Defaults to the number of CPUs.
+    :return: Error message of each EPW file that failed.
+    """
+    from tqdm.auto import tqdm
+
+    unknown_plot_types = [plot_type for plot_type in plot_types if plot_type not in PLOT_TYPES]
+    if unknown_plot_types:
+        raise ValueError(
+            f"Invalid plot types: {', '.join(unknown_plot_types)}. "
+            f"Must be one of {', '.join(PLOT_TYPES)}."
+        )
+    if image_format is not None and image_format not in IMAGE_FORMATS:
+        raise ValueError(
+            f"Invalid image format: {image_format}. Must be one of {', '.join(IMAGE_FORMATS)}."
+        )
+
+    epw_names = make_epw_names(epw_files)
+
+    os.makedirs(output_dir, exist_ok=True)
+    # written once here, rather than checked for by each worker. An existing bundle is replaced,
+    # it may be of another plotly version than the one writing the plots
+    from plotly.offline import get_plotlyjs
+
+    with open(os.path.join(output_dir, "plotly.min.js"), "w", encoding="utf-8") as f:
+        f.write(get_plotlyjs())
+
+    tasks = [
+        (epw_file, epw_name, list(series_names), list(plot_types), output_dir, image_format)
+        for epw_file, epw_name in zip(epw_files, epw_names)
+    ]
+    errors = {}
+    if not tasks:
+        return errors
+
+    progress = tqdm(total=len(tasks), desc="EPW files", unit="file")
+    with Pool(min(processes or os.cpu_count() or 1, len(tasks)), initializer=_init_worker) as pool:
+        for epw_file, _, error in pool.imap_unordered(_export_epw_file, tasks):
+            if error is not None:
+                errors[epw_file] = error
+            progress.update(1)
+    progress.close()
+
+    return errors
@@ -1,14 +1,29 @@
 import logging
-import os.path
-from argparse import ArgumentParser
+from collections.abc import Iterator
 from datetime import datetime
 
 import numpy as np
 import pandas as pd
 from tqdm.auto import tqdm
 
-from era5epw.ads import download_cams_solar_radiation_data
-from era5epw.cds import download_era5_data
+from era5epw.ads import dataset as cams_dataset
+from era5epw.ads import (
+    download_cams_solar_radiation_data,
+    make_cams_solar_radiation_request,
+)
+from era5epw.cache import MissingCacheEntriesError, get_download_cache
+from era5epw.cds import download_era5_data, epw_variables, make_era5_requests
+from era5epw.cli import download  # noqa: F401, moved to era5epw.cli
+from era5epw.epw import write_epw_file  # noqa: F401, moved to era5epw.epw
+from era5epw.epw import EpwData, format_epw_sites_rows, write_epw_rows
+from era5epw.metrics import get_metrics_file, track_run
+from era5epw.profiling import profile_section
+from era5epw.report import RunReport
+from era5epw.solar import calc_extraterrestrial_radiation
+from era5epw.utils import describe_request
+
+# W/(m^2.K^4)
+STEFAN_BOLTZMANN = 5.6697e-8
 
 
 def get_first_weekday_of_year(y: int) -> str:
@@ -29,6 +44,29 @@ def calc_rh(dry_bulb_temp: np.ndarray, dew_point_temp: np.ndarray) -> np.ndarray
     return np.round(100 * esd / es, 1)
 
 
+def calc_horizontal_infrared_radiation(
+    dry_bulb_temp: np.ndarray, dew_point_temp: np.ndarray, opaque_sky_cover: np.ndarray
+) -> np.ndarray:
+    """Calculate horizontal infrared radiation intensity from the sky, with the sky model
+    EnergyPlus uses when it's missing from the weather file: Clark & Allen sky emissivity,
+    corrected for cloud cover.
+
+    Arrays of any shape can be passed, e.g. (sites, hours) for several sites.
+
+    :param dry_bulb_temp: Temperature in Celsius.
+    :param dew_point_temp: Dew point temperature in Celsius.
+    :param opaque_sky_cover: Opaque sky cover in tenths (0-10 scale).
+    :return: Horizontal infrared radiation intensity in Wh/m^2.
+    """
+    sky_emissivity = (0.787 + 0.764 * np.log((dew_point_temp + 273.15) / 273.0)) * (
+        1
+        + 0.0224 * opaque_sky_cover
+        - 0.0035 * opaque_sky_cover**2
+        + 0.00028 * opaque_sky_cover**3
+    )
+    return np.round(sky_emissivity * STEFAN_BOLTZMANN * (dry_bulb_temp + 273.15) ** 4, 0)
+
+
 def calc_monthly_soil_temperature(soil_temp: pd.DataFrame | pd.Series) -> pd.Series:
     """Compute monthly average soil temperature at 0-7 cm depth (level 1)
 
@@ -52,132 +90,78 @@ def make_data_period_end_date(df: pd.DataFrame) -> str:
     return df.iloc[-1][["Month", "Day"]].astype(int).astype(str).str.cat(sep="/")
 
 
-def create_args() -> ArgumentParser:
-    """Create argument parser for command line arguments."""
-    import argparse
-
-    parser = argparse.ArgumentParser(
-        description="Generate a full year EPW file from ERA5 and CAMS data."
-    )
-    parser.add_argument(
-        "--year", type=int, default=2024, help="Year for which to generate the EPW file."
-    )
-    parser.add_argument("--latitude", type=float, default=49.5, help="Latitude of the location.")
-    parser.add_argument("--longitude", type=float, default=2.5, help="Longitude of the location.")
-    parser.add_argument(
-        "--parallel-requests",
-        type=int,
-        default=10,
-        required=False,
-        help="Number of parallel requests to make on CDS API.",
-    )
-    parser.add_argument(
-        "--city-name", type=str, default="Paris", help="Name of the city for the EPW file."
-    )
-    parser.add_argument("--time-zone", type=int, default=1, help="Time zone offset from UTC.")
-    parser.add_argument(
-        "--elevation", type=int, default=35, help="Elevation of the location in meters."
-    )
-    parser.add_argument(
-        "--output_file",
-        type=str,
-        default=f"/tmp/era5epw_{datetime.now().strftime('%Y%m%d_%H%M%S')}.epw",
-        help="Output file path for the generated EPW file.",
-    )
-    parser.add_argument(
-        "--verbose",
-        action="store_true",
-        help="Enable verbose logging from CDS client.",
-    )
-    parser.add_argument(
-        "--apply-time-zone-to-data",
-        action="store_true",
-        help="Apply time zone offset to data timestamps. If false (default), UTC time is kept.",
-    )
-    return parser
-
-
-def download_and_make_epw(
+def check_offline_cache(
     year: int,
     latitude: float,
     longitude: float,
-    city_name: str,
-    time_zone: int,
-    elevation: int,
-    output_file: str,
-    parallel_exec_nb: int = 10,
-    verbose: bool = False,
-    apply_time_zone_to_data: bool = False,
+    time_zone: int | None,
+    cache_dir: str | None = None,
 ) -> None:
-    """Generate a full year EPW file from ERA5 and CAMS data.
+    """Check that all the data needed to generate an EPW file is in the download cache.
 
     :param year: Year for which to generate the EPW file.
     :param latitude: Latitude of the location.
     :param longitude: Longitude of the location.
-    :param city_name: Name of the city for the EPW file.
-    :param time_zone: Time zone offset from UTC.
-    :param elevation: Elevation of the location in meters.
-    :param output_file: Path to save the generated EPW file.
-    :param parallel_exec_nb: Number of parallel requests to make on CDS (ERA5 allows 10 per
-        minute).
-    :param verbose: If True, enable verbose logging from CDS client.
-    :param apply_time_zone_to_data: If True, apply time zone offset to data timestamps.
+    :param time_zone: Time zone offset from UTC if it's applied to data, None otherwise.
+    :param cache_dir: Directory of the download cache. If None, the ERA5EPW_CACHE_DIR
+        environment variable is used.
+    :raises MissingCacheEntriesError: If some entries are missing from the cache.
     """
-    start_time = datetime.now()
-
-    # Log whether time zone is being applied to data
-    if apply_time_zone_to_data:
-        logging.info(
-            f"Time zone offset of {time_zone:+d} hours will be applied to data timestamps."
+    cache = get_download_cache(cache_dir)
+    if cache is None:
+        raise ValueError(
+            "Offline mode requires a download cache. "
+            "Use cache_dir or set the ERA5EPW_CACHE_DIR environment variable."
         )
-    else:
-        logging.info(
-            f"Data will use UTC time. Time zone offset of {time_zone:+d} hours "
-            "will only be used in EPW LOCATION header."
-        )
-
-    # Create overall progress bar for the two main download phases
-    overall_progress = tqdm(total=2, desc="Overall progress", unit="phase", position=0)
 
-    overall_progress.set_description("Downloading CAMS solar radiation data")
-    cams_df = download_cams_solar_radiation_data(
-        longitude=longitude,
-        latitude=latitude,
-        year=year,
-        time_zone=time_zone if apply_time_zone_to_data else None,
+    cams_request = make_cams_solar_radiation_request(
+        longitude=longitude, latitude=latitude, year=year, time_zone=time_zone
     )
-    overall_progress.update(1)  # CAMS download completed
+    if cams_request is None:
+        raise ValueError("Cannot download data for future years.")
+
+    planned_requests = [(cams_dataset, cams_request)] + [
+        (cds_request["dataset"], cds_request)
+        for cds_request in make_era5_requests(
+            variables=epw_variables,
+            year=year,
+            latitude=latitude,
+            longitude=longitude,
+            dataset=None,
+            time_zone=time_zone,
+        )
+    ]
 
-    overall_progress.set_description("Downloading ERA5 data")
-    era5_df = download_era5_data(
-        variables=[
-            "2m_temperature",
-            "2m_dewpoint_temperature",
-            "surface_pressure",
-            "10m_u_component_of_wind",
-            "10m_v_component_of_wind",
-            "total_cloud_cover",
-            "uv_visible_albedo_for_direct_radiation",
-            "snow_depth",
-            "soil_temperature_level_1",
-            "total_precipitation",
-        ],
-        year=year,
-        latitude=latitude,
-        longitude=longitude,
-        parallel_exec_nb=parallel_exec_nb,
-        dataset=None,  # dynamic dataset selection based on variables
-        verbose=verbose,
-        time_zone=time_zone if apply_time_zone_to_data else None,
-    )
-    overall_progress.update(1)  # ERA5 download completed
-    overall_progress.close()
+    missing = [
+        entry
+        for dataset, request in planned_requests
+        if not cache.contains(dataset, request)
+        for entry in describe_request(dataset, request)
+    ]
+    if missing:
+        raise MissingCacheEntriesError(missing)
 
+
+def align_era5_and_cams_data(
+    era5_df: pd.DataFrame,
+    cams_df: pd.DataFrame,
+    year: int,
+    time_shift: int | None = None,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Restrict ERA5 and CAMS data to the target year and align them on the same time index.
+
+    :param era5_df: ERA5 data, indexed by UTC time.
+    :param cams_df: CAMS solar radiation data, indexed by UTC time.
+    :param year: Target year.
+    :param time_shift: Time zone offset in hours to apply to data timestamps, None to keep
+        UTC.
+    :return: The aligned ERA5 and CAMS DataFrames.
+    """
     # Apply time zone shift if requested
-    if apply_time_zone_to_data:
-        logging.info(f"Applying time zone offset of {time_zone:+d} hours to data timestamps.")
-        era5_df.index = era5_df.index + pd.Timedelta(hours=time_zone)
-        cams_df.index = cams_df.index + pd.Timedelta(hours=time_zone)
+    if time_shift is not None:
+        logging.info(f"Applying time zone offset of {time_shift:+d} hours to data timestamps.")
+        era5_df.index = era5_df.index + pd.Timedelta(hours=time_shift)
+        cams_df.index = cams_df.index + pd.Timedelta(hours=time_shift)
 
     # Filter to keep only data within the target year
     # (filters out extra days added for time zone or to accommodate with missing first hour)
@@ -191,70 +175,245 @@ def download_and_make_epw(
     era5_df, cams_df = era5_df.align(cams_df, join="inner", axis=0)
     assert era5_df.index.equals(cams_df.index), "Time indices of ERA5 and CAMS data do not match"
 
+    return era5_df, cams_df
+
+
+# ERA5 and CAMS variables EPW fields are computed from
+ERA5_FIELDS_VARIABLES = ["t2m", "d2m", "sp", "u10", "v10", "tcc", "aluvp", "sd", "tp"]
+CAMS_FIELDS_VARIABLES = ["GHI", "BNI", "BHI", "DHI"]
+
+
+def make_epw_fields(
+    era5: pd.DataFrame | dict[str, np.ndarray],
+    cams: pd.DataFrame | dict[str, np.ndarray],
+    times: pd.DatetimeIndex,
+    latitude: float | np.ndarray | None = None,
+    longitude: float | np.ndarray | None = None,
+    time_shift: int | None = None,
+) -> dict[str, np.ndarray | int | str]:
+    """Convert aligned ERA5 and CAMS data to EPW fields, for one or several sites.
+
+    Variables are either (hours,) arrays of a single site, or (sites, hours) arrays of
+    several sites sharing the same time index. Each conversion is a single numpy call on the
+    whole array.
+
+    :param era5: ERA5 data by variable name, aligned with CAMS data.
+    :param cams: CAMS solar radiation data by variable name, aligned with ERA5 data.
+    :param times: Time index of the data.
+    :param latitude: Latitude of the site(s), used for the extraterrestrial radiation
+        fields. They are set as missing if latitude or longitude is None.
+    :param longitude: Longitude of the site(s).
+    :param time_shift: Time zone offset in hours applied to data timestamps (see
+        align_era5_and_cams_data), None if they're UTC.
+    :return: EPW fields in EPW order. Time fields are (hours,) arrays, and fields without
+        data are constants.
+    """
     # Extract variables, convert to correct units
-    temp_C = era5_df["t2m"].values - 273.15  # K to C
-    dew_C = era5_df["d2m"].values - 273.15  # K to C
-    press = era5_df["sp"].values  # Pa
-    u10 = era5_df["u10"].values  # m/s
-    v10 = era5_df["v10"].values  # m/s
-    cloud = era5_df["tcc"].values * 10  # Fraction to okta (0-10 scale)
-    uv_visible_albedo = era5_df["aluvp"].values  # (0-1 scale)
-    snow_depth = era5_df["sd"].values * 100  # m to cm
-    total_precipitation = era5_df["tp"].values * 1000  # m to mm
-    ghi = cams_df["GHI"].values  # Global horizontal all sky irradiation in Wh/m^2
-    bni = cams_df["BNI"].values  # Direct normal all sky irradiation in Wh/m^2
-    bhi = cams_df["BHI"].values  # Direct horizontal all sky irradiation in Wh/m^2
-    dhi = cams_df["DHI"].values  # Diffuse horizontal irradiation in Wh/m^2
+    temp_C = np.asarray(era5["t2m"]) - 273.15  # K to C
+    dew_C = np.asarray(era5["d2m"]) - 273.15  # K to C
+    press = np.asarray(era5["sp"])  # Pa
+    u10 = np.asarray(era5["u10"])  # m/s
+    v10 = np.asarray(era5["v10"])  # m/s
+    cloud = np.asarray(era5["tcc"]) * 10  # Fraction to okta (0-10 scale)
+    uv_visible_albedo = np.asarray(era5["aluvp"])  # (0-1 scale)
+    snow_depth = np.asarray(era5["sd"]) * 100  # m to cm
+    total_precipitation = np.asarray(era5["tp"]) * 1000  # m to mm
+    ghi = np.asarray(cams["GHI"])  # Global horizontal all sky irradiation in Wh/m^2
+    bni = np.asarray(cams["BNI"])  # Direct normal all sky irradiation in Wh/m^2
+    bhi = np.asarray(cams["BHI"])  # Direct horizontal all sky irradiation in Wh/m^2
+    dhi = np.asarray(cams["DHI"])  # Diffuse horizontal irradiation in Wh/m^2
 
     # Calculate wind speed and direction
     wind_speed = np.sqrt(u10**2 + v10**2)
     wind_dir = (180 + np.degrees(np.arctan2(u10, v10))) % 360
 
+    # Calculate infrared radiation from the sky
+    infrared = calc_horizontal_infrared_radiation(temp_C, dew_C, cloud)
+
     # Time index
-    times = pd.to_datetime(era5_df.index.values)
-
-    # Create DataFrame
-    df = pd.DataFrame(
-        {
-            "Year": times.year,
-            "Month": times.month,
-            "Day": times.day,
-            "Hour": times.hour + 1,  # EPW hours start at 1
-            "Minute": 0,
-            "Data Source and Uncertainty Flags": "9",
-            "Dry Bulb Temperature": np.round(temp_C, 1),  # C
-            "Dew Point Temperature": np.round(dew_C, 1),  # C
-            "Relative Humidity": calc_rh(temp_C, dew_C),  # %
-            "Atmospheric Station Pressure": np.round(press, 0),  # Pa
-            "Extraterrestrial Horizontal Radiation": 9999,  # Wh/m^2
-            "Extraterrestrial Direct Normal Radiation": 9999,  # Wh/m^2
-            "Horizontal Infrared Radiation Intensity": 9999,  # Wh/m^2 - TODO
-            "Global Horizontal Radiation": np.round(ghi, 1),  # Wh/m^2
-            "Direct Normal Radiation": np.round(bni, 1),  # Wh/m^2
-            "Diffuse Horizontal Radiation": np.round(dhi, 1),  # Wh/m^2
-            "Global Horizontal Illuminance": np.round(110 * ghi, 0),  # Lux
-            "Direct Normal Illuminance": np.round(105 * bni, 0),  # Lux
-            "Diffuse Horizontal Illuminance": np.round(119 * dhi, 0),  # Lux
-            "Zenith Luminance": 9999,  # Cd/m^2 - TODO
-            "Wind Direction": np.round(wind_dir, 0),  # degrees
-            "Wind Speed": np.round(wind_speed, 1),  # m/s
-            "Total Sky Cover": np.round(cloud, 0),
-            "Opaque Sky Cover": np.round(cloud, 0),
-            "Visibility": 9999,  # km
-            "Ceiling Height": 77777,  # m - TODO
-            # 0 = Weather observation made; 9 = Weather observation not made, or missing
-            "Present Weather Observation": 0,
-            "Present Weather Codes": 999999999,  # see doc
-            "Precipitable Water": 999,  # mm
-            "Aerosol Optical Depth": 999,  # thousandths
-            "Snow Depth": np.round(snow_depth, 1),  # cm
-            "Days Since Last Snowfall": 99,
-            "Albedo": np.round(uv_visible_albedo, 1),  # (0 - 1 scale)
-            "Liquid Precipitation Depth": np.round(total_precipitation, 1),  # mm
-            "Liquid Precipitation Quantity": 1,
-        }
+    times = pd.DatetimeIndex(times)
+
+    # Extraterrestrial radiation over each hour
+    if latitude is not None and longitude is not None:
+        utc_times = times if time_shift is None else times - pd.Timedelta(hours=time_shift)
+        extra_horizontal, extra_direct_normal = calc_extraterrestrial_radiation(
+            utc_times, latitude, longitude
+        )
+        extra_horizontal = np.round(extra_horizontal, 0)
+        extra_direct_normal = np.where(extra_horizontal > 0, np.round(extra_direct_normal, 0), 0)
+    else:
+        extra_horizontal = extra_direct_normal = 9999
+
+    return {
+        "Year": times.year,
+        "Month": times.month,
+        "Day": times.day,
+        "Hour": times.hour + 1,  # EPW hours start at 1
+        "Minute": 0,
+        "Data Source and Uncertainty Flags": "9",
+        "Dry Bulb Temperature": np.round(temp_C, 1),  # C
+        "Dew Point Temperature": np.round(dew_C, 1),  # C
+        "Relative Humidity": calc_rh(temp_C, dew_C),  # %
+        "Atmospheric Station Pressure": np.round(press, 0),  # Pa
+        "Extraterrestrial Horizontal Radiation": extra_horizontal,  # Wh/m^2
+        "Extraterrestrial Direct Normal Radiation": extra_direct_normal,  # Wh/m^2
+        "Horizontal Infrared Radiation Intensity": infrared,  # Wh/m^2
+        "Global Horizontal Radiation": np.round(ghi, 1),  # Wh/m^2
+        "Direct Normal Radiation": np.round(bni, 1),  # Wh/m^2
+        "Diffuse Horizontal Radiation": np.round(dhi, 1),  # Wh/m^2
+        "Global Horizontal Illuminance": np.round(110 * ghi, 0),  # Lux
+        "Direct Normal Illuminance": np.round(105 * bni, 0),  # Lux
+        "Diffuse Horizontal Illuminance": np.round(119 * dhi, 0),  # Lux
+        "Zenith Luminance": 9999,  # Cd/m^2 - TODO
+        "Wind Direction": np.round(wind_dir, 0),  # degrees
+        "Wind Speed": np.round(wind_speed, 1),  # m/s
+        "Total Sky Cover": np.round(cloud, 0),
+        "Opaque Sky Cover": np.round(cloud, 0),
+        "Visibility": 9999,  # km
+        "Ceiling Height": 77777,  # m - TODO
+        # 0 = Weather observation made; 9 = Weather observation not made, or missing
+        "Present Weather Observation": 0,
+        "Present Weather Codes": 999999999,  # see doc
+        "Precipitable Water": 999,  # mm
+        "Aerosol Optical Depth": 999,  # thousandths
+        "Snow Depth": np.round(snow_depth, 1),  # cm
+        "Days Since Last Snowfall": 99,
+        "Albedo": np.round(uv_visible_albedo, 1),  # (0 - 1 scale)
+        "Liquid Precipitation Depth": np.round(total_precipitation, 1),  # mm
+        "Liquid Precipitation Quantity": 1,
+    }
+
+
+def make_epw_dataframe(
+    era5_df: pd.DataFrame,
+    cams_df: pd.DataFrame,
+    latitude: float | None = None,
+    longitude: float | None = None,
+    time_shift: int | None = None,
+) -> pd.DataFrame:
+    """Build the EPW data rows from aligned ERA5 and CAMS data.
+
+    :param era5_df: ERA5 data, aligned with CAMS data.
+    :param cams_df: CAMS solar radiation data, aligned with ERA5 data.
+    :param latitude: Latitude of the location, used for the extraterrestrial radiation
+        fields. They are set as missing if latitude or longitude is None.
+    :param longitude: Longitude of the location.
+    :param time_shift: Time zone offset in hours applied to data timestamps (see
+        align_era5_and_cams_data), None if they're UTC.
+    :return: DataFrame with one column per EPW field.
+    """
+    return pd.DataFrame(
+        make_epw_fields(era5_df, cams_df, era5_df.index, latitude, longitude, time_shift)
+    )
+
+
+def _check_sites_data(
+    era5_dfs: list[pd.DataFrame],
+    cams_dfs: list[pd.DataFrame],
+    latitudes: list[float],
+    longitudes: list[float],
+) -> None:
+    """Check that the data of several sites can be converted together."""
+    if not len(era5_dfs) == len(cams_dfs) == len(latitudes) == len(longitudes):
+        raise ValueError("ERA5 data, CAMS data, latitudes and longitudes must have one per site.")
+    times = era5_dfs[0].index
+    if not all(df.index.equals(times) for df in era5_dfs + cams_dfs):
+        raise ValueError("All sites must have the same time index.")
+
+
+def _iter_epw_fields(
+    era5_dfs: list[pd.DataFrame],
+    cams_dfs: list[pd.DataFrame],
+    latitudes: list[float],
+    longitudes: list[float],
+    time_shift: int | None,
+    block_size: int,
+) -> Iterator[dict[str, np.ndarray | int | str]]:
+    """Convert the data of sites to EPW fields by blocks of sites, see make_epw_dataframes."""
+    times = era5_dfs[0].index
+    for i in range(0, len(era5_dfs), block_size):
+        block = slice(i, i + block_size)
+        yield make_epw_fields(
+            era5={
+                var: np.stack([df[var].values for df in era5_dfs[block]])
+                for var in ERA5_FIELDS_VARIABLES
+            },
+            cams={
+                var: np.stack([df[var].values for df in cams_dfs[block]])
+                for var in CAMS_FIELDS_VARIABLES
+            },
+            times=times,
+            latitude=np.asarray(latitudes[block], dtype=float),
+            longitude=np.asarray(longitudes[block], dtype=float),
+            time_shift=time_shift,
+        )
+
+
+def _make_site_dataframe(fields: dict[str, np.ndarray | int | str], site: int) -> pd.DataFrame:
+    """EPW data rows of a site from fields of several sites, as views on the fields arrays."""
+    return pd.DataFrame(
+        {name: value[site] if np.ndim(value) == 2 else value for name, value in fields.items()},
+        copy=False,
     )
 
+
+def make_epw_dataframes(
+    era5_dfs: list[pd.DataFrame],
+    cams_dfs: list[pd.DataFrame],
+    latitudes: list[float],
+    longitudes: list[float],
+    time_shift: int | None = None,
+    block_size: int = 32,
+) -> Iterator[pd.DataFrame]:
+    """Build the EPW data rows of several sites at once.
+
+    Data of a block of sites are stacked in (sites, hours) arrays and converted together,
+    see make_epw_fields, then split into one DataFrame per site. Blocks keep the arrays
+    small enough to stay in CPU caches.
+
+    :param era5_dfs: ERA5 data of each site, aligned with CAMS data. All sites must have the
+        same time index, e.g. the same year and time shift.
+    :param cams_dfs: CAMS solar radiation data of each site, aligned with ERA5 data.
+    :param latitudes: Latitude of each site.
+    :param longitudes: Longitude of each site.
+    :param time_shift: Time zone offset in hours applied to data timestamps (see
+        align_era5_and_cams_data), None if they're UTC.
+    :param block_size: Number of sites converted together.
+    :return: EPW data rows of each site, see make_epw_dataframe. Blocks are converted as the
+        DataFrames are iterated.
+    """
+    _check_sites_data(era5_dfs, cams_dfs, latitudes, longitudes)
+    return (
+        _make_site_dataframe(fields, site)
+        for fields in _iter_epw_fields(
+            era5_dfs, cams_dfs, latitudes, longitudes, time_shift, block_size
+        )
+        for site in range(len(fields["Dry Bulb Temperature"]))
+    )
+
+
+def make_epw_header(
+    df: pd.DataFrame,
+    era5_df: pd.DataFrame,
+    year: int,
+    city_name: str,
+    latitude: float,
+    longitude: float,
+    time_zone: int,
+    elevation: int,
+) -> list[str]:
+    """Build the EPW header lines.
+
+    :param df: EPW data rows, see make_epw_dataframe.
+    :param era5_df: ERA5 data, used for ground temperatures.
+    :param year: Year of the data.
+    :param city_name: Name of the city.
+    :param latitude: Latitude of the location.
+    :param longitude: Longitude of the location.
+    :param time_zone: Time zone offset from UTC.
+    :param elevation: Elevation of the location in meters.
+    :return: The 8 header lines.
+    """
     ground_temps = "1,3.5,,,," + ",".join(
         calc_monthly_soil_temperature(era5_df["stl1"]).round(1).astype(str).tolist()
     )
@@ -267,7 +426,6 @@ def download_and_make_epw(
 
     data_period_end_date = make_data_period_end_date(df)
 
-    # Write header
     epw_header = [
         f"LOCATION,{city_name},,,ERA5 (ECMWF),n/a,{latitude:.2f},{longitude:.2f},{time_zone},{elevation}",
         "DESIGN CONDITIONS,0",
@@ -279,43 +437,266 @@ def download_and_make_epw(
         f"DATA PERIODS,1,1,Data,{get_first_weekday_of_year(year)},1/1,{data_period_end_date}",
     ]
 
-    with open(output_file, "w") as f:
-        for line in epw_header:
-            f.write(line + os.linesep)
-        df.to_csv(f, index=False, header=False, lineterminator=os.linesep)
+    return epw_header
 
-    end_time = datetime.now()
-    tqdm.write(f"EPW file written as {output_file}. Took {end_time - start_time} to generate.")
 
+def make_epw_files(
+    era5_dfs: list[pd.DataFrame],
+    cams_dfs: list[pd.DataFrame],
+    year: int,
+    sites: list[dict[str, any]],
+    output_files: list[str],
+    time_shift: int | None = None,
+    block_size: int = 32,
+) -> None:
+    """Build and write the EPW files of several sites.
+
+    Conversions are done by blocks of sites like in make_epw_dataframes, and the data rows
+    of a block are formatted together (see era5epw.epw.format_epw_sites_rows). Only one
+    block is kept in memory.
+
+    :param era5_dfs: ERA5 data of each site, aligned with CAMS data. All sites must have the
+        same time index, e.g. the same year and time shift.
+    :param cams_dfs: CAMS solar radiation data of each site, aligned with ERA5 data.
+    :param year: Year of the data.
+    :param sites: Location of each site: city_name, latitude, longitude, time_zone and
+        elevation, see make_epw_header.
+    :param output_files: Path of the EPW file of each site.
+    :param time_shift: Time zone offset in hours applied to data timestamps (see
+        align_era5_and_cams_data), None if they're UTC.
+    :param block_size: Number of sites converted together.
+    """
+    if len(output_files) != len(sites):
+        raise ValueError("Sites and output files must have the same length.")
+    latitudes = [site["latitude"] for site in sites]
+    longitudes = [site["longitude"] for site in sites]
+    _check_sites_data(era5_dfs, cams_dfs, latitudes, longitudes)
+
+    blocks = _iter_epw_fields(
+        era5_dfs, cams_dfs, latitudes, longitudes, time_shift=time_shift, block_size=block_size
+    )
+    for i, fields in zip(range(0, len(sites), block_size), blocks):
+        for site, rows in enumerate(format_epw_sites_rows(fields), start=i):
+            epw_header = make_epw_header(
+                df=_make_site_dataframe(fields, site - i),
+                era5_df=era5_dfs[site],
+                year=year,
+                **sites[site],
+            )
+            write_epw_rows(output_file=output_files[site], epw_header=epw_header, rows=rows)
+
+
+def download_epw(
+    year: int,
+    latitude: float,
+    longitude: float,
+    city_name: str,
+    time_zone: int,
+    elevation: int,
+    parallel_exec_nb: int = 10,
+    verbose: bool = False,
+    apply_time_zone_to_data: bool = False,
+    cache_dir: str | None = None,
+    offline: bool = False,
+    report: RunReport | None = None,
+) -> EpwData:
+    """Generate a full year of EPW data from ERA5 and CAMS data, in memory.
 
-def download():
-    from era5epw.logcfg import init_logging
+    Nothing is written to the filesystem, besides the download cache: the returned EPW data
+    can be serialized with EpwData.to_bytes, or written with EpwData.write.
 
-    args = create_args().parse_args()
+    :param year: Year for which to generate the EPW data.
+    :param latitude: Latitude of the location.
+    :param longitude: Longitude of the location.
+    :param city_name: Name of the city for the EPW header.
+    :param time_zone: Time zone offset from UTC.
+    :param elevation: Elevation of the location in meters.
+    :param parallel_exec_nb: Number of parallel requests to make on CDS (ERA5 allows 10 per
+        minute).
+    :param verbose: If True, enable verbose logging from CDS client.
+    :param apply_time_zone_to_data: If True, apply time zone offset to data timestamps.
+    :param cache_dir: Directory of the download cache. If None, the ERA5EPW_CACHE_DIR
+        environment variable is used, and caching is disabled if it's not set.
+    :param offline: If True, only use data from the download cache and never call the
+        CDS/ADS APIs. Raises MissingCacheEntriesError listing the missing entries if some
+        data isn't cached.
+    :param report: If provided, phase durations and CDS/ADS request traces are added to this
+        run report. Use era5epw.metrics.track_run to export them as metrics.
+    :return: The EPW header and data rows.
+    """
+    if report is None:
+        report = RunReport()
+
+    if offline:
+        # fail fast, before any processing
+        with report.phase("planning"):
+            check_offline_cache(
+                year=year,
+                latitude=latitude,
+                longitude=longitude,
+                time_zone=time_zone if apply_time_zone_to_data else None,
+                cache_dir=cache_dir,
+            )
 
-    # Initialize logging with verbosity setting
-    init_logging(verbose=args.verbose)
+    # Log whether time zone is being applied to data
+    if apply_time_zone_to_data:
+        logging.info(
+            f"Time zone offset of {time_zone:+d} hours will be applied to data timestamps."
+        )
+    else:
+        logging.info(
+            f"Data will use UTC time. Time zone offset of {time_zone:+d} hours "
+            "will only be used in EPW LOCATION header."
+        )
 
-    tqdm.write(
-        f"Generating EPW file for {args.city_name} ({args.latitude}, {args.longitude}) in {args.year}..."
-    )
+    # Create overall progress bar for the two main download phases
+    overall_progress = tqdm(total=2, desc="Overall progress", unit="phase", position=0)
 
-    if os.path.exists(args.output_file):
-        tqdm.write(f"Output file {args.output_file} already exists. It will be overwritten.")
+    overall_progress.set_description("Downloading CAMS solar radiation data")
+    with report.phase("cams"):
+        cams_df = download_cams_solar_radiation_data(
+            longitude=longitude,
+            latitude=latitude,
+            year=year,
+            time_zone=time_zone if apply_time_zone_to_data else None,
+            cache_dir=cache_dir,
+            offline=offline,
+            report=report,
+        )
+    overall_progress.update(1)  # CAMS download completed
 
-    download_and_make_epw(
-        year=args.year,
-        latitude=args.latitude,
-        longitude=args.longitude,
-        city_name=args.city_name,
-        time_zone=args.time_zone,
-        elevation=args.elevation,
-        output_file=args.output_file,
-        parallel_exec_nb=args.parallel_requests,
-        verbose=args.verbose,
-        apply_time_zone_to_data=args.apply_time_zone_to_data,
+    overall_progress.set_description("Downloading ERA5 data")
+    with report.phase("era5"):
+        era5_df = download_era5_data(
+            variables=epw_variables,
+            year=year,
+            latitude=latitude,
+            longitude=longitude,
+            parallel_exec_nb=parallel_exec_nb,
+            dataset=None,  # dynamic dataset selection based on variables
+            verbose=verbose,
+            time_zone=time_zone if apply_time_zone_to_data else None,
+            cache_dir=cache_dir,
+            offline=offline,
+            report=report,
+        )
+    overall_progress.update(1)  # ERA5 download completed
+    overall_progress.close()
+
+    with report.phase("assembly"), profile_section("assembly"):
+        era5_df, cams_df = align_era5_and_cams_data(
+            era5_df=era5_df,
+            cams_df=cams_df,
+            year=year,
+            time_shift=time_zone if apply_time_zone_to_data else None,
+        )
+        df = make_epw_dataframe(
+            era5_df=era5_df,
+            cams_df=cams_df,
+            latitude=latitude,
+            longitude=longitude,
+            time_shift=time_zone if apply_time_zone_to_data else None,
+        )
+        epw_header = make_epw_header(
+            df=df,
+            era5_df=era5_df,
+            year=year,
+            city_name=city_name,
+            latitude=latitude,
+            longitude=longitude,
+            time_zone=time_zone,
+            elevation=elevation,
+        )
+
+    return EpwData(header=epw_header, data=df)
+
+
+def download_and_make_epw(
+    year: int,
+    latitude: float,
+    longitude: float,
+    city_name: str,
+    time_zone: int,
+    elevation: int,
+    output_file: str,
+    parallel_exec_nb: int = 10,
+    verbose: bool = False,
+    apply_time_zone_to_data: bool = False,
+    cache_dir: str | None = None,
+    offline: bool = False,
+    report_file: str | None = None,
+    metrics_file: str | None = None,
+) -> dict[str, any]:
+    """Generate a full year EPW file from ERA5 and CAMS data.
+
+    :param year: Year for which to generate the EPW file.
+    :param latitude: Latitude of the location.
+    :param longitude: Longitude of the location.
+    :param city_name: Name of the city for the EPW file.
+    :param time_zone: Time zone offset from UTC.
+    :param elevation: Elevation of the location in meters.
+    :param output_file: Path to save the generated EPW file.
+    :param parallel_exec_nb: Number of parallel requests to make on CDS (ERA5 allows 10 per
+        minute).
+    :param verbose: If True, enable verbose logging from CDS client.
+    :param apply_time_zone_to_data: If True, apply time zone offset to data timestamps.
+    :param cache_dir: Directory of the download cache. If None, the ERA5EPW_CACHE_DIR
+        environment variable is used, and caching is disabled if it's not set.
+    :param offline: If True, only use data from the download cache and never call the CDS/ADS
+        APIs. Raises MissingCacheEntriesError listing the missing entries if some data isn't
+        cached.
+    :param report_file: If provided, the run report is written to this file as JSON.
+    :param metrics_file: If provided, Prometheus metrics of the run are added to this textfile
+        (see :mod:`era5epw.metrics`). If None, the ERA5EPW_METRICS_FILE environment variable is
+        used, and metrics aren't written if it's not set.
+    :return: The run report: duration of each phase and trace of each CDS/ADS request (see
+        :class:`era5epw.report.RunReport`).
+    """
+    start_time = datetime.now()
+    report = RunReport(
+        year=year,
+        latitude=latitude,
+        longitude=longitude,
+        time_zone=time_zone,
+        apply_time_zone_to_data=apply_time_zone_to_data,
+        parallel_exec_nb=parallel_exec_nb,
+        offline=offline,
     )
 
+    # metrics are updated even if the run fails, see era5epw.metrics
+    with track_run(
+        report,
+        cache_enabled=get_download_cache(cache_dir) is not None,
+        metrics_file=get_metrics_file(metrics_file),
+    ):
+        epw = download_epw(
+            year=year,
+            latitude=latitude,
+            longitude=longitude,
+            city_name=city_name,
+            time_zone=time_zone,
+            elevation=elevation,
+            parallel_exec_nb=parallel_exec_nb,
+            verbose=verbose,
+            apply_time_zone_to_data=apply_time_zone_to_data,
+            cache_dir=cache_dir,
+            offline=offline,
+            report=report,
+        )
+
+        with report.phase("epw_write"), profile_section("epw_write"):
+            epw.write(output_file)
+
+    report.finish()
+    end_time = datetime.now()
+    tqdm.write(f"EPW file written as {output_file}. Took {end_time - start_time} to generate.")
+
+    if report_file is not None:
+        report.write(report_file)
+        tqdm.write(f"Run report written as {report_file}.")
+
+    return report.to_dict()
+
 
 if __name__ == "__main__":
     download_and_make_epw(
@@ -0,0 +1,422 @@
+"""Prometheus metrics of EPW generation and CDS/ADS requests.
+
+Metrics are collected in the process-wide :data:`registry`, from the run report of each EPW
+generation (see :func:`track_run`) and from prefetched requests. They are exposed in the
+Prometheus text format:
+
+- as a textfile, for node_exporter's textfile collector: pass ``--metrics-file`` on the command
+  line, or set the ERA5EPW_METRICS_FILE environment variable. Runs writing to the same file add up
+  their counts, so the file can be shared by a fleet of short-lived jobs on a host.
+- through a local HTTP endpoint (``/metrics``) for long-running processes: see
+  :func:`serve_metrics` and the ``--metrics-port`` option of ``era5epw_prefetch``.
+
+Only the standard library is used, the ``prometheus_client`` package isn't needed.
+"""
+
+import fcntl
+import math
+import os
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Iterator
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from era5epw.report import RunReport
+
+METRICS_FILE_ENV_VAR = "ERA5EPW_METRICS_FILE"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# CDS/ADS queue waits range from seconds to hours when the service is congested
+QUEUE_BUCKETS = (1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600, 7200, 14400)
+PROCESSING_BUCKETS = (1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+TRANSFER_BUCKETS = (0.1, 0.5, 1, 2, 5, 10, 30, 60, 120, 300)
+RUN_BUCKETS = (10, 30, 60, 120, 300, 600, 1800, 3600, 7200, 14400, 28800)
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        for value in labels.values()
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _parse_value(value: str) -> float:
+    return float(value.replace("Inf", "inf"))
+
+
+class _Metric(ABC):
+    """Base class of metrics."""
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        """
+        :param name: Metric name.
+        :param documentation: Help text of the metric.
+        :param labelnames: Names of the labels of the metric.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: dict[tuple[str, ...], any] = {}
+        self._lock = threading.Lock()
+
+    def _label_values(self, labels: dict[str, str]) -> tuple[str, ...]:
+        assert set(labels) == set(
+            self.labelnames
+        ), f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}."
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    @property
+    def sample_names(self) -> set[str]:
+        """Names of the samples of the metric in the text format."""
+        return {self.name}
+
+    @abstractmethod
+    def samples(self) -> dict[str, float]:
+        """Samples of the metric, by sample name and labels as in the text format."""
+
+
+class Counter(_Metric):
+    """A monotonic counter, with optional labels.
+
+    Its name should end with _total.
+    """
+
+    type = "counter"
+
+    def inc(self, value: float = 1, **labels: str) -> None:
+        """Increment the counter.
+
+        :param value: Increment, must be positive.
+        :param labels: Label values.
+        """
+        assert value >= 0, "Counters can only be incremented."
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + value
+
+    def get(self, **labels: str) -> float:
+        """Current value of the counter for the given label values."""
+        return self._values.get(self._label_values(labels), 0.0)
+
+    def samples(self) -> dict[str, float]:
+        with self._lock:
+            return {
+                self.name + _format_labels(dict(zip(self.labelnames, key))): value
+                for key, value in self._values.items()
+            }
+
+
+class Histogram(_Metric):
+    """A histogram of observed values, with optional labels."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = TRANSFER_BUCKETS,
+    ):
+        """
+        :param name: Metric name.
+        :param documentation: Help text of the metric.
+        :param labelnames: Names of the labels of the metric.
+        :param buckets: Upper bounds of the buckets, in ascending order. An infinite bucket is
+            added.
+        """
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # label values -> [count per bucket, sum, count]
+        self._values: dict[tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        """Add an observation.
+
+        :param value: The observed value.
+        :param labels: Label values.
+        """
+        key = self._label_values(labels)
+        with self._lock:
+            state = self._values.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            for i, upper_bound in enumerate(self.buckets):
+                if value <= upper_bound:
+                    state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def get(self, **labels: str) -> float:
+        """Number of observations for the given label values."""
+        state = self._values.get(self._label_values(labels))
+        return state[2] if state is not None else 0
+
+    @property
+    def sample_names(self) -> set[str]:
+        return {f"{self.name}_bucket", f"{self.name}_sum", f"{self.name}_count"}
+
+    def samples(self) -> dict[str, float]:
+        samples = {}
+        with self._lock:
+            for key, (bucket_counts, total, count) in self._values.items():
+                labels = dict(zip(self.labelnames, key))
+                for upper_bound, bucket_count in zip(self.buckets, bucket_counts):
+                    bucket_labels = _format_labels(labels | {"le": _format_value(upper_bound)})
+                    samples[f"{self.name}_bucket{bucket_labels}"] = bucket_count
+                samples[f"{self.name}_sum{_format_labels(labels)}"] = total
+                samples[f"{self.name}_count{_format_labels(labels)}"] = count
+        return samples
+
+
+class MetricsRegistry:
+    """A set of metrics, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self.metrics: list[_Metric] = []
+        # textfile -> samples already added to it
+        self._written: dict[str, dict[str, float]] = {}
+        self._write_lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        """Create and register a counter."""
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = TRANSFER_BUCKETS,
+    ) -> Histogram:
+        """Create and register a histogram."""
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def _register(self, metric: _Metric) -> _Metric:
+        assert all(m.name != metric.name for m in self.metrics), f"{metric.name} is registered."
+        self.metrics.append(metric)
+        return metric
+
+    def samples(self) -> dict[str, float]:
+        """Samples of all metrics, by sample name and labels."""
+        samples = {}
+        for metric in self.metrics:
+            samples.update(metric.samples())
+        return samples
+
+    def render(self, samples: dict[str, float] | None = None) -> str:
+        """Render metrics in the Prometheus text format.
+
+        :param samples: Samples to render, by default the current samples of the metrics.
+        """
+        if samples is None:
+            samples = self.samples()
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for key, value in samples.items():
+                if key.split("{", 1)[0] in metric.sample_names:
+                    lines.append(f"{key} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, metrics_file: str) -> None:
+        """Add metrics to a Prometheus textfile.
+
+        Samples already in the file are added up with the metrics of this process, so that
+        several processes can report to the same file. The file is replaced atomically, as
+        expected by node_exporter's textfile collector.
+
+        :param metrics_file: Path of the textfile, should have a .prom extension.
+        """
+        with self._write_lock:
+            samples = self.samples()
+            written = self._written.get(metrics_file, {})
+            with open(f"{metrics_file}.lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    file_samples = read_textfile(metrics_file)
+                    for key, value in samples.items():
+                        file_samples[key] = file_samples.get(key, 0) + value - written.get(key, 0)
+
+                    fd, tmp_file = tempfile.mkstemp(
+                        dir=os.path.dirname(os.path.abspath(metrics_file)), prefix=".tmp-"
+                    )
+                    with os.fdopen(fd, "w") as f:
+                        f.write(self.render(file_samples))
+                    os.chmod(tmp_file, 0o644)
+                    os.replace(tmp_file, metrics_file)
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+            self._written[metrics_file] = samples
+
+
+def read_textfile(metrics_file: str) -> dict[str, float]:
+    """Read the samples of a Prometheus textfile, by sample name and labels.
+
+    :param metrics_file: Path of the textfile. If it doesn't exist, no sample is returned.
+    """
+    if not os.path.exists(metrics_file):
+        return {}
+    samples = {}
+    with open(metrics_file) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                key, value = line.rsplit(" ", 1)
+                samples[key] = _parse_value(value)
+    return samples
+
+
+registry = MetricsRegistry()
+
+requests_total = registry.counter(
+    "era5epw_requests_total",
+    "CDS/ADS download requests, by outcome: downloaded, cache_hit or error.",
+    ("dataset", "outcome"),
+)
+cache_lookups_total = registry.counter(
+    "era5epw_cache_lookups_total",
+    "Download cache lookups, by result: hit or miss.",
+    ("dataset", "result"),
+)
+downloaded_bytes_total = registry.counter(
+    "era5epw_downloaded_bytes_total",
+    "Bytes downloaded from the CDS/ADS APIs.",
+    ("dataset",),
+)
+epw_files_total = registry.counter(
+    "era5epw_epw_files_total",
+    "EPW generation runs, by outcome: written or error.",
+    ("outcome",),
+)
+queue_wait_seconds = registry.histogram(
+    "era5epw_request_queue_wait_seconds",
+    "Time CDS/ADS requests waited in the queue.",
+    ("dataset",),
+    QUEUE_BUCKETS,
+)
+processing_seconds = registry.histogram(
+    "era5epw_request_processing_seconds",
+    "Time CDS/ADS requests were processed.",
+    ("dataset",),
+    PROCESSING_BUCKETS,
+)
+transfer_seconds = registry.histogram(
+    "era5epw_request_transfer_seconds",
+    "Time spent downloading CDS/ADS request results.",
+    ("dataset",),
+    TRANSFER_BUCKETS,
+)
+run_duration_seconds = registry.histogram(
+    "era5epw_run_duration_seconds",
+    "Duration of EPW generation runs, by outcome.",
+    ("outcome",),
+    RUN_BUCKETS,
+)
+
+
+def observe_request(trace: dict[str, any], cache_enabled: bool = True) -> None:
+    """Update metrics with a request trace.
+
+    :param trace: The request trace, see :meth:`era5epw.recorder.RequestRecorder.to_trace`.
+    :param cache_enabled: If True, the download cache was looked up before downloading.
+    """
+    dataset = trace["dataset"]
+    if trace.get("cache_hit"):
+        requests_total.inc(dataset=dataset, outcome="cache_hit")
+        cache_lookups_total.inc(dataset=dataset, result="hit")
+        return
+
+    requests_total.inc(dataset=dataset, outcome="downloaded")
+    if cache_enabled:
+        cache_lookups_total.inc(dataset=dataset, result="miss")
+    downloaded_bytes_total.inc(trace.get("bytes", 0), dataset=dataset)
+    queue_wait_seconds.observe(trace.get("queue_wait", 0.0), dataset=dataset)
+    processing_seconds.observe(trace.get("processing", 0.0), dataset=dataset)
+    transfer_seconds.observe(trace.get("transfer_time", 0.0), dataset=dataset)
+
+
+def observe_request_error(dataset: str) -> None:
+    """Count a failed request."""
+    requests_total.inc(dataset=dataset, outcome="error")
+
+
+def get_metrics_file(metrics_file: str | None = None) -> str | None:
+    """Get the metrics textfile, from the argument or the ERA5EPW_METRICS_FILE environment
+    variable.
+
+    None if metrics aren't written to a file.
+    """
+    return metrics_file or os.getenv(METRICS_FILE_ENV_VAR) or None
+
+
+@contextmanager
+def track_run(
+    report: RunReport, cache_enabled: bool = False, metrics_file: str | None = None
+) -> Iterator[None]:
+    """Update metrics with an EPW generation run once it's done, successful or not.
+
+    :param report: The run report, holding the traces of the requests of the run.
+    :param cache_enabled: If True, the download cache is enabled for the run.
+    :param metrics_file: If provided, metrics are added to this Prometheus textfile after the
+        run (see :meth:`MetricsRegistry.write_textfile`).
+    """
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "written"
+    finally:
+        for trace in report.requests:
+            observe_request(trace, cache_enabled=cache_enabled)
+        for failure in report.failures:
+            observe_request_error(failure["dataset"])
+        epw_files_total.inc(outcome=outcome)
+        run_duration_seconds.observe(time.perf_counter() - start, outcome=outcome)
+        if metrics_file is not None:
+            registry.write_textfile(metrics_file)
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        # scrapes would flood the console
+        pass
+
+
+def serve_metrics(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve the metrics on http://host:port/metrics, from a background thread.
+
+    :param port: Port to listen on, 0 to pick a free port (see ``server.server_port``).
+    :param host: Interface to listen on, the loopback interface by default. Use "" to listen on
+        all interfaces.
+    :return: The HTTP server. Call ``shutdown()`` to stop it.
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsRequestHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="era5epw-metrics", daemon=True).start()
+    return server
@@ -0,0 +1,381 @@
+"""Cache warming: download ERA5 and CAMS data for a set of sites and years ahead of demand.
+
+Results are stored in the download cache, so that generating EPW files for these sites and years
+afterward doesn't hit the CDS/ADS APIs. Progress is tracked per cell in a manifest file, which
+allows an interrupted prefetch to resume where it stopped.
+"""
+
+import argparse
+import json
+import math
+import os
+import tempfile
+from collections import Counter
+from datetime import datetime
+from multiprocessing import Pool
+
+from tqdm.auto import tqdm
+
+from era5epw import ads, cds, metrics
+from era5epw.cache import CACHE_DIR_ENV_VAR, get_download_cache, make_cache_key
+from era5epw.utils import execute_download_request
+
+
+def make_sites_grid(
+    north: float, west: float, south: float, east: float, step: float = 0.25
+) -> list[tuple[float, float]]:
+    """List the grid points inside a bounding box, ERA5 grid resolution being 0.25 degrees.
+
+    Points are multiples of the grid step, so a box without any grid point inside gives no
+    sites.
+
+    :param north: Northern latitude of the bounding box.
+    :param west: Western longitude of the bounding box.
+    :param south: Southern latitude of the bounding box.
+    :param east: Eastern longitude of the bounding box.
+    :param step: Grid step in degrees.
+    :return: List of (latitude, longitude) tuples.
+    """
+    assert north >= south, "North latitude must be greater than or equal to south latitude."
+    assert east >= west, "East longitude must be greater than or equal to west longitude."
+
+    # grid indices of the points inside the box, bounds being included up to rounding errors
+    first_lat, last_lat = math.ceil(south / step - 1e-9), math.floor(north / step + 1e-9)
+    first_lon, last_lon = math.ceil(west / step - 1e-9), math.floor(east / step + 1e-9)
+    return [
+        (round(i * step, 4), round(j * step, 4))
+        for i in range(first_lat, last_lat + 1)
+        for j in range(first_lon, last_lon + 1)
+    ]
+
+
+def make_cell_id(latitude: float, longitude: float, year: int) -> str:
+    """Identifier of a cell in the prefetch manifest."""
+    return f"{latitude},{longitude}/{year}"
+
+
+def make_prefetch_plan(
+    sites: list[tuple[float, float]],
+    years: list[int],
+    variables: list[str] = cds.epw_variables,
+    include_cams: bool = True,
+    time_zone: int | None = None,
+) -> list[tuple[str, str, str, dict[str, any]]]:
+    """Create the list of requests needed to prefetch data for a set of sites and years.
+
+    The requests are the same as the ones made when generating EPW files, so that they are
+    served from the cache afterward.
+
+    :param sites: List of (latitude, longitude) tuples.
+    :param years: List of years.
+    :param variables: ERA5 variables to prefetch.
+    :param include_cams: If True, also prefetch CAMS solar radiation data.
+    :param time_zone: Time zone offset from UTC if it will be applied to data, None
+        otherwise.
+    :return: List of (cell id, url, dataset, request) tuples.
+    """
+    plan = []
+    for latitude, longitude in sites:
+        for year in years:
+            cell_id = make_cell_id(latitude, longitude, year)
+            if include_cams:
+                cams_request = ads.make_cams_solar_radiation_request(
+                    longitude=longitude, latitude=latitude, year=year, time_zone=time_zone
+                )
+                if cams_request is not None:
+                    plan.append((cell_id, ads.url, ads.dataset, cams_request))
+
+            plan.extend(
+                (cell_id, cds.url, cds_request["dataset"], cds_request)
+                for cds_request in cds.make_era5_requests(
+                    variables=variables,
+                    year=year,
+                    latitude=latitude,
+                    longitude=longitude,
+                    dataset=None,
+                    time_zone=time_zone,
+                )
+            )
+    return plan
+
+
+def load_manifest(manifest_file: str) -> dict[str, any]:
+    """Load a prefetch manifest, or return an empty one if the file doesn't exist."""
+    if not os.path.exists(manifest_file):
+        return {"cells": {}}
+    with open(manifest_file) as f:
+        return json.load(f)
+
+
+def save_manifest(manifest: dict[str, any], manifest_file: str) -> None:
+    """Save a prefetch manifest, atomically replacing the previous one."""
+    manifest["updated"] = datetime.now().isoformat(timespec="seconds")
+    fd, tmp_file = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(manifest_file)))
+    with os.fdopen(fd, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_file, manifest_file)
+
+
+def _prefetch_request(
+    task: tuple[str, str, str, dict[str, any], str, bool]
+) -> tuple[str, dict[str, any] | None, str | None]:
+    """Download a request into the cache.
+
+    :param task: A (key, url, dataset, request, cache directory, verbose) tuple.
+    :return: The request key, the request trace, and an error message if the download
+        failed.
+    """
+    key, url, dataset, request, cache_dir, verbose = task
+    with tempfile.TemporaryDirectory() as tmpdir:
+        try:
+            trace = execute_download_request(
+                url,
+                dataset,
+                request,
+                os.path.join(tmpdir, "prefetch.nc"),
+                verbose=verbose,
+                cache_dir=cache_dir,
+            )
+        except Exception as e:
+            return key, None, f"{type(e).__name__}: {e}"
+    return key, trace, None
+
+
+def prefetch(
+    sites: list[tuple[float, float]],
+    years: list[int],
+    variables: list[str] = cds.epw_variables,
+    cache_dir: str | None = None,
+    manifest_file: str = "era5epw_prefetch_manifest.json",
+    parallel_exec_nb: int = 10,
+    include_cams: bool = True,
+    time_zone: int | None = None,
+    verbose: bool = False,
+    metrics_file: str | None = None,
+) -> dict[str, any]:
+    """Download ERA5 and CAMS data for a set of sites and years into the download cache.
+
+    :param sites: List of (latitude, longitude) tuples.
+    :param years: List of years.
+    :param variables: ERA5 variables to prefetch.
+    :param cache_dir: Directory of the download cache. If None, the ERA5EPW_CACHE_DIR
+        environment variable is used.
+    :param manifest_file: Path of the manifest file tracking progress per cell. If it exists,
+        the prefetch resumes from it.
+    :param parallel_exec_nb: Number of parallel requests.
+    :param include_cams: If True, also prefetch CAMS solar radiation data.
+    :param time_zone: Time zone offset from UTC if it will be applied to data, None otherwise.
+    :param verbose: If True, enable verbose logging from CDS client.
+    :param metrics_file: If provided, Prometheus metrics of the requests are added to this
+        textfile as the prefetch progresses (see :mod:`era5epw.metrics`). If None, the
+        ERA5EPW_METRICS_FILE environment variable is used.
+    :return: The manifest.
+    """
+    cache = get_download_cache(cache_dir)
+    if cache is None:
+        raise ValueError(
+            "Prefetch requires a download cache. "
+            "Use cache_dir or set the ERA5EPW_CACHE_DIR environment variable."
+        )
+    metrics_file = metrics.get_metrics_file(metrics_file)
+
+    plan = make_prefetch_plan(
+        sites=sites,
+        years=years,
+        variables=variables,
+        include_cams=include_cams,
+        time_zone=time_zone,
+    )
+
+    manifest = load_manifest(manifest_file)
+    cells = manifest["cells"]
+    cell_by_key = {}
+    datasets_by_key = {}
+    tasks = []
+    for cell_id, url, dataset, request in plan:
+        key = make_cache_key(dataset, request)
+        cell = cells.setdefault(cell_id, {"total": 0, "done": [], "failed": {}})
+        cell_by_key[key] = cell
+        datasets_by_key[key] = dataset
+        if cache.contains(dataset, request):
+            if key not in cell["done"]:
+                cell["done"].append(key)
+            continue
+        # entries downloaded by a previous run may have been evicted from the cache since
+        if key in cell["done"]:
+            cell["done"].remove(key)
+        tasks.append((key, url, dataset, request, cache.cache_dir, verbose))
+
+    for cell_id, total in Counter(cell_id for cell_id, _, _, _ in plan).items():
+        cells[cell_id]["total"] = total
+    save_manifest(manifest, manifest_file)
+
+    tqdm.write(
+        f"Prefetching {len(tasks)} requests ({len(plan) - len(tasks)} already done) "
+        f"for {len(sites)} sites and {len(years)} years "
+        f"with {parallel_exec_nb} parallel requests..."
+    )
+
+    if tasks:
+        progress = tqdm(total=len(tasks), desc="Prefetch requests", unit="request")
+        with Pool(min(parallel_exec_nb, len(tasks))) as pool:
+            for key, trace, error in pool.imap_unordered(_prefetch_request, tasks):
+                cell = cell_by_key[key]
+                if error is None:
+                    cell["done"].append(key)
+                    cell["failed"].pop(key, None)
+                    metrics.observe_request(trace)
+                else:
+                    cell["failed"][key] = error
+                    metrics.observe_request_error(datasets_by_key[key])
+                save_manifest(manifest, manifest_file)
+                if metrics_file is not None:
+                    metrics.registry.write_textfile(metrics_file)
+                progress.update(1)
+        progress.close()
+
+    nb_failed = sum(len(cell["failed"]) for cell in cells.values())
+    if nb_failed:
+        tqdm.write(f"{nb_failed} requests failed, run the prefetch again to retry them.")
+    tqdm.write(f"Prefetch manifest written as {manifest_file}.")
+
+    return manifest
+
+
+def parse_site(site: str) -> tuple[float, float]:
+    """Parse a site given as 'latitude,longitude'."""
+    latitude, longitude = site.split(",")
+    return float(latitude), float(longitude)
+
+
+def prefetch_cli() -> None:
+    """Command-line interface for cache warming."""
+    from era5epw.logcfg import init_logging
+
+    parser = argparse.ArgumentParser(
+        description="Download ERA5 and CAMS data for a set of sites and years into the download "
+        "cache, so that EPW files can be generated from it afterward."
+    )
+    sites_group = parser.add_mutually_exclusive_group(required=True)
+    sites_group.add_argument(
+        "--sites",
+        type=parse_site,
+        nargs="+",
+        help="Sites to prefetch, as 'latitude,longitude' (e.g. --sites 49.4,0.1 48.8,2.4).",
+    )
+    sites_group.add_argument(
+        "--sites-file",
+        type=str,
+        help="File listing sites to prefetch, one 'latitude,longitude' per line.",
+    )
+    sites_group.add_argument(
+        "--bbox",
+        type=float,
+        nargs=4,
+        metavar=("NORTH", "WEST", "SOUTH", "EAST"),
+        help="Bounding box to prefetch, every grid point of the box is prefetched.",
+    )
+    parser.add_argument(
+        "--grid-step",
+        type=float,
+        default=0.25,
+        help="Grid step in degrees used with --bbox. Default is ERA5 resolution (0.25).",
+    )
+    parser.add_argument("--start-year", type=int, required=True, help="First year to prefetch.")
+    parser.add_argument(
+        "--end-year", type=int, help="Last year to prefetch (included). Defaults to start year."
+    )
+    parser.add_argument(
+        "--variables",
+        type=str,
+        nargs="+",
+        default=cds.epw_variables,
+        help="ERA5 variables to prefetch. Defaults to the variables needed to build EPW files.",
+    )
+    parser.add_argument(
+        "--no-cams", action="store_true", help="Don't prefetch CAMS solar radiation data."
+    )
+    parser.add_argument(
+        "--time-zone",
+        type=int,
+        default=None,
+        help="Time zone offset from UTC, if EPW files will be generated with "
+        "--apply-time-zone-to-data.",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        default=os.getenv(CACHE_DIR_ENV_VAR),
+        help=f"Directory of the download cache. Defaults to the {CACHE_DIR_ENV_VAR} environment "
+        "variable.",
+    )
+    parser.add_argument(
+        "--manifest",
+        type=str,
+        default="era5epw_prefetch_manifest.json",
+        help="Manifest file tracking progress. An interrupted prefetch resumes from it.",
+    )
+    parser.add_argument(
+        "--parallel-requests",
+        type=int,
+        default=10,
+        help="Number of parallel requests to make on CDS/ADS APIs.",
+    )
+    parser.add_argument(
+        "--verbose", action="store_true", help="Enable verbose logging from CDS client."
+    )
+    parser.add_argument(
+        "--metrics-file",
+        type=str,
+        default=None,
+        help="Add Prometheus metrics of the requests to this textfile, for node_exporter's "
+        f"textfile collector. Defaults to the {metrics.METRICS_FILE_ENV_VAR} environment "
+        "variable.",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="Serve Prometheus metrics of the requests on http://localhost:PORT/metrics while "
+        "the prefetch runs.",
+    )
+
+    args = parser.parse_args()
+
+    if not args.cache_dir:
+        parser.error(f"--cache-dir is required when {CACHE_DIR_ENV_VAR} is not set.")
+
+    init_logging(verbose=args.verbose)
+
+    if args.bbox is not None:
+        sites = make_sites_grid(*args.bbox, step=args.grid_step)
+        if not sites:
+            parser.error(f"No grid point in the bounding box {' '.join(map(str, args.bbox))}.")
+    elif args.sites_file is not None:
+        with open(args.sites_file) as f:
+            sites = [parse_site(line) for line in f if line.strip()]
+    else:
+        sites = args.sites
+
+    end_year = args.end_year if args.end_year is not None else args.start_year
+
+    if args.metrics_port is not None:
+        metrics.serve_metrics(args.metrics_port)
+        tqdm.write(f"Serving metrics on http://localhost:{args.metrics_port}/metrics")
+
+    prefetch(
+        sites=sites,
+        years=list(range(args.start_year, end_year + 1)),
+        variables=args.variables,
+        cache_dir=args.cache_dir,
+        manifest_file=args.manifest,
+        parallel_exec_nb=args.parallel_requests,
+        include_cams=not args.no_cams,
+        time_zone=args.time_zone,
+        verbose=args.verbose,
+        metrics_file=args.metrics_file,
+    )
+
+
+if __name__ == "__main__":
+    prefetch_cli()
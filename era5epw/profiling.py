@@ -0,0 +1,176 @@
+"""Profiling of the local compute phases: NetCDF decoding, assembly, EPW writing and reading,
+plots.
+
+Compute phases are marked with :func:`profile_section`. While a :class:`Profiler` is active, only
+these sections are profiled by default, so that CPU hot spots aren't drowned out by the time spent
+waiting for CDS/ADS requests.
+
+Usage::
+
+    with Profiler("era5epw.prof", memory=True) as profiler:
+        download_and_make_epw(...)
+    print(profiler.summary())
+
+The ``.prof`` file can be explored with ``python -m pstats`` or tools like snakeviz.
+"""
+
+import cProfile
+import io
+import pstats
+import time
+import tracemalloc
+from argparse import ArgumentParser, Namespace
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+_active_profiler: "Profiler | None" = None
+
+
+class Profiler:
+    """Collect cProfile stats, and optionally peak memory, of the compute sections of a run."""
+
+    def __init__(
+        self,
+        output_file: str | None = None,
+        top: int = 20,
+        memory: bool = False,
+        compute_only: bool = True,
+        sort: str = "cumulative",
+    ):
+        """
+        :param output_file: If provided, cProfile stats are written to this file (.prof).
+        :param top: Number of functions listed in the summary.
+        :param memory: If True, also track peak memory of each section with tracemalloc. This
+            slows down the run.
+        :param compute_only: If True, only profile code in compute sections (see
+            :func:`profile_section`). Otherwise, profile everything.
+        :param sort: Sort key of the summary, see :class:`pstats.Stats`.
+        """
+        self.output_file = output_file
+        self.top = top
+        self.memory = memory
+        self.compute_only = compute_only
+        self.sort = sort
+        self.profile = cProfile.Profile()
+        # section name -> [wall time in seconds, peak memory in bytes]
+        self.sections: dict[str, list] = {}
+        self._depth = 0
+
+    def __enter__(self) -> "Profiler":
+        global _active_profiler
+        assert _active_profiler is None, "A profiler is already active."
+        _active_profiler = self
+        if self.memory:
+            tracemalloc.start()
+        if not self.compute_only:
+            self.profile.enable()
+        return self
+
+    def __exit__(self, *args) -> None:
+        global _active_profiler
+        _active_profiler = None
+        if not self.compute_only:
+            self.profile.disable()
+        if self.memory:
+            tracemalloc.stop()
+        if self.output_file is not None:
+            self.profile.dump_stats(self.output_file)
+
+    @contextmanager
+    def section(self, name: str) -> Iterator[None]:
+        """Profile a compute section. Nested sections are profiled as part of the outermost one.
+
+        :param name: Name of the section.
+        """
+        self._depth += 1
+        outermost = self._depth == 1
+        if outermost:
+            if self.memory:
+                tracemalloc.reset_peak()
+                memory_start = tracemalloc.get_traced_memory()[0]
+            if self.compute_only:
+                self.profile.enable()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            if outermost:
+                if self.compute_only:
+                    self.profile.disable()
+                stats = self.sections.setdefault(name, [0.0, 0])
+                stats[0] += time.perf_counter() - start
+                if self.memory:
+                    stats[1] = max(stats[1], tracemalloc.get_traced_memory()[1] - memory_start)
+
+    def summary(self) -> str:
+        """Time and peak memory per section, and the top functions of the cProfile stats."""
+        lines = ["Compute sections:"]
+        for name, (seconds, peak_memory) in self.sections.items():
+            line = f"  {name}: {seconds:.3f}s"
+            if self.memory:
+                line += f", peak memory {peak_memory / 2**20:.1f} MiB"
+            lines.append(line)
+
+        stream = io.StringIO()
+        try:
+            stats = pstats.Stats(self.profile, stream=stream)
+        except TypeError:
+            # nothing was profiled
+            return "\n".join(lines)
+        stats.strip_dirs().sort_stats(self.sort).print_stats(self.top)
+        lines.append(stream.getvalue().strip())
+        if self.output_file is not None:
+            lines.append(f"Profile written as {self.output_file}.")
+        return "\n".join(lines)
+
+
+@contextmanager
+def profile_section(name: str) -> Iterator[None]:
+    """Mark a compute section, profiled if a :class:`Profiler` is active.
+
+    :param name: Name of the section.
+    """
+    if _active_profiler is None:
+        yield
+    else:
+        with _active_profiler.section(name):
+            yield
+
+
+def add_profile_arguments(parser: ArgumentParser, default_output_file: str) -> None:
+    """Add the profiling options to a command line parser.
+
+    :param parser: The command line parser.
+    :param default_output_file: The .prof file written when --profile is passed without a
+        value.
+    """
+    parser.add_argument(
+        "--profile",
+        type=str,
+        nargs="?",
+        const=default_output_file,
+        default=None,
+        metavar="PROF_FILE",
+        help="Profile the local compute phases (decoding, assembly, EPW write and read, plots) "
+        f"and write cProfile stats to this file (default: {default_output_file}). Network waits "
+        "are not profiled.",
+    )
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=20,
+        help="Number of functions listed in the profiling summary.",
+    )
+    parser.add_argument(
+        "--profile-memory",
+        action="store_true",
+        help="Also measure peak memory of each compute phase with tracemalloc (slower).",
+    )
+
+
+def make_profiler(args: Namespace) -> Profiler | None:
+    """Create a profiler from the command line options, None if profiling isn't requested."""
+    if args.profile is None:
+        return None
+    return Profiler(output_file=args.profile, top=args.profile_top, memory=args.profile_memory)
@@ -0,0 +1,221 @@
+"""Tracing and recording of CDS/ADS requests.
+
+Every download request is traced: the time of each job state transition as observed by the client,
+and the download size and duration (see :meth:`RequestRecorder.to_trace`). Traces are gathered in
+the run report (see :mod:`era5epw.report`).
+
+Sessions can also be recorded, to replay them locally with their real latency profile. When the
+ERA5EPW_RECORD_DIR environment variable is set, every download request writes to that directory
+(the "cassette"):
+
+- ``<key>.json``: the dataset and request, the time of each job state transition as observed by
+  the client, the job timestamps reported by the server, and download size and duration
+- ``<key>.dat``: the response payload
+
+where ``<key>`` is the request's download cache key. A recorded session can then be replayed
+with the stand-in server of the benchmarks (``python -m benchmarks.fake_server --cassette DIR``).
+"""
+
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import time
+from datetime import datetime
+
+from era5epw.cache import make_cache_key
+
+RECORD_DIR_ENV_VAR = "ERA5EPW_RECORD_DIR"
+
+_REQUEST_ID_MESSAGE = re.compile(r"^Request ID is (?P<request_id>\S+)$")
+_STATUS_MESSAGE = re.compile(r"^status has been updated to (?P<status>\w+)$")
+
+
+class RequestRecorder:
+    """Record the lifecycle of a single CDS/ADS request.
+
+    The recorder is fed with the CDS client info messages (see :meth:`info_callback`), which
+    report the request ID and each job status change.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        dataset: str,
+        request: dict[str, any],
+        record_dir: str | None = None,
+        quiet: bool = True,
+    ):
+        """
+        :param url: URL of the API the request is made on.
+        :param dataset: The dataset the request is made on.
+        :param request: The request parameters.
+        :param record_dir: Directory of the cassette, None to only trace the request.
+        :param quiet: If True, only log CDS client errors, like the client itself does.
+        """
+        self.record_dir = record_dir
+        self.quiet = quiet
+        self.url = url
+        self.dataset = dataset
+        self.request = request
+        self.key = make_cache_key(dataset, request)
+        self.request_id: str | None = None
+        self.submitted_at: float | None = None
+        # (event, seconds since submission) tuples
+        self.events: list[tuple[str, float]] = []
+
+    def info_callback(self, message: str, *args, **kwargs) -> None:
+        """Callback for the CDS client info messages."""
+        if self.submitted_at is not None:
+            if match := _REQUEST_ID_MESSAGE.match(str(message)):
+                self.request_id = self.request_id or match["request_id"]
+            elif match := _STATUS_MESSAGE.match(str(message)):
+                self.mark(match["status"])
+        # keep the client log output. The client is imported when the request is made.
+        from ecmwf.datastores import legacy_client
+
+        with legacy_client.LoggingContext(
+            logger=legacy_client.LOGGER, quiet=self.quiet, debug=False
+        ) as logger:
+            logger.info(message, *args, **kwargs)
+
+    def submit(self) -> None:
+        """Mark the submission of the request."""
+        self.submitted_at = time.time()
+        self.events = []
+
+    def mark(self, event: str) -> None:
+        """Record an event, timed from the submission of the request."""
+        assert self.submitted_at is not None, "The request must be submitted first."
+        self.events.append((event, round(time.time() - self.submitted_at, 3)))
+
+    def _get_job_timestamps(self, client: any) -> dict[str, str | None] | None:
+        """Get job creation, start and end times from the server, if the client supports it."""
+        if self.request_id is None or not hasattr(client, "client"):
+            return None
+        try:
+            job = client.client.get_remote(self.request_id).json
+        except Exception as e:
+            logging.warning(f"Could not get job {self.request_id} timestamps: {e}")
+            return None
+        return {name: job.get(name) for name in ("created", "started", "finished")}
+
+    def to_trace(self, target_file: str, cache_hit: bool = False) -> dict[str, any]:
+        """Summarize the request timings.
+
+        Queue wait runs from submission to the job start (as observed by the client, so with
+        the polling interval resolution), processing from the job start to its end, and
+        transfer is the download of the results.
+
+        :param target_file: The downloaded file.
+        :param cache_hit: If True, the file was copied from the download cache.
+        :return: The request trace.
+        """
+        events = dict(self.events)
+        end = events.get("successful", events.get("results", 0.0))
+        start = events.get("running", end)
+        return {
+            "dataset": self.dataset,
+            "variable": self.request.get("variable", []),
+            "request_id": self.request_id,
+            "cache_hit": cache_hit,
+            "submitted_at": datetime.fromtimestamp(self.submitted_at).isoformat(),
+            "queue_wait": start,
+            "processing": round(end - start, 3),
+            "transfer_time": round(events.get("downloaded", 0.0) - events.get("results", 0.0), 3),
+            "bytes": os.path.getsize(target_file),
+        }
+
+    def save(self, target_file: str, client: any = None) -> None:
+        """Save the recorded request and its response payload to the cassette.
+
+        :param target_file: The downloaded file.
+        :param client: The CDS client used for the request, to get the job timestamps from
+            the server.
+        """
+        assert self.record_dir is not None, "No cassette directory to save the request to."
+        os.makedirs(self.record_dir, exist_ok=True)
+        entry = {
+            "url": self.url,
+            "dataset": self.dataset,
+            "request": self.request,
+            "request_id": self.request_id,
+            "submitted_at": datetime.fromtimestamp(self.submitted_at).isoformat(),
+            "events": self.events,
+            "job": self._get_job_timestamps(client),
+            "size": os.path.getsize(target_file),
+            "payload": f"{self.key}.dat",
+        }
+
+        # payload first, so that an entry always has its payload
+        fd, tmp_file = tempfile.mkstemp(dir=self.record_dir, prefix=".tmp-")
+        os.close(fd)
+        shutil.copyfile(target_file, tmp_file)
+        os.replace(tmp_file, os.path.join(self.record_dir, entry["payload"]))
+
+        fd, tmp_file = tempfile.mkstemp(dir=self.record_dir, prefix=".tmp-")
+        with os.fdopen(fd, "w") as f:
+            json.dump(entry, f, indent=2, default=str)
+        os.replace(tmp_file, os.path.join(self.record_dir, f"{self.key}.json"))
+
+
+def make_request_recorder(
+    url: str, dataset: str, request: dict[str, any], quiet: bool = True
+) -> RequestRecorder:
+    """Create a recorder for a request.
+
+    The request is saved to a cassette only if recording is enabled with the
+    ERA5EPW_RECORD_DIR environment variable.
+    """
+    return RequestRecorder(
+        url, dataset, request, record_dir=os.getenv(RECORD_DIR_ENV_VAR) or None, quiet=quiet
+    )
+
+
+def load_cassette(record_dir: str) -> dict[str, dict[str, any]]:
+    """Load the requests recorded in a cassette.
+
+    :param record_dir: Directory of the cassette.
+    :return: Recorded entries by request key, with the absolute path of their payload.
+    """
+    entries = {}
+    for file_name in sorted(os.listdir(record_dir)):
+        if not file_name.endswith(".json") or file_name.startswith("."):
+            continue
+        with open(os.path.join(record_dir, file_name)) as f:
+            entry = json.load(f)
+        entry["payload"] = os.path.join(record_dir, entry["payload"])
+        entries[make_cache_key(entry["dataset"], entry["request"])] = entry
+    return entries
+
+
+def get_recorded_timings(entry: dict[str, any]) -> tuple[float, float, float]:
+    """Get the queue, processing and download times of a recorded request.
+
+    Job timestamps reported by the server are used when available, otherwise the times the
+    client observed status changes.
+
+    :param entry: A recorded entry, see :func:`load_cassette`.
+    :return: Queue time, processing time and download time, in seconds.
+    """
+    events = dict(entry["events"])
+    download_time = max(0.0, events.get("downloaded", 0.0) - events.get("results", 0.0))
+
+    job = entry.get("job") or {}
+    if job.get("created") and job.get("finished"):
+        created = datetime.fromisoformat(job["created"])
+        finished = datetime.fromisoformat(job["finished"])
+        # jobs served from the server cache have no start time
+        started = datetime.fromisoformat(job["started"]) if job.get("started") else finished
+        return (
+            (started - created).total_seconds(),
+            (finished - started).total_seconds(),
+            download_time,
+        )
+
+    accepted = events.get("accepted", 0.0)
+    successful = events.get("successful", events.get("results", accepted))
+    running = events.get("running", successful)
+    return running - accepted, successful - running, download_time
@@ -0,0 +1,110 @@
+"""Run report: where the time goes when generating an EPW file.
+
+The report holds the duration of each phase of the run (planning, CAMS and ERA5 downloads,
+assembly, EPW write) and the trace of every CDS/ADS request (see
+:meth:`era5epw.recorder.RequestRecorder.to_trace`), completed with the time spent decoding the
+downloaded file, as well as failed requests.
+"""
+
+import json
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import datetime
+
+# phases of a run, in execution order
+PHASES = ["planning", "cams", "era5", "assembly", "epw_write"]
+
+# request trace fields summed in the report summary
+_SUMMED_FIELDS = ["queue_wait", "processing", "transfer_time", "decode_time", "bytes"]
+
+
+class RunReport:
+    """Timings of an EPW generation run."""
+
+    def __init__(self, **parameters: any):
+        """
+        :param parameters: Run parameters, copied to the report.
+        """
+        self.parameters = parameters
+        self.started_at = datetime.now()
+        self._start = time.perf_counter()
+        self.end: float | None = None
+        self.phases: dict[str, float] = {}
+        self.requests: list[dict[str, any]] = []
+        self.failures: list[dict[str, str]] = []
+        # stack of running phases: [name, start, time spent in nested phases]
+        self._running_phases: list[list] = []
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time a phase of the run. Phases can be nested, the time spent in a nested phase is only
+        counted in the nested phase, so that phase durations add up.
+
+        :param name: Name of the phase.
+        """
+        running_phase = [name, time.perf_counter(), 0.0]
+        self._running_phases.append(running_phase)
+        try:
+            yield
+        finally:
+            self._running_phases.pop()
+            duration = time.perf_counter() - running_phase[1]
+            self.phases[name] = self.phases.get(name, 0.0) + duration - running_phase[2]
+            if self._running_phases:
+                self._running_phases[-1][2] += duration
+
+    def add_request(self, trace: dict[str, any], decode_time: float | None = None) -> None:
+        """Add the trace of a CDS/ADS request.
+
+        :param trace: The request trace, as returned by
+            :func:`era5epw.utils.execute_download_request`.
+        :param decode_time: Time spent decoding the downloaded file, in seconds.
+        """
+        trace = dict(trace)
+        if decode_time is not None:
+            trace["decode_time"] = round(decode_time, 3)
+        self.requests.append(trace)
+
+    def add_failure(self, dataset: str, error: Exception) -> None:
+        """Add a failed CDS/ADS request.
+
+        :param dataset: The dataset of the request.
+        :param error: The error raised by the request.
+        """
+        self.failures.append({"dataset": dataset, "error": f"{type(error).__name__}: {error}"})
+
+    def finish(self) -> None:
+        """Mark the end of the run."""
+        self.end = time.perf_counter()
+
+    def summary(self) -> dict[str, any]:
+        """Number of requests and cache hits, and sum of request timings and downloaded bytes."""
+        summary = {
+            "requests": len(self.requests),
+            "cache_hits": sum(1 for trace in self.requests if trace.get("cache_hit")),
+        }
+        for field in _SUMMED_FIELDS:
+            summary[field] = round(sum(trace.get(field, 0) for trace in self.requests), 3)
+        return summary
+
+    def to_dict(self) -> dict[str, any]:
+        end = self.end if self.end is not None else time.perf_counter()
+        return {
+            "parameters": self.parameters,
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "total_time": round(end - self._start, 3),
+            "phases": {
+                name: round(self.phases[name], 3)
+                for name in PHASES + sorted(set(self.phases) - set(PHASES))
+                if name in self.phases
+            },
+            "summary": self.summary(),
+            "requests": self.requests,
+            "failures": self.failures,
+        }
+
+    def write(self, report_file: str) -> None:
+        """Write the report as JSON."""
+        with open(report_file, "w") as f:
+            json.dump(self.to_dict(), f, indent=2, default=str)
@@ -0,0 +1,195 @@
+"""Solar geometry and extraterrestrial radiation.
+
+All functions are vectorized with numpy broadcasting: ``times`` is a sequence of UTC timestamps,
+and ``latitude``/``longitude`` are either scalars, giving one value per timestamp, or arrays of
+sites, giving a (sites, times) matrix.
+
+Declination, equation of time and Earth-Sun distance correction follow Spencer (1971), as given
+by Iqbal, *An Introduction to Solar Radiation* (1983).
+"""
+
+from collections.abc import Sequence
+
+import numpy as np
+import pandas as pd
+
+# W/m^2
+SOLAR_CONSTANT = 1367.0
+
+_SITES_BLOCK_SIZE = 32
+
+
+def _day_angle(times: pd.DatetimeIndex) -> np.ndarray:
+    """Day angle in radians, with the time of day as a fraction of the day."""
+    day_of_year = times.dayofyear.values + (times.hour.values + times.minute.values / 60) / 24
+    return 2 * np.pi * (day_of_year - 1) / 365
+
+
+def calc_declination(day_angle: np.ndarray) -> np.ndarray:
+    """Solar declination in radians (Spencer, 1971).
+
+    :param day_angle: Day angle in radians, 2 * pi * (day of year - 1) / 365.
+    """
+    return (
+        0.006918
+        - 0.399912 * np.cos(day_angle)
+        + 0.070257 * np.sin(day_angle)
+        - 0.006758 * np.cos(2 * day_angle)
+        + 0.000907 * np.sin(2 * day_angle)
+        - 0.002697 * np.cos(3 * day_angle)
+        + 0.00148 * np.sin(3 * day_angle)
+    )
+
+
+def calc_equation_of_time(day_angle: np.ndarray) -> np.ndarray:
+    """Equation of time in minutes (Spencer, 1971).
+
+    :param day_angle: Day angle in radians, 2 * pi * (day of year - 1) / 365.
+    """
+    return 229.18 * (
+        0.000075
+        + 0.001868 * np.cos(day_angle)
+        - 0.032077 * np.sin(day_angle)
+        - 0.014615 * np.cos(2 * day_angle)
+        - 0.040849 * np.sin(2 * day_angle)
+    )
+
+
+def calc_eccentricity_correction(day_angle: np.ndarray) -> np.ndarray:
+    """Earth-Sun distance correction factor, (r0 / r)^2 (Spencer, 1971).
+
+    :param day_angle: Day angle in radians, 2 * pi * (day of year - 1) / 365.
+    """
+    return (
+        1.000110
+        + 0.034221 * np.cos(day_angle)
+        + 0.001280 * np.sin(day_angle)
+        + 0.000719 * np.cos(2 * day_angle)
+        + 0.000077 * np.sin(2 * day_angle)
+    )
+
+
+def _solar_time(times: pd.DatetimeIndex, day_angle: np.ndarray) -> np.ndarray:
+    """Apparent solar time at longitude 0, in hours."""
+    utc_hours = times.hour.values + times.minute.values / 60 + times.second.values / 3600
+    return utc_hours + calc_equation_of_time(day_angle) / 60
+
+
+def _hour_angle(solar_time: np.ndarray, longitude: np.ndarray) -> np.ndarray:
+    """Hour angle in radians, in [-pi, pi), negative in the morning."""
+    return (np.pi / 12 * (solar_time + longitude / 15 - 12) + np.pi) % (2 * np.pi) - np.pi
+
+
+def _as_sites(values: float | Sequence[float] | np.ndarray) -> np.ndarray:
+    """Add a time axis to site coordinates, so that they broadcast with times."""
+    return np.asarray(values, dtype=float)[..., np.newaxis]
+
+
+def calc_solar_position(
+    times: Sequence | pd.DatetimeIndex,
+    latitude: float | Sequence[float] | np.ndarray,
+    longitude: float | Sequence[float] | np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Calculate the position of the sun.
+
+    :param times: UTC timestamps.
+    :param latitude: Latitude of the site(s) in degrees.
+    :param longitude: Longitude of the site(s) in degrees.
+    :return: Solar zenith angle and azimuth in degrees. Azimuth is measured clockwise from
+        north.
+    """
+    times = pd.DatetimeIndex(times)
+    latitude = np.radians(_as_sites(latitude))
+    day_angle = _day_angle(times)
+    declination = calc_declination(day_angle)
+    hour_angle = _hour_angle(_solar_time(times, day_angle), _as_sites(longitude))
+
+    cos_zenith = np.sin(latitude) * np.sin(declination) + np.cos(latitude) * np.cos(
+        declination
+    ) * np.cos(hour_angle)
+    zenith = np.degrees(np.arccos(np.clip(cos_zenith, -1, 1)))
+    azimuth = np.degrees(
+        np.arctan2(
+            np.sin(hour_angle),
+            np.cos(hour_angle) * np.sin(latitude) - np.tan(declination) * np.cos(latitude),
+        )
+        + np.pi
+    )
+    return zenith, azimuth
+
+
+def _integrate_cos_zenith(
+    latitude: np.ndarray, longitude: np.ndarray, solar_time: np.ndarray, declination: np.ndarray
+) -> np.ndarray:
+    """Integral of cos(zenith) over the hour angles of each hour, while the sun is up.
+
+    :param latitude: Latitude of the sites in radians, shape (sites, 1).
+    :param longitude: Longitude of the sites in degrees, shape (sites, 1).
+    :param solar_time: Apparent solar time at longitude 0 at the start of each hour.
+    :param declination: Solar declination during each hour in radians.
+    """
+    # cos(zenith) = a + b * cos(hour angle)
+    a = np.sin(latitude) * np.sin(declination)
+    b = np.cos(latitude) * np.cos(declination)
+    # sunset hour angle: 0 during polar night, pi during polar day
+    sunset = np.arccos(np.clip(-np.tan(latitude) * np.tan(declination), -1, 1))
+
+    def integrate(hour_angle: np.ndarray) -> np.ndarray:
+        """Integral from -pi to the hour angle."""
+        hour_angle = np.clip(hour_angle, -sunset, sunset)
+        return a * hour_angle + b * np.sin(hour_angle)
+
+    start = _hour_angle(solar_time, longitude)
+    end = start + np.pi / 12
+    # hours overlapping midnight end on the next day
+    next_day = end >= np.pi
+    cos_zenith = integrate(end - 2 * np.pi * next_day) - integrate(start)
+    cos_zenith += next_day * 2 * (a * sunset + b * np.sin(sunset))
+    # rounding errors around sunrise and sunset
+    return np.maximum(cos_zenith, 0, out=cos_zenith)
+
+
+def calc_extraterrestrial_radiation(
+    times: Sequence | pd.DatetimeIndex,
+    latitude: float | Sequence[float] | np.ndarray,
+    longitude: float | Sequence[float] | np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Calculate the extraterrestrial radiation received during the hour starting at each time, as
+    in the EPW fields of the same name.
+
+    Horizontal radiation is integrated exactly over the part of the hour the sun is above
+    the horizon. Direct normal radiation is 0 when the sun stays below the horizon for the
+    whole hour.
+
+    :param times: UTC timestamps, start of each hour.
+    :param latitude: Latitude of the site(s) in degrees.
+    :param longitude: Longitude of the site(s) in degrees.
+    :return: Extraterrestrial horizontal and direct normal radiation in Wh/m^2.
+    """
+    times = pd.DatetimeIndex(times)
+    day_angle = _day_angle(times)
+    solar_time = _solar_time(times, day_angle)
+    # declination and Earth-Sun distance at the middle of the hour
+    mid_day_angle = day_angle + np.pi / (365 * 24)
+    declination = calc_declination(mid_day_angle)
+    direct_normal = SOLAR_CONSTANT * calc_eccentricity_correction(mid_day_angle)
+
+    latitude, longitude = np.broadcast_arrays(
+        np.radians(np.asarray(latitude, dtype=float)), np.asarray(longitude, dtype=float)
+    )
+    sites_latitude = latitude.reshape(-1, 1)
+    sites_longitude = longitude.reshape(-1, 1)
+    horizontal = np.empty((sites_latitude.shape[0], len(times)))
+    sites_direct_normal = np.empty_like(horizontal)
+    # sites are processed by blocks, temporary arrays are faster to allocate when they're small
+    for i in range(0, horizontal.shape[0], _SITES_BLOCK_SIZE):
+        block = slice(i, i + _SITES_BLOCK_SIZE)
+        cos_zenith = _integrate_cos_zenith(
+            sites_latitude[block], sites_longitude[block], solar_time, declination
+        )
+        # mean over the hour (pi / 12 radians) times 1 hour
+        horizontal[block] = direct_normal * cos_zenith * 12 / np.pi
+        sites_direct_normal[block] = np.where(cos_zenith > 0, direct_normal, 0)
+
+    shape = latitude.shape + (len(times),)
+    return horizontal.reshape(shape), sites_direct_normal.reshape(shape)
@@ -10,11 +10,16 @@ from base64 import b64encode
 from calendar import monthrange
 from pathlib import Path
 from types import TracebackType
+from typing import TYPE_CHECKING
 
-import cdsapi
-import pandas as pd
-import xarray as xr
-from ecmwf.datastores import legacy_client
+from era5epw.cache import MissingCacheEntriesError, get_download_cache
+from era5epw.recorder import make_request_recorder
+
+# pandas, xarray and cdsapi are slow to import: they are imported by the functions that need them,
+# so that CLI startup and download worker processes don't pay for what they don't use
+if TYPE_CHECKING:
+    import pandas as pd
+    import xarray as xr
 
 _api_key = None
 
@@ -55,7 +60,13 @@ class QuietEra5LegacyClientLoggingContext:
             self.logger.removeHandler(handler)
 
 
-legacy_client.LoggingContext = QuietEra5LegacyClientLoggingContext
+def _import_cdsapi() -> any:
+    """Import cdsapi, with the quieter logging context patched into the ecmwf legacy client."""
+    import cdsapi
+    from ecmwf.datastores import legacy_client
+
+    legacy_client.LoggingContext = QuietEra5LegacyClientLoggingContext
+    return cdsapi
 
 
 def load_api_key() -> str:
@@ -110,28 +121,118 @@ def make_cds_days_list(year, month) -> list[str]:
         return [f"{day:02d}" for day in range(1, days_in_month + 1)]
 
 
-def execute_download_request(url, dataset, cds_request, target_file, verbose: bool = False):
-    """Execute a CDS request and download the data to the target file."""
-    client = cdsapi.Client(url=url, key=load_api_key(), quiet=(not verbose))
-    # wait for a random time between 0 and 10 seconds to avoid hitting the CDS API too hard
-    time.sleep(random.uniform(0, 10))
+def _make_months_list(cds_request: dict[str, any]) -> list[str]:
+    """List the months covered by a CDS/ADS request, in the format 'YYYY-MM'."""
+    if "date" in cds_request:
+        start_date_str, end_date_str = cds_request["date"][0].split("/")
+        start_year, start_month = map(int, start_date_str.split("-")[:2])
+        end_year, end_month = map(int, end_date_str.split("-")[:2])
+        return [
+            f"{year}-{month:02d}"
+            for year in range(start_year, end_year + 1)
+            for month in range(
+                start_month if year == start_year else 1, end_month + 1 if year == end_year else 13
+            )
+        ]
+    return [
+        f"{year}-{int(month):02d}" for year in cds_request["year"] for month in cds_request["month"]
+    ]
+
+
+def describe_request(dataset: str, cds_request: dict[str, any]) -> list[tuple[str, str, str, str]]:
+    """Describe the data covered by a CDS/ADS request.
+
+    :param dataset: The dataset the request is made on.
+    :param cds_request: The request parameters.
+    :return: A list of (dataset, variable, month, cell) tuples. Requests without variables
+        (e.g. CAMS solar radiation) are described with variable '*'.
+    """
+    if "location" in cds_request:
+        location = cds_request["location"]
+        cell = f"{location['latitude']},{location['longitude']}"
+    else:
+        cell = "/".join(str(coord) for coord in cds_request["area"])
+
+    return [
+        (dataset, variable, month, cell)
+        for variable in cds_request.get("variable", ["*"])
+        for month in _make_months_list(cds_request)
+    ]
+
+
+def execute_download_request(
+    url,
+    dataset,
+    cds_request,
+    target_file,
+    verbose: bool = False,
+    cache_dir: str | None = None,
+    offline: bool = False,
+):
+    """Execute a CDS request and download the data to the target file.
+
+    If a download cache is configured (see :func:`era5epw.cache.get_download_cache`), the data is
+    copied from the cache when available, and stored in it after download otherwise.
+
+    If the ERA5EPW_RECORD_DIR environment variable is set, the request is recorded (see
+    :mod:`era5epw.recorder`).
+
+    :param offline: If True, never call the CDS API: raise MissingCacheEntriesError if the
+        request isn't in the download cache.
+    :return: The request trace: queue wait, processing and transfer times, downloaded bytes (see
+        :meth:`era5epw.recorder.RequestRecorder.to_trace`).
+    """
+    # trace the request, and record it if ERA5EPW_RECORD_DIR is set, see era5epw.recorder
+    recorder = make_request_recorder(url, dataset, cds_request, quiet=(not verbose))
+
+    cache = get_download_cache(cache_dir)
+    if cache is not None:
+        recorder.submit()
+        if cache.get(dataset, cds_request, target_file):
+            logging.debug(f"Cache hit for dataset '{dataset}' with parameters: {cds_request}")
+            recorder.mark("downloaded")
+            return recorder.to_trace(target_file, cache_hit=True)
+
+    if offline:
+        raise MissingCacheEntriesError(describe_request(dataset, cds_request))
+
+    client = _import_cdsapi().Client(
+        url=url, key=load_api_key(), quiet=(not verbose), info_callback=recorder.info_callback
+    )
+    # wait for a random time between 0 and 10 seconds (by default) to avoid hitting the CDS API
+    # too hard
+    time.sleep(random.uniform(0, float(os.getenv("ERA5EPW_REQUEST_JITTER", 10))))
     # Execute the CDS request
     logging.debug(f"Executing CDS request for dataset '{dataset}' with parameters: {cds_request}")
-    client.retrieve(dataset, cds_request).download(target=target_file)
+    recorder.submit()
+    results = client.retrieve(dataset, cds_request)
+    recorder.mark("results")
+    results.download(target=target_file)
+    recorder.mark("downloaded")
 
+    if recorder.record_dir is not None:
+        recorder.save(target_file, client)
 
-def load_netcdf(file_path) -> xr.Dataset:
+    if cache is not None:
+        cache.put(dataset, cds_request, target_file)
+
+    return recorder.to_trace(target_file)
+
+
+def load_netcdf(file_path) -> "xr.Dataset":
     """Load a NetCDF file and return its content.
 
     :param file_path: Path to the NetCDF file.
     :return: xarray.Dataset containing the data from the NetCDF file.
     """
+    import xarray as xr
+
     ds = xr.open_dataset(file_path, engine="netcdf4")  # type: ignore[call-arg]
 
     return ds
 
 
-def unzip_and_load_netcdf_to_df(file_path: str, clean_up: bool) -> pd.DataFrame:
+def unzip_and_load_netcdf_to_df(file_path: str, clean_up: bool) -> "pd.DataFrame":
     """Unzip a zip file containing a NetCDF file and load it into a DataFrame.
 
     :param file_path: Path to the zip file.
@@ -156,7 +257,7 @@ def unzip_and_load_netcdf_to_df(file_path: str, clean_up: bool) -> pd.DataFrame:
         return concat_netcdf_files_to_df(file_path, time_dim=0)
 
 
-def concat_netcdf_files_to_df(file_paths, time_dim: int = 0) -> pd.DataFrame:
+def concat_netcdf_files_to_df(file_paths, time_dim: int = 0) -> "pd.DataFrame":
     """Concatenate multiple NetCDF files into a single DataFrame.
 
     The index of the DataFrame will be a datetime index based on the 'time' dimension
@@ -166,6 +267,9 @@ def concat_netcdf_files_to_df(file_paths, time_dim: int = 0) -> pd.DataFrame:
         dimension).
     :return: xarray.Dataset containing the merged data.
     """
+    import pandas as pd
+    import xarray as xr
+
     files = glob.glob(file_paths)
     assert files, f"No NetCDF files found matching pattern: {file_paths}"
     datasets = []
@@ -4,51 +4,24 @@ This module provides interactive visualization of EPW (EnergyPlus Weather) files
 Plotly. It supports both command-line usage and API usage in Jupyter notebooks.
 """
 
-import argparse
-from pathlib import Path
-from typing import Literal
+from typing import TYPE_CHECKING, Literal
 
+import numpy as np
 import pandas as pd
-import plotly.graph_objects as go
 
-# EPW column names as per EnergyPlus EPW format specification
-EPW_COLUMNS = [
-    "Year",
-    "Month",
-    "Day",
-    "Hour",
-    "Minute",
-    "Data Source and Uncertainty Flags",
-    "Dry Bulb Temperature",
-    "Dew Point Temperature",
-    "Relative Humidity",
-    "Atmospheric Station Pressure",
-    "Extraterrestrial Horizontal Radiation",
-    "Extraterrestrial Direct Normal Radiation",
-    "Horizontal Infrared Radiation Intensity",
-    "Global Horizontal Radiation",
-    "Direct Normal Radiation",
-    "Diffuse Horizontal Radiation",
-    "Global Horizontal Illuminance",
-    "Direct Normal Illuminance",
-    "Diffuse Horizontal Illuminance",
-    "Zenith Luminance",
-    "Wind Direction",
-    "Wind Speed",
-    "Total Sky Cover",
-    "Opaque Sky Cover",
-    "Visibility",
-    "Ceiling Height",
-    "Present Weather Observation",
-    "Present Weather Codes",
-    "Precipitable Water",
-    "Aerosol Optical Depth",
-    "Snow Depth",
-    "Days Since Last Snowfall",
-    "Albedo",
-    "Liquid Precipitation Depth",
-    "Liquid Precipitation Quantity",
-]
+from era5epw.cli import visualize_cli  # noqa: F401, moved to era5epw.cli
+from era5epw.epw import (  # noqa: F401, moved to era5epw.epw
+    EPW_DTYPES,
+    EPW_HEADER_LINES,
+    make_epw_datetime_index,
+    read_epw_file,
+)
+from era5epw.epw_cache import read_epw_file_cached
+from era5epw.profiling import profile_section
+
+# plotly is only imported when plotting, so that reading EPW files doesn't pay for it
+if TYPE_CHECKING:
+    import plotly.graph_objects as go
 
 # Series to hide from the dropdown menu
 HIDDEN_SERIES = [
@@ -93,54 +66,22 @@ UNITS = {
     "Liquid Precipitation Quantity": "hr",
 }
 
+# Longest series plotted without downsampling on 2D plots, in points per pixel of plot width
+MAX_POINTS_PER_PIXEL = 8
 
-def read_epw_file(epw_file_path: str) -> pd.DataFrame:
-    """Read and parse an EPW file into a DataFrame.
+# Number of colors of the radar plot, days of the same color are drawn as a single trace
+RADAR_COLOR_BINS = 32
 
-    :param epw_file_path: Path to the EPW file.
-    :return: DataFrame with datetime index and weather data columns.
-    """
-    with open(epw_file_path) as f:
-        # Skip the 8 header lines
-        lines = f.readlines()
-
-    # Data starts from line 9 (index 8)
-    data_lines = lines[8:]
-
-    # Parse data lines
-    data = []
-    for line in data_lines:
-        if line.strip():
-            data.append(line.strip().split(","))
-
-    # Create DataFrame
-    df = pd.DataFrame(data, columns=EPW_COLUMNS)
-
-    # Convert numeric columns to float
-    for col in df.columns:
-        if col not in ["Year", "Month", "Day", "Hour", "Minute"]:
-            df[col] = pd.to_numeric(df[col], errors="coerce")
-
-    # Convert time columns to int
-    df["Year"] = df["Year"].astype(int)
-    df["Month"] = df["Month"].astype(int)
-    df["Day"] = df["Day"].astype(int)
-    df["Hour"] = df["Hour"].astype(int)
-
-    # Create datetime index (handle hour 24 as hour 0 of next day)
-    def create_datetime(row):
-        year, month, day, hour = row["Year"], row["Month"], row["Day"], row["Hour"]
-        if hour == 24:
-            # Hour 24 means midnight of the next day
-            dt = pd.Timestamp(year=year, month=month, day=day) + pd.Timedelta(days=1)
-        else:
-            dt = pd.Timestamp(year=year, month=month, day=day, hour=hour)
-        return dt
+# Most days plotted with a row per day on 3D surfaces, weekly means are plotted beyond
+MAX_SURFACE_DAYS = 2 * 366
 
-    df["Datetime"] = df.apply(create_datetime, axis=1)
-    df.set_index("Datetime", inplace=True)
+# Decimals of heatmap values, as of EPW fields: weekly means don't need more, and the values make
+# up most of the size of heatmap HTML files
+HEATMAP_DECIMALS = 1
 
-    return df
+# Longest jump between consecutive timestamps of a day by hour grid in calendar order. Beyond,
+# e.g. in typical years made of months of different years, days are kept in file order
+_MAX_CALENDAR_GAP = pd.Timedelta(days=180)
 
 
 def get_visible_series(df: pd.DataFrame) -> list[str]:
@@ -152,24 +93,93 @@ def get_visible_series(df: pd.DataFrame) -> list[str]:
     return [col for col in df.columns if col not in HIDDEN_SERIES]
 
 
+def downsample_min_max(
+    x: np.ndarray | pd.Index, y: np.ndarray, buckets: int
+) -> tuple[np.ndarray | pd.Index, np.ndarray]:
+    """Downsample a line to the minimum and maximum of each bucket of consecutive points.
+
+    Peaks are kept, and a line plot of the result looks the same as the full line when there
+    are about as many buckets as pixels. Buckets with missing values only give a missing
+    value, so gaps stay visible.
+
+    :param x: Point abscissas.
+    :param y: Point values.
+    :param buckets: Number of buckets, e.g. the plot width in pixels.
+    :return: Abscissas and values of at most 2 points per bucket, in the original order.
+    """
+    y = np.asarray(y, dtype=float)
+    if len(y) <= 2 * buckets:
+        return x, y
+
+    bucket_size = -(-len(y) // buckets)
+    buckets = -(-len(y) // bucket_size)
+    padded = np.full(buckets * bucket_size, np.nan)
+    padded[: len(y)] = y
+    padded = padded.reshape(buckets, bucket_size)
+    missing = np.isnan(padded)
+    argmin = np.where(missing, np.inf, padded).argmin(axis=1)
+    argmax = np.where(missing, -np.inf, padded).argmax(axis=1)
+
+    starts = np.arange(buckets) * bucket_size
+    indices = np.column_stack(
+        [starts + np.minimum(argmin, argmax), starts + np.maximum(argmin, argmax)]
+    ).ravel()
+    # flat buckets give the same point twice
+    indices = indices[np.r_[True, indices[1:] != indices[:-1]]]
+    return x[indices], y[indices]
+
+
+def downsample_series(
+    series: pd.Series, buckets: int, x_range: tuple[any, any] | None = None
+) -> tuple[pd.Index, np.ndarray]:
+    """Downsample the part of a series displayed on a plot, see :func:`downsample_min_max`.
+
+    :param series: Values with a datetime index.
+    :param buckets: Number of buckets, e.g. the plot width in pixels.
+    :param x_range: Displayed range of the index. The whole series if None.
+    :return: Abscissas and values of the downsampled series.
+    """
+    if x_range is not None:
+        # masked rather than sliced: the index of typical year files isn't sorted
+        index = pd.DatetimeIndex(series.index)
+        series = series[(index >= pd.Timestamp(x_range[0])) & (index <= pd.Timestamp(x_range[1]))]
+    return downsample_min_max(series.index, series.to_numpy(dtype=float), buckets)
+
+
 def create_2d_plot(
-    df: pd.DataFrame, series_name: str, width: int = 1200, height: int = 500
-) -> go.Figure:
+    df: pd.DataFrame,
+    series_name: str,
+    width: int = 1200,
+    height: int = 500,
+    downsample: bool | None = None,
+) -> "go.Figure":
     """Create a 2D line plot for a given weather series.
 
     :param df: DataFrame containing weather data.
     :param series_name: Name of the series to plot.
     :param width: Width of the plot in pixels.
     :param height: Height of the plot in pixels.
+    :param downsample: If True, plot the minimum and maximum of each pixel column of the plot
+        only, see :func:`downsample_min_max`. If None, long series (more than
+        :data:`MAX_POINTS_PER_PIXEL` points per pixel, e.g. multi-year files) are downsampled.
     :return: Plotly Figure object.
     """
+    import plotly.graph_objects as go
+
     unit = UNITS.get(series_name, "")
 
+    if downsample is None:
+        downsample = len(df) > MAX_POINTS_PER_PIXEL * width
+    if downsample:
+        x, y = downsample_series(df[series_name], width)
+    else:
+        x, y = df.index, df[series_name]
+
     fig = go.Figure()
     fig.add_trace(
         go.Scattergl(
-            x=df.index,
-            y=df[series_name],
+            x=x,
+            y=y,
             mode="lines",
             name=series_name,
             line=dict(color="rgb(31, 119, 180)"),
@@ -189,40 +199,138 @@ def create_2d_plot(
     return fig
 
 
+def create_2d_plot_widget(
+    df: pd.DataFrame, series_name: str, width: int = 1200, height: int = 500
+) -> "go.FigureWidget":
+    """Create a downsampled 2D line plot for Jupyter notebooks, that shows the full resolution data
+    again when zooming in.
+
+    Requires ipywidgets.
+
+    :param df: DataFrame containing weather data.
+    :param series_name: Name of the series to plot.
+    :param width: Width of the plot in pixels.
+    :param height: Height of the plot in pixels.
+    :return: Plotly FigureWidget, downsampled again on each zoom or pan.
+    """
+    import plotly.graph_objects as go
+
+    series = df[series_name]
+    fig = go.FigureWidget(create_2d_plot(df, series_name, width, height, downsample=True))
+
+    def on_range_change(layout: any, x_range: tuple[any, any] | None) -> None:
+        with fig.batch_update():
+            update_downsampled_trace(fig, series, width, x_range)
+
+    fig.layout.xaxis.on_change(on_range_change, "range")
+    return fig
+
+
+def update_downsampled_trace(
+    fig: "go.Figure", series: pd.Series, buckets: int, x_range: tuple[any, any] | None
+) -> None:
+    """Downsample the line of a 2D plot again for a new displayed range, see
+    :func:`create_2d_plot_widget`.
+
+    :param fig: Figure made by :func:`create_2d_plot`.
+    :param series: The plotted series.
+    :param buckets: Number of buckets, e.g. the plot width in pixels.
+    :param x_range: Displayed range of the index. The whole series if None.
+    """
+    x, y = downsample_series(series, buckets, x_range)
+    fig.data[0].x = x
+    fig.data[0].y = y
+
+
+def make_day_hour_grid(
+    series: pd.Series, period: Literal["D", "W"] = "D"
+) -> tuple[pd.DatetimeIndex, np.ndarray]:
+    """Arrange hourly values on a grid of days (or weeks) by hours, using the datetime index.
+
+    EPW values are for the hour ending at their timestamp: the value at 01:00 goes to hour 0 of
+    the day. Missing hours are NaN, and don't shift the following days.
+
+    Typical year files (TMY) mix months of different years, so when timestamps aren't increasing
+    or jump by years, rows are the days in file order instead, dated as consecutive days from the
+    first one.
+
+    :param series: Hourly values with a datetime index.
+    :param period: "D" for a row per day, "W" for a row per week of 7 days from the first day,
+        holding the mean of each hour over the week.
+    :return: First day of each row, and values of shape (rows, 24).
+    """
+    if period not in ("D", "W"):
+        raise ValueError(f"Invalid period: {period}. Must be 'D' or 'W'.")
+    if series.empty:
+        return pd.DatetimeIndex([]), np.empty((0, 24))
+
+    hour_start = pd.DatetimeIndex(series.index) - pd.Timedelta(hours=1)
+    days = hour_start.normalize()
+    first_day = days[0]
+    steps = np.diff(hour_start.asi8)
+    if (steps > 0).all() and (steps <= _MAX_CALENDAR_GAP.value).all():
+        day_codes = ((days - first_day) // pd.Timedelta(days=1)).to_numpy()
+    else:
+        # a new row each time the day changes
+        day_codes = np.concatenate([[0], np.cumsum(days[1:] != days[:-1])])
+
+    grid = np.full((day_codes.max() + 1, 24), np.nan)
+    grid[day_codes, hour_start.hour] = series.to_numpy(dtype=float)
+    if period == "W":
+        weeks = -(-len(grid) // 7)
+        weekly = np.full((weeks * 7, 24), np.nan)
+        weekly[: len(grid)] = grid
+        weekly = weekly.reshape(weeks, 7, 24)
+        counts = (~np.isnan(weekly)).sum(axis=1)
+        with np.errstate(invalid="ignore"):
+            grid = np.nansum(weekly, axis=1) / counts
+
+    return pd.date_range(first_day, periods=len(grid), freq=f"{1 if period == 'D' else 7}D"), grid
+
+
+def _make_plot_grid(
+    series: pd.Series, period: Literal["D", "W"] | None
+) -> tuple[pd.DatetimeIndex, np.ndarray, Literal["D", "W"]]:
+    """Day by hour grid of a plot, see :func:`make_day_hour_grid`. If period is None, weekly
+    means are used for data of more than :data:`MAX_SURFACE_DAYS` days.
+
+    :return: First day of each row, values of shape (rows, 24), and the period of rows.
+    """
+    dates, grid = make_day_hour_grid(series, period=period or "D")
+    if period is None and len(grid) > MAX_SURFACE_DAYS:
+        return *make_day_hour_grid(series, period="W"), "W"
+    return dates, grid, period or "D"
+
+
 def create_3d_plot(
-    df: pd.DataFrame, series_name: str, width: int = 1200, height: int = 750
-) -> go.Figure:
+    df: pd.DataFrame,
+    series_name: str,
+    width: int = 1200,
+    height: int = 750,
+    period: Literal["D", "W"] | None = None,
+) -> "go.Figure":
     """Create a 3D surface plot showing hour vs day with data values.
 
     :param df: DataFrame containing weather data.
     :param series_name: Name of the series to plot.
     :param width: Width of the plot in pixels.
     :param height: Height of the plot in pixels.
+    :param period: "D" for a row of the surface per day, "W" for weekly means, see
+        :func:`make_day_hour_grid`. If None, weekly means are used for data of more than
+        :data:`MAX_SURFACE_DAYS` days, so that multi-year surfaces stay smooth to render.
     :return: Plotly Figure object.
     """
-    unit = UNITS.get(series_name, "")
+    import plotly.graph_objects as go
 
-    # Reshape data into 2D array: rows = days, columns = hours
-    per_chunk = 24
-    values = df[series_name].values
-
-    # Chunk data into days (24 hours per day)
-    z_data = []
-    for i in range(0, len(values), per_chunk):
-        chunk = values[i : i + per_chunk]
-        if len(chunk) == per_chunk:
-            z_data.append(chunk)
-
-    # Get the first date
-    day_0 = df.index[0].date()
+    unit = UNITS.get(series_name, "")
 
-    # Create y-axis: dates for each day
-    y_dates = [day_0 + pd.Timedelta(days=i) for i in range(len(z_data))]
+    # Reshape data into 2D array: rows = days (or weeks), columns = hours
+    y_dates, z_data, period = _make_plot_grid(df[series_name], period)
 
     fig = go.Figure(
         data=[
             go.Surface(
-                y=y_dates,
+                y=y_dates.date,
                 x=list(range(24)),
                 z=z_data,
                 colorscale="Jet",
@@ -245,7 +353,7 @@ def create_3d_plot(
                 autorange="reversed",
             ),
             yaxis=dict(
-                title="Day of Year",
+                title="Day of Year" if period == "D" else "Week",
             ),
             zaxis=dict(
                 title=f"{series_name} ({unit})" if unit else series_name,
@@ -262,84 +370,142 @@ def create_3d_plot(
     return fig
 
 
-def create_radar_plot(
-    df: pd.DataFrame, series_name: str, width: int = 900, height: int = 700
-) -> go.Figure:
-    """Create a radar (polar) plot showing daily min/max values throughout the year.
+def create_heatmap_plot(
+    df: pd.DataFrame,
+    series_name: str,
+    width: int = 1200,
+    height: int = 500,
+    period: Literal["D", "W"] | None = None,
+) -> "go.Figure":
+    """Create a heatmap of hour vs day with data values.
+
+    A lightweight alternative to :func:`create_3d_plot`: the same day by hour grid is drawn as a
+    single 2D heatmap, which doesn't need WebGL and renders instantly. Values are rounded to
+    :data:`HEATMAP_DECIMALS` decimals, and days are given by their first day and step rather
+    than listed, to keep the figure small.
 
     :param df: DataFrame containing weather data.
     :param series_name: Name of the series to plot.
     :param width: Width of the plot in pixels.
     :param height: Height of the plot in pixels.
+    :param period: "D" for a column per day, "W" for weekly means, see
+        :func:`make_day_hour_grid`. If None, weekly means are used for data of more than
+        :data:`MAX_SURFACE_DAYS` days, as on 3D surfaces.
     :return: Plotly Figure object.
     """
+    import plotly.graph_objects as go
+
     unit = UNITS.get(series_name, "")
 
-    # Group by date to get daily min/max
-    daily_data = df.groupby(df.index.date)[series_name].agg(["min", "max"])
-    daily_data["date"] = daily_data.index
-    daily_data["month"] = pd.to_datetime(daily_data["date"]).dt.strftime("%b")
-
-    # Get max value for color scaling
-    max_val = daily_data["max"].max()
-    min_val = daily_data["min"].min()
-    val_range = max_val - min_val if max_val != min_val else 1
-
-    # Jet colorscale function
-    def jet_colorscale(normalized_value: float, alpha: float = 1.0) -> str:
-        """Create a jet colorscale color."""
-        val = max(0, min(1, normalized_value))
-
-        if val < 0.25:
-            r, g, b = 0, int(4 * val * 255), 255
-        elif val < 0.5:
-            r, g, b = 0, 255, int((1 + 4 * (0.25 - val)) * 255)
-        elif val < 0.75:
-            r, g, b = int(4 * (val - 0.5) * 255), 255, 0
-        else:
-            r, g, b = 255, int((1 + 4 * (0.75 - val)) * 255), 0
+    # Columns are days (or weeks), rows are hours
+    x_dates, grid, period = _make_plot_grid(df[series_name], period)
+
+    fig = go.Figure(
+        data=[
+            go.Heatmap(
+                # columns are consecutive days (or weeks), dx is in milliseconds on date axes
+                x0=x_dates[0].strftime("%Y-%m-%d") if len(x_dates) else None,
+                dx=(1 if period == "D" else 7) * 24 * 3600 * 1000,
+                y=list(range(24)),
+                z=np.round(grid.T, HEATMAP_DECIMALS),
+                colorscale="Jet",
+                colorbar=dict(title=unit if unit else ""),
+                hovertemplate=(
+                    f"%{{x|%b %d, %Y}}, %{{y}}h<br>%{{z:.{HEATMAP_DECIMALS}~f}}"
+                    + (f" {unit}" if unit else "")
+                    + "<extra></extra>"
+                ),
+            )
+        ]
+    )
 
-        r = max(0, min(255, r))
-        g = max(0, min(255, g))
-        b = max(0, min(255, b))
+    fig.update_layout(
+        title=dict(text=f"{series_name} - Heatmap", font=dict(size=16)),
+        xaxis=dict(title="Date" if period == "D" else "Week", type="date", automargin=True),
+        yaxis=dict(title="Hour", ticksuffix="h", dtick=3, automargin=True),
+        width=width,
+        height=height,
+        margin=dict(t=50, r=20, b=50, l=60),
+    )
 
-        return f"rgba({r}, {g}, {b}, {alpha})"
+    return fig
 
-    # Create traces for each day
-    traces = []
-    max_angle = min(360, len(daily_data))
 
-    # Track month changes for labels
-    month_ticks = []
-    current_month = ""
+def _jet_colors(values: np.ndarray, alpha: float = 1.0) -> list[str]:
+    """Colors of the jet colorscale.
 
-    for i, (idx, row) in enumerate(daily_data.iterrows()):
-        theta = (i / len(daily_data)) * max_angle
+    :param values: Values between 0 and 1.
+    :param alpha: Opacity of the colors.
+    :return: The rgba color of each value.
+    """
+    values = np.clip(values, 0, 1)
+    red = np.select([values < 0.5, values < 0.75], [0, 4 * (values - 0.5) * 255], 255)
+    green = np.select(
+        [values < 0.25, values < 0.75], [4 * values * 255, 255], (1 + 4 * (0.75 - values)) * 255
+    )
+    blue = np.select([values < 0.25, values < 0.5], [255, (1 + 4 * (0.25 - values)) * 255], 0)
+    rgb = np.clip(np.column_stack([red, green, blue]).astype(int), 0, 255)
+    return [f"rgba({r}, {g}, {b}, {alpha})" for r, g, b in rgb]
 
-        # Color based on max temperature
-        color_val = (row["max"] - min_val) / val_range if val_range > 0 else 0
-        color = jet_colorscale(color_val, 1.0)
 
-        # Add month label only when month changes
-        month_str = row["month"]
-        if month_str != current_month:
-            month_ticks.append((i, f"<b>{month_str}</b>"))
-            current_month = month_str
-        else:
-            month_ticks.append((i, ""))
+def create_radar_plot(
+    df: pd.DataFrame, series_name: str, width: int = 900, height: int = 700
+) -> "go.Figure":
+    """Create a radar (polar) plot showing daily min/max values throughout the year.
 
+    :param df: DataFrame containing weather data.
+    :param series_name: Name of the series to plot.
+    :param width: Width of the plot in pixels.
+    :param height: Height of the plot in pixels.
+    :return: Plotly Figure object.
+    """
+    import plotly.graph_objects as go
+
+    unit = UNITS.get(series_name, "")
+
+    # Group by date to get daily min/max, days without data aren't drawn
+    daily_data = df.groupby(df.index.date)[series_name].agg(["min", "max"])
+    days = len(daily_data)
+    dates = daily_data.index.astype(str).to_numpy()
+    months = pd.DatetimeIndex(daily_data.index).strftime("%b").to_numpy()
+    daily_data = daily_data.to_numpy()
+    drawn = ~np.isnan(daily_data).any(axis=1)
+
+    # Color based on max value, quantized so that days of the same color share a trace
+    min_val = daily_data[drawn, 0].min(initial=np.inf) if drawn.any() else 0
+    max_val = daily_data[drawn, 1].max(initial=-np.inf) if drawn.any() else 0
+    val_range = max_val - min_val if max_val > min_val else 1
+    color_values = (np.nan_to_num(daily_data[:, 1], nan=min_val) - min_val) / val_range
+    color_bins = np.minimum(color_values * RADAR_COLOR_BINS, RADAR_COLOR_BINS - 1).astype(int)
+    colors = _jet_colors((np.arange(RADAR_COLOR_BINS) + 0.5) / RADAR_COLOR_BINS)
+
+    # One line segment per day, from max to min, segments separated by missing points
+    max_angle = min(360, days)
+    # (angles are rounded, the figure is serialized as JSON text)
+    theta = np.repeat(np.round(np.arange(days) / days * max_angle, 3), 3).reshape(days, 3)
+    r = np.column_stack([daily_data[:, 1], daily_data[:, 0], np.full(days, np.nan)])
+    # hover text data of both ends of each segment, none on separators (an object array, so that
+    # min/max stay numbers for the hover template formatting)
+    customdata = np.full((days, 3, 3), None, dtype=object)
+    customdata[:, :2, 0] = dates[:, np.newaxis]
+    customdata[:, :2, 1] = daily_data[:, np.newaxis, 0]
+    customdata[:, :2, 2] = daily_data[:, np.newaxis, 1]
+
+    traces = []
+    for color_bin in np.unique(color_bins[drawn]):
+        bin_days = drawn & (color_bins == color_bin)
         traces.append(
             go.Scatterpolargl(
-                r=[row["max"], row["min"]],
-                theta=[theta, theta],
+                r=r[bin_days].ravel(),
+                theta=theta[bin_days].ravel(),
+                customdata=customdata[bin_days].reshape(-1, 3),
                 mode="lines",
-                line=dict(color=color, width=3),
-                fill="toself",
-                name=str(row["date"]),
+                line=dict(color=colors[color_bin], width=3),
+                connectgaps=False,
                 hovertemplate=(
-                    f"{row['date']}<br>"
-                    f"Min: {row['min']:.1f}{unit}<br>"
-                    f"Max: {row['max']:.1f}{unit}<extra></extra>"
+                    "%{customdata[0]}<br>"
+                    f"Min: %{{customdata[1]:.1f}}{unit}<br>"
+                    f"Max: %{{customdata[2]:.1f}}{unit}<extra></extra>"
                 ),
                 showlegend=False,
             )
@@ -347,6 +513,10 @@ def create_radar_plot(
 
     fig = go.Figure(data=traces)
 
+    # Month labels on the first day of each month
+    month_starts = np.r_[True, months[1:] != months[:-1]]
+    month_ticks = np.where(month_starts, "<b>" + months + "</b>", "")
+
     fig.update_layout(
         polar=dict(
             radialaxis=dict(
@@ -367,8 +537,8 @@ def create_radar_plot(
                 linecolor="gray",
                 rotation=90,  # Start first day at top
                 tickmode="array",
-                tickvals=[t[0] for t in month_ticks],
-                ticktext=[t[1] for t in month_ticks],
+                tickvals=np.arange(days),
+                ticktext=month_ticks,
                 tickangle=0,
                 ticks="inside",
             ),
@@ -394,22 +564,24 @@ def create_radar_plot(
 def visualize_epw(
     epw_file_path: str,
     series_name: str = "Dry Bulb Temperature",
-    plot_type: Literal["2D", "3D", "radar"] = "2D",
+    plot_type: Literal["2D", "3D", "heatmap", "radar"] = "2D",
     show: bool = True,
     renderer: Literal["notebook", "browser", "iframe"] = "notebook",
-) -> go.Figure:
+) -> "go.Figure":
     """Visualize EPW weather data with interactive plots.
 
-    :param epw_file_path: Path to the EPW file.
+    :param epw_file_path: Path to the EPW file. Parsed files are cached, see
+        :mod:`era5epw.epw_cache`.
     :param series_name: Name of the weather series to visualize.
-    :param plot_type: Type of plot: "2D", "3D", or "radar".
+    :param plot_type: Type of plot: "2D", "3D", "heatmap", or "radar".
     :param show: If True, display the plot immediately (useful in Jupyter).
     :param renderer: Renderer to use for displaying the plot ("notebook", "browser", or
         "iframe").
     :return: Plotly Figure object.
     """
-    # Read EPW file
-    df = read_epw_file(epw_file_path)
+    # Read EPW file, parsed files are cached when plotting the same file several times
+    with profile_section("read_epw"):
+        df = read_epw_file_cached(epw_file_path)
 
     # Validate series name
     visible_series = get_visible_series(df)
@@ -419,14 +591,19 @@ def visualize_epw(
         )
 
     # Create the appropriate plot
-    if plot_type == "2D":
-        fig = create_2d_plot(df, series_name)
-    elif plot_type == "3D":
-        fig = create_3d_plot(df, series_name)
-    elif plot_type == "radar":
-        fig = create_radar_plot(df, series_name)
-    else:
-        raise ValueError(f"Invalid plot_type: {plot_type}. Must be '2D', '3D', or 'radar'.")
+    with profile_section("plot"):
+        if plot_type == "2D":
+            fig = create_2d_plot(df, series_name)
+        elif plot_type == "3D":
+            fig = create_3d_plot(df, series_name)
+        elif plot_type == "heatmap":
+            fig = create_heatmap_plot(df, series_name)
+        elif plot_type == "radar":
+            fig = create_radar_plot(df, series_name)
+        else:
+            raise ValueError(
+                f"Invalid plot_type: {plot_type}. Must be '2D', '3D', 'heatmap', or 'radar'."
+            )
 
     if show:
         fig.show(renderer=renderer)
@@ -434,78 +611,5 @@ def visualize_epw(
     return fig
 
 
-def visualize_cli() -> None:
-    """Command-line interface for EPW visualization."""
-    parser = argparse.ArgumentParser(
-        description="Visualize EPW (EnergyPlus Weather) file data with interactive plots."
-    )
-    parser.add_argument(
-        "epw_file",
-        type=str,
-        help="Path to the EPW file to visualize.",
-    )
-    parser.add_argument(
-        "--series",
-        type=str,
-        default="Dry Bulb Temperature",
-        help="Weather series to visualize (e.g., 'Dry Bulb Temperature', 'Wind Speed').",
-    )
-    parser.add_argument(
-        "--type",
-        type=str,
-        choices=["2D", "3D", "radar"],
-        default="2D",
-        help="Type of visualization: 2D (line plot), 3D (surface plot), or radar (polar plot).",
-    )
-    parser.add_argument(
-        "--output",
-        type=str,
-        help="Path to save the plot as an HTML file. If not provided, opens in browser.",
-    )
-    parser.add_argument(
-        "--list-series",
-        action="store_true",
-        help="List all available weather series in the EPW file and exit.",
-    )
-
-    args = parser.parse_args()
-
-    # Check if file exists
-    if not Path(args.epw_file).exists():
-        print(f"Error: EPW file not found: {args.epw_file}")
-        return
-
-    # List series if requested
-    if args.list_series:
-        df = read_epw_file(args.epw_file)
-        visible_series = get_visible_series(df)
-        print("Available weather series:")
-        for series in visible_series:
-            unit = UNITS.get(series, "")
-            print(f"  - {series}" + (f" ({unit})" if unit else ""))
-        return
-
-    # Create single visualization
-    try:
-        fig = visualize_epw(
-            epw_file_path=args.epw_file,
-            series_name=args.series,
-            plot_type=args.type,
-            show=False,
-        )
-
-        if args.output:
-            fig.write_html(args.output)
-            print(f"Visualization saved to {args.output}")
-        else:
-            fig.show()
-
-    except Exception as e:
-        print(f"Error creating visualization: {e}")
-        import traceback
-
-        traceback.print_exc()
-
-
 if __name__ == "__main__":
     visualize_cli()
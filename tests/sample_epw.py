@@ -0,0 +1,23 @@
+"""Sample EPW file shared by the tests and the benchmarks."""
+
+
+def write_sample_epw_file(epw_file: str) -> None:
+    """Write a small EPW file of 2 days, with temperature and wind speed varying with the hour."""
+    with open(epw_file, "w") as f:
+        f.write("LOCATION,Test City,,,ERA5,n/a,48.86,2.35,1,35\n")
+        f.write("DESIGN CONDITIONS,0\n")
+        f.write("TYPICAL/EXTREME PERIODS,0\n")
+        f.write("GROUND TEMPERATURES,0\n")
+        f.write("HOLIDAYS/DAYLIGHT SAVINGS,No,0,0,0\n")
+        f.write("COMMENTS 1,Test data\n")
+        f.write("COMMENTS 2,Test data\n")
+        f.write("DATA PERIODS,1,1,Data,Monday,1/1,1/2\n")
+        for day in range(1, 3):
+            for hour in range(1, 25):
+                temp = 10.0 + (hour % 12)
+                wind = 2.0 + (hour % 6)
+                f.write(
+                    f"2024,1,{day},{hour},0,9,{temp},{temp - 2},80,101325,"
+                    f"9999,9999,9999,100,50,40,11000,5250,4760,9999,"
+                    f"180,{wind},5,5,9999,77777,0,999999999,999,999,0,99,0.5,0,1\n"
+                )
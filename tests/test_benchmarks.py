@@ -0,0 +1,46 @@
+import tempfile
+import unittest
+
+from benchmarks import bench_imports
+from benchmarks.bench_pipeline import (
+    STAGES,
+    compare_results,
+    make_scenario_site_years,
+    make_site_year_fixtures,
+    run_site_year,
+)
+
+
+class TestBenchPipeline(unittest.TestCase):
+    def test_make_scenario_site_years(self):
+        site_years = make_scenario_site_years(sites=500, years=1)
+        self.assertEqual(len(site_years), 500)
+        self.assertEqual(len(set(site_years)), 500)
+        self.assertEqual([year for _, _, year in make_scenario_site_years(1, 25)][0], 1999)
+
+    def test_run_site_year(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            era5_files, cams_file = make_site_year_fixtures(tmpdir, 49.5, 0.0, 2023)
+            timings = run_site_year(era5_files, cams_file, 49.5, 0.0, 2023, tmpdir)
+        self.assertEqual(sorted(timings), sorted(STAGES))
+
+    def test_compare_results(self):
+        baseline = {"scenarios": {"a": {"per_site_year": {"decode": 1.0, "read_epw": 1.0}}}}
+        results = {"scenarios": {"a": {"per_site_year": {"decode": 1.1, "read_epw": 1.5}}}}
+        regressions = compare_results(results, baseline, max_regression=0.25)
+        self.assertEqual(len(regressions), 1)
+        self.assertTrue(regressions[0].startswith("a/read_epw"))
+        self.assertEqual(compare_results(results, baseline, max_regression=0.6), [])
+
+
+class TestBenchImports(unittest.TestCase):
+    def test_compare_results(self):
+        baseline = {"commands": {"download --help": {"seconds": 0.1}}}
+        results = {"commands": {"download --help": {"seconds": 0.5}, "worker": {"seconds": 1.0}}}
+        regressions = bench_imports.compare_results(results, baseline, max_regression=0.25)
+        self.assertEqual(len(regressions), 1)
+        self.assertTrue(regressions[0].startswith("download --help"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from era5epw.cache import DownloadCache, get_download_cache, make_cache_key, parse_size
+from era5epw.utils import execute_download_request
+
+
+class TestDownloadCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmpdir.name, "cache")
+        self.request = {
+            "variable": ["2m_temperature"],
+            "date": ["2021-01-01/2021-01-31"],
+            "location": {"longitude": 10.0, "latitude": 50.0},
+        }
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def make_file(self, name: str, size: int) -> str:
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, "wb") as f:
+            f.write(os.urandom(size))
+        return path
+
+    def test_parse_size(self):
+        self.assertEqual(parse_size("1024"), 1024)
+        self.assertEqual(parse_size(2048), 2048)
+        self.assertEqual(parse_size("500M"), 500 * 1024**2)
+        self.assertEqual(parse_size("10G"), 10 * 1024**3)
+        self.assertEqual(parse_size("1.5KiB"), 1536)
+
+    def test_make_cache_key(self):
+        reordered_request = {
+            "location": {"latitude": 50.0, "longitude": 10.0},
+            "date": ["2021-01-01/2021-01-31"],
+            "variable": ["2m_temperature"],
+        }
+        key = make_cache_key("reanalysis-era5-single-levels-timeseries", self.request)
+        self.assertEqual(
+            key, make_cache_key("reanalysis-era5-single-levels-timeseries", reordered_request)
+        )
+        self.assertNotEqual(key, make_cache_key("reanalysis-era5-land-timeseries", self.request))
+
+    def test_put_and_get(self):
+        cache = DownloadCache(self.cache_dir)
+        source_file = self.make_file("source.nc", 100)
+        target_file = os.path.join(self.tmpdir.name, "target.nc")
+
+        self.assertFalse(cache.get("ds", self.request, target_file))
+        self.assertFalse(os.path.exists(target_file))
+
+        cache.put("ds", self.request, source_file)
+        self.assertTrue(cache.contains("ds", self.request))
+        self.assertTrue(cache.get("ds", self.request, target_file))
+        with open(source_file, "rb") as f1, open(target_file, "rb") as f2:
+            self.assertEqual(f1.read(), f2.read())
+
+        # no temporary file left behind
+        self.assertEqual(
+            [name for name in os.listdir(self.cache_dir) if name.startswith(".tmp-")], []
+        )
+
+    def test_lru_eviction(self):
+        cache = DownloadCache(self.cache_dir, max_size=250)
+        requests = [dict(self.request, date=[f"2021-0{i}-01/2021-0{i}-28"]) for i in range(1, 4)]
+
+        cache.put("ds", requests[0], self.make_file("f0", 100))
+        cache.put("ds", requests[1], self.make_file("f1", 100))
+        # access the first entry so that the second one becomes the least recently used
+        entry_0 = cache.entry_path(make_cache_key("ds", requests[0]))
+        entry_1 = cache.entry_path(make_cache_key("ds", requests[1]))
+        os.utime(entry_1, (time.time() - 10, time.time() - 10))
+        self.assertTrue(cache.get("ds", requests[0], os.path.join(self.tmpdir.name, "out")))
+
+        cache.put("ds", requests[2], self.make_file("f2", 100))
+
+        self.assertTrue(os.path.exists(entry_0))
+        self.assertFalse(os.path.exists(entry_1))
+        self.assertTrue(cache.contains("ds", requests[2]))
+        self.assertEqual(cache.stats()["size"], 200)
+
+    def test_stats_and_prune(self):
+        cache = DownloadCache(self.cache_dir)
+        cache.put("ds1", self.request, self.make_file("f0", 100))
+        cache.put("ds2", self.request, self.make_file("f1", 50))
+
+        stats = cache.stats()
+        self.assertEqual(stats["entries"], 2)
+        self.assertEqual(stats["size"], 150)
+        self.assertEqual(stats["datasets"]["ds1"], {"entries": 1, "size": 100})
+        self.assertEqual(stats["datasets"]["ds2"], {"entries": 1, "size": 50})
+
+        evicted = cache.prune(max_size=0)
+        self.assertEqual(len(evicted), 2)
+        self.assertEqual(cache.stats()["entries"], 0)
+
+    def test_get_download_cache(self):
+        with mock.patch.dict(os.environ, {"ERA5EPW_CACHE_DIR": ""}):
+            self.assertIsNone(get_download_cache())
+        with mock.patch.dict(os.environ, {"ERA5EPW_CACHE_DIR": self.cache_dir}):
+            self.assertEqual(get_download_cache().cache_dir, self.cache_dir)
+        self.assertEqual(get_download_cache(self.cache_dir).cache_dir, self.cache_dir)
+
+    def test_execute_download_request_cache_hit(self):
+        cache = DownloadCache(self.cache_dir)
+        cache.put("ds", self.request, self.make_file("source.nc", 10))
+        target_file = os.path.join(self.tmpdir.name, "target.nc")
+
+        with mock.patch("cdsapi.Client") as client:
+            execute_download_request(
+                "http://localhost", "ds", self.request, target_file, cache_dir=self.cache_dir
+            )
+            client.assert_not_called()
+
+        self.assertEqual(os.path.getsize(target_file), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
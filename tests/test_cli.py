@@ -0,0 +1,87 @@
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from benchmarks.bench_imports import run_command
+from era5epw.cli import compare_cli, create_args, export_cli, visualize_cli
+from tests.sample_epw import write_sample_epw_file
+
+
+class TestCli(unittest.TestCase):
+    def test_download_help_is_light(self):
+        _, loaded = run_command(
+            "import sys; sys.argv = ['era5epw_download', '--help']\n"
+            "from era5epw.cli import download; download()",
+            repeat=1,
+        )
+        self.assertEqual(loaded, [])
+
+    def test_worker_is_light(self):
+        _, loaded = run_command("from era5epw.utils import execute_download_request", repeat=1)
+        self.assertEqual(loaded, [])
+
+    def test_entry_point_aliases(self):
+        # entry points moved to era5epw.cli are still importable from their former modules
+        process = subprocess.run(
+            [sys.executable, "-c", "from era5epw.main import download; import era5epw.visualize"],
+            capture_output=True,
+        )
+        self.assertEqual(process.returncode, 0, process.stderr)
+
+    def test_create_args(self):
+        args = create_args().parse_args(["--year", "2021", "--profile"])
+        self.assertEqual(args.year, 2021)
+        self.assertEqual(args.profile, "era5epw_download.prof")
+
+    def test_visualize_list_series(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            epw_file = os.path.join(tmpdir, "test.epw")
+            write_sample_epw_file(epw_file)
+            output = io.StringIO()
+            with mock.patch("sys.argv", ["era5epw_visualize", epw_file, "--list-series"]):
+                with contextlib.redirect_stdout(output):
+                    visualize_cli()
+        self.assertIn("  - Dry Bulb Temperature (°C)", output.getvalue())
+
+    def test_compare(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            epw_files = [os.path.join(tmpdir, f"{year}.epw") for year in (2023, 2024)]
+            for epw_file in epw_files:
+                write_sample_epw_file(epw_file)
+            output_file = os.path.join(tmpdir, "compare.html")
+            argv = [
+                "era5epw_compare",
+                *epw_files,
+                "--type",
+                "distribution",
+                "--output",
+                output_file,
+            ]
+            output = io.StringIO()
+            with mock.patch("sys.argv", argv), contextlib.redirect_stdout(output):
+                compare_cli()
+            self.assertTrue(os.path.exists(output_file))
+        self.assertIn("Comparison saved to", output.getvalue())
+
+    def test_export(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            write_sample_epw_file(os.path.join(tmpdir, "sample.epw"))
+            output_dir = os.path.join(tmpdir, "plots")
+            argv = ["era5epw_export", os.path.join(tmpdir, "*.epw"), "--output-dir", output_dir]
+            output = io.StringIO()
+            with mock.patch("sys.argv", argv), contextlib.redirect_stdout(output):
+                export_cli()
+            self.assertEqual(
+                sorted(os.listdir(output_dir)),
+                ["plotly.min.js", "sample_dry_bulb_temperature_2d.html"],
+            )
+        self.assertIn("Exported plots of 1 EPW files", output.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
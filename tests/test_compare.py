@@ -0,0 +1,100 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from era5epw.compare import (
+    HOURS_PER_YEAR,
+    align_hour_of_year,
+    compare_epw,
+    hour_of_year,
+    make_labels,
+    read_epw_files,
+)
+from era5epw.epw import read_epw_file
+from tests.sample_epw import write_sample_epw_file
+
+
+class TestCompare(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.epw_files = [os.path.join(self.tmpdir.name, f"{name}.epw") for name in "ab"]
+        for epw_file in self.epw_files:
+            write_sample_epw_file(epw_file)
+        # the second file is 2.5 degrees warmer
+        with open(self.epw_files[1]) as f:
+            lines = f.readlines()
+        for i in range(8, len(lines)):
+            fields = lines[i].split(",")
+            fields[6] = str(float(fields[6]) + 2.5)
+            lines[i] = ",".join(fields)
+        with open(self.epw_files[1], "w") as f:
+            f.writelines(lines)
+        self.temperature = read_epw_file(self.epw_files[0])["Dry Bulb Temperature"].to_numpy()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_hour_of_year(self):
+        leap_year = pd.date_range("2024-01-01 01:00", "2025-01-01 00:00", freq="h")
+        hours = hour_of_year(leap_year)
+        self.assertEqual((hours == -1).sum(), 24)
+        np.testing.assert_array_equal(hours[hours >= 0], np.arange(HOURS_PER_YEAR))
+        # March 1st is aligned with non-leap years
+        march_1 = pd.DatetimeIndex(["2023-03-01 01:00", "2024-03-01 01:00"])
+        np.testing.assert_array_equal(hour_of_year(march_1), [59 * 24, 59 * 24])
+
+    def test_align_hour_of_year(self):
+        dfs = read_epw_files(self.epw_files)
+        stacked = align_hour_of_year(dfs, "Dry Bulb Temperature")
+        self.assertEqual(stacked.shape, (2, HOURS_PER_YEAR))
+        np.testing.assert_array_equal(stacked[:, :48], [self.temperature, self.temperature + 2.5])
+        self.assertTrue(np.isnan(stacked[:, 48:]).all())
+
+        dfs = read_epw_files(self.epw_files, columns=["Dry Bulb Temperature"])
+        self.assertEqual([list(df.columns) for df in dfs], [["Dry Bulb Temperature"]] * 2)
+        np.testing.assert_array_equal(align_hour_of_year(dfs, "Dry Bulb Temperature"), stacked)
+
+    def test_align_hour_of_year_multi_year(self):
+        index = pd.date_range("2022-01-01 01:00", "2024-01-01 00:00", freq="h")
+        year = (index - pd.Timedelta(hours=1)).year
+        df = pd.DataFrame({"Dry Bulb Temperature": np.where(year == 2022, 10.0, 20.0)}, index)
+        df.iloc[0, 0] = np.nan
+        stacked = align_hour_of_year([df], "Dry Bulb Temperature")
+        # the mean of the years, of the available values only
+        self.assertEqual(stacked[0, 0], 20.0)
+        np.testing.assert_array_equal(stacked[0, 1:], 15.0)
+
+    def test_compare_epw(self):
+        fig = compare_epw(self.epw_files, show=False)
+        self.assertEqual([trace.name for trace in fig.data], ["a.epw", "b.epw"])
+
+        fig = compare_epw(self.epw_files, plot_type="difference", labels=["A", "B"], show=False)
+        self.assertEqual(len(fig.data), 1)
+        np.testing.assert_array_equal(np.asarray(fig.data[0].y, dtype=float)[:48], 2.5)
+
+        fig = compare_epw(self.epw_files, plot_type="distribution", show=False)
+        median = np.median(self.temperature)
+        self.assertEqual(list(fig.data[0].median), [median, median + 2.5])
+
+        with self.assertRaises(ValueError):
+            compare_epw(self.epw_files[:1], plot_type="difference", show=False)
+        with self.assertRaises(ValueError):
+            compare_epw(self.epw_files, series_name="Year", show=False)
+        # checked before reading any file
+        with (
+            mock.patch("era5epw.compare.read_epw_files", side_effect=AssertionError),
+            self.assertRaises(ValueError),
+        ):
+            compare_epw(self.epw_files, series_name="Unknown", show=False)
+
+    def test_make_labels(self):
+        self.assertEqual(make_labels(["x/a.epw", "y/b.epw"]), ["a.epw", "b.epw"])
+        self.assertEqual(make_labels(["x/a.epw", "y/a.epw"]), ["x/a.epw", "y/a.epw"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,259 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_pipeline import make_site_year_fixtures
+from era5epw import ads, cds
+from era5epw.cache import DownloadCache
+from era5epw.epw import (
+    EPW_COLUMNS,
+    EPW_COMPACT_DTYPES,
+    EpwData,
+    format_epw_rows,
+    format_epw_sites_rows,
+    iter_epw_file,
+    read_epw_file,
+    read_epw_header,
+    write_epw_file,
+)
+from era5epw.main import download_epw
+from tests.sample_epw import write_sample_epw_file
+
+
+def to_csv(df: pd.DataFrame) -> str:
+    return df.to_csv(index=False, header=False, lineterminator=os.linesep)
+
+
+class TestEpwWriter(unittest.TestCase):
+    def test_same_as_to_csv(self):
+        rng = np.random.default_rng(0)
+        n = 48
+        df = pd.DataFrame(
+            {
+                "Year": np.full(n, 2024),
+                "Hour": np.tile(np.arange(1, 25), 2),
+                "Flags": ["?9?9?9?9E0?9?9?9"] * n,
+                "Dry Bulb": np.round(rng.normal(10, 5, n), 1),
+                "Pressure": np.round(rng.normal(101325, 500, n)),
+                "Missing": np.where(np.arange(n) % 5, 1.5, np.nan),
+                "Signed zero": np.where(np.arange(n) % 2, 0.0, -0.0),
+                "Extremes": np.where(np.arange(n) % 2, 1e16, 1e-5),
+                "Float32": np.round(rng.normal(0, 1, n), 2).astype(np.float32),
+                "Nullable": pd.array(np.where(np.arange(n) % 3, 1, 0), dtype="Int64"),
+                "Text": ["{}", "{x}", None, "a"] * (n // 4),
+                "Bool": np.arange(n) % 2 == 0,
+                "Constant": 9999,
+            }
+        )
+        self.assertEqual(format_epw_rows(df), to_csv(df))
+        # constant columns only, and no rows
+        self.assertEqual(format_epw_rows(df[["Year", "Flags"]]), to_csv(df[["Year", "Flags"]]))
+        self.assertEqual(format_epw_rows(df.iloc[:0]), to_csv(df.iloc[:0]))
+
+    def test_format_epw_sites_rows(self):
+        hours = np.arange(1, 25)
+        fields = {
+            "Hour": hours,
+            "Flags": "9",
+            "Dry Bulb": np.round(np.random.default_rng(0).normal(10, 5, (3, 24)), 1),
+            "Signed zero": np.where(np.arange(72).reshape(3, 24) % 2, 0.0, -0.0),
+            "Missing": 9999,
+        }
+        rows = format_epw_sites_rows(fields)
+        self.assertEqual(len(rows), 3)
+        for site, site_rows in enumerate(rows):
+            df = pd.DataFrame(
+                {
+                    name: value[site] if np.ndim(value) == 2 else value
+                    for name, value in fields.items()
+                }
+            )
+            self.assertEqual(site_rows, to_csv(df))
+
+    def test_write_epw_file(self):
+        df = pd.DataFrame({"Year": [2024, 2024], "Dry Bulb": [1.5, -2.0]})
+        with tempfile.TemporaryDirectory() as tmpdir:
+            epw_file = os.path.join(tmpdir, "test.epw")
+            write_epw_file(epw_file, ["LOCATION,Test", "COMMENTS 1,"], df)
+            with open(epw_file) as f:
+                content = f.read()
+        self.assertEqual(content, "LOCATION,Test\nCOMMENTS 1,\n2024,1.5\n2024,-2.0\n")
+
+
+class TestEpwReader(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.epw_file = os.path.join(self.tmpdir.name, "sample.epw")
+        write_sample_epw_file(self.epw_file)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_compact(self):
+        df = read_epw_file(self.epw_file)
+        compact = read_epw_file(self.epw_file, compact=True)
+        self.assertEqual(compact.dtypes.to_dict(), EPW_COMPACT_DTYPES)
+        self.assertLess(compact.memory_usage(deep=True).sum(), df.memory_usage(deep=True).sum() / 2)
+        pd.testing.assert_index_equal(compact.index, df.index)
+        pd.testing.assert_frame_equal(compact.astype(df.dtypes.to_dict()), df)
+
+    def test_columns(self):
+        df = read_epw_file(self.epw_file, columns=["Wind Speed", "Dry Bulb Temperature"])
+        self.assertEqual(list(df.columns), ["Wind Speed", "Dry Bulb Temperature"])
+        pd.testing.assert_frame_equal(df, read_epw_file(self.epw_file)[list(df.columns)])
+
+        df = read_epw_file(self.epw_file, columns=["Present Weather Codes"], compact=True)
+        self.assertEqual(df["Present Weather Codes"].dtype, "category")
+        self.assertEqual(len(df), 48)
+
+        with self.assertRaises(ValueError):
+            read_epw_file(self.epw_file, columns=["Dry Bulb"])
+
+    def test_read_epw_header(self):
+        epw = read_epw_header(self.epw_file)
+        self.assertIsNone(epw.data)
+        self.assertEqual(len(epw.header), 8)
+        self.assertEqual(epw.location["latitude"], 48.86)
+        self.assertEqual(
+            epw.data_periods,
+            [
+                {
+                    "name": "Data",
+                    "records_per_hour": 1,
+                    "start_day_of_week": "Monday",
+                    "start": "1/1",
+                    "end": "1/2",
+                }
+            ],
+        )
+        with self.assertRaises(ValueError):
+            epw.to_text()
+
+        with open(self.epw_file, "w") as f:
+            f.write("LOCATION,Test City,,,ERA5,n/a,48.86,2.35,1,35\n")
+        with self.assertRaises(ValueError):
+            read_epw_header(self.epw_file)
+
+    def test_iter_epw_file(self):
+        df = read_epw_file(self.epw_file, columns=["Dry Bulb Temperature"], compact=True)
+        chunks = list(
+            iter_epw_file(
+                self.epw_file, chunk_size=20, columns=["Dry Bulb Temperature"], compact=True
+            )
+        )
+        self.assertEqual([len(chunk) for chunk in chunks], [20, 20, 8])
+        pd.testing.assert_frame_equal(pd.concat(chunks), df)
+
+    def test_iter_epw_file_compact_text_fields(self):
+        # weather codes differ between chunks
+        with open(self.epw_file) as f:
+            lines = f.readlines()
+        lines[-1] = lines[-1].replace(",999999999,", ",070999999,", 1)
+        with open(self.epw_file, "w") as f:
+            f.writelines(lines)
+
+        df = pd.concat(iter_epw_file(self.epw_file, chunk_size=20, compact=True))
+        self.assertEqual(df["Present Weather Codes"].iloc[-1], "070999999")
+        pd.testing.assert_frame_equal(
+            df.astype(
+                {
+                    "Data Source and Uncertainty Flags": "category",
+                    "Present Weather Codes": "category",
+                }
+            ),
+            read_epw_file(self.epw_file, compact=True),
+        )
+
+    def test_iter_epw_file_invalid_values(self):
+        with open(self.epw_file) as f:
+            lines = f.readlines()
+        lines[-1] = lines[-1].replace(",10.0,", ",abc,", 1)
+        with open(self.epw_file, "w") as f:
+            f.writelines(lines)
+
+        chunks = list(iter_epw_file(self.epw_file, chunk_size=20))
+        self.assertEqual([len(chunk) for chunk in chunks], [20, 20, 8])
+        df = pd.concat(chunks)
+        pd.testing.assert_frame_equal(df, read_epw_file(self.epw_file))
+        self.assertTrue(pd.isna(df["Dry Bulb Temperature"].iloc[-1]))
+
+    def test_iter_epw_file_invalid_values_after_blank_line(self):
+        with open(self.epw_file) as f:
+            lines = f.readlines()
+        # an invalid value in the second chunk, after a blank line in the first one
+        fields = lines[8 + 30].split(",")
+        fields[6] = "abc"
+        lines[8 + 30] = ",".join(fields)
+        lines.insert(8 + 5, "\n")
+        with open(self.epw_file, "w") as f:
+            f.writelines(lines)
+
+        chunks = list(iter_epw_file(self.epw_file, chunk_size=20))
+        self.assertEqual([len(chunk) for chunk in chunks], [20, 20, 8])
+        df = pd.concat(chunks)
+        pd.testing.assert_frame_equal(df, read_epw_file(self.epw_file))
+        self.assertTrue(pd.isna(df["Dry Bulb Temperature"].iloc[30]))
+
+    def test_epw_data_read(self):
+        epw = EpwData.read(self.epw_file)
+        pd.testing.assert_frame_equal(epw.data, read_epw_file(self.epw_file))
+        self.assertEqual(epw.location["city"], "Test City")
+
+
+class TestEpwData(unittest.TestCase):
+    def test_epw_data(self):
+        header = [
+            "LOCATION,Test City,,FRA,ERA5 (ECMWF),n/a,48.86,2.35,1,35",
+            "GROUND TEMPERATURES,0",
+            "COMMENTS 1,Data from ERA5, CAMS",
+        ]
+        epw = EpwData(header, pd.DataFrame({"Year": [2024, 2024], "Dry Bulb": [1.5, -2.0]}))
+        self.assertEqual(epw.header_fields["GROUND TEMPERATURES"], ["0"])
+        self.assertEqual(epw.location["city"], "Test City")
+        self.assertEqual(epw.location["latitude"], 48.86)
+        self.assertEqual(epw.location["elevation"], 35)
+        self.assertEqual(
+            epw.to_bytes("\r\n"),
+            b"LOCATION,Test City,,FRA,ERA5 (ECMWF),n/a,48.86,2.35,1,35\r\n"
+            b"GROUND TEMPERATURES,0\r\nCOMMENTS 1,Data from ERA5, CAMS\r\n"
+            b"2024,1.5\r\n2024,-2.0\r\n",
+        )
+
+    def test_download_epw(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            # fill the download cache with fixtures, and generate the EPW data offline
+            cache = DownloadCache(os.path.join(tmpdir, "cache"))
+            era5_files, cams_file = make_site_year_fixtures(tmpdir, 49.5, 0.0, 2021)
+            era5_requests = cds.make_era5_requests(cds.epw_variables, 2021, 49.5, 0.0, None)
+            for request, file_path in zip(era5_requests, era5_files):
+                cache.put(request["dataset"], request, file_path)
+            cams_request = ads.make_cams_solar_radiation_request(0.0, 49.5, 2021)
+            cache.put(ads.dataset, cams_request, cams_file)
+
+            epw = download_epw(
+                year=2021,
+                latitude=49.5,
+                longitude=0.0,
+                city_name="Test",
+                time_zone=0,
+                elevation=0,
+                parallel_exec_nb=2,
+                cache_dir=cache.cache_dir,
+                offline=True,
+            )
+            epw_file = os.path.join(tmpdir, "test.epw")
+            epw.write(epw_file)
+            with open(epw_file, "rb") as f:
+                self.assertEqual(f.read(), epw.to_bytes())
+
+        self.assertEqual(list(epw.data.columns), EPW_COLUMNS)
+        self.assertEqual(len(epw.data), 8760)
+        self.assertEqual(epw.location["latitude"], 49.5)
+        self.assertEqual(epw.header_fields["DATA PERIODS"][-1], "12/31")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from era5epw import epw_cache
+from era5epw.epw import read_epw_file
+from era5epw.epw_cache import EPW_CACHE_DIR_ENV_VAR, EpwFileCache, get_epw_file_cache
+from tests.sample_epw import write_sample_epw_file
+
+
+class TestEpwFileCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.epw_file = os.path.join(self.tmpdir.name, "sample.epw")
+        write_sample_epw_file(self.epw_file)
+        self.sidecar_dir = os.path.join(self.tmpdir.name, "sidecars")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def rewrite_epw_file(self, old: str, new: str) -> None:
+        with open(self.epw_file) as f:
+            content = f.read()
+        with open(self.epw_file, "w") as f:
+            f.write(content.replace(old, new))
+
+    def test_in_process_cache(self):
+        cache = EpwFileCache(max_entries=1)
+        df = cache.read(self.epw_file)
+        pd.testing.assert_frame_equal(df, read_epw_file(self.epw_file))
+
+        # the cached DataFrame can't be modified by callers
+        df["Dry Bulb Temperature"] = 0
+        with mock.patch.object(epw_cache, "read_epw_file", side_effect=AssertionError):
+            self.assertEqual(cache.read(self.epw_file)["Dry Bulb Temperature"].iloc[0], 11.0)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        # invalidated when the file changes
+        self.rewrite_epw_file(",11.0,", ",12.0,")
+        self.assertEqual(cache.read(self.epw_file)["Dry Bulb Temperature"].iloc[0], 12.0)
+        self.assertEqual(cache.misses, 2)
+
+        # least recently used files are evicted
+        other_file = os.path.join(self.tmpdir.name, "other.epw")
+        write_sample_epw_file(other_file)
+        cache.read(other_file)
+        cache.read(self.epw_file)
+        self.assertEqual(cache.misses, 4)
+
+    def test_sidecar(self):
+        df = EpwFileCache(sidecar_dir=self.sidecar_dir).read(self.epw_file)
+        self.assertTrue(
+            os.path.exists(EpwFileCache(sidecar_dir=self.sidecar_dir).sidecar_path(self.epw_file))
+        )
+
+        # another process doesn't parse the file
+        cache = EpwFileCache(sidecar_dir=self.sidecar_dir)
+        with mock.patch.object(epw_cache, "read_epw_file", side_effect=AssertionError):
+            pd.testing.assert_frame_equal(cache.read(self.epw_file), df)
+
+        # same content, other modification time: the content hash still matches
+        os.utime(self.epw_file, ns=(0, 0))
+        cache = EpwFileCache(sidecar_dir=self.sidecar_dir)
+        with mock.patch.object(epw_cache, "read_epw_file", side_effect=AssertionError):
+            pd.testing.assert_frame_equal(cache.read(self.epw_file), df)
+        # and the sidecar is updated, the file isn't hashed again
+        cache = EpwFileCache(sidecar_dir=self.sidecar_dir)
+        with (
+            mock.patch.object(epw_cache, "read_epw_file", side_effect=AssertionError),
+            mock.patch.object(epw_cache, "hash_file", side_effect=AssertionError),
+        ):
+            pd.testing.assert_frame_equal(cache.read(self.epw_file), df)
+
+        # same size, other content
+        self.rewrite_epw_file(",11.0,", ",12.0,")
+        os.utime(self.epw_file, ns=(10**9, 10**9))
+        cache = EpwFileCache(sidecar_dir=self.sidecar_dir)
+        self.assertEqual(cache.read(self.epw_file)["Dry Bulb Temperature"].iloc[0], 12.0)
+        self.assertEqual(cache.misses, 1)
+
+    def test_sidecar_missing_text_values(self):
+        self.rewrite_epw_file(",999999999,", ",,")
+        df = EpwFileCache(sidecar_dir=self.sidecar_dir).read(self.epw_file)
+        cached = EpwFileCache(sidecar_dir=self.sidecar_dir).read(self.epw_file)
+        self.assertTrue(df["Present Weather Codes"].isna().all())
+        pd.testing.assert_frame_equal(cached, df)
+
+    def test_columns(self):
+        columns = ["Wind Speed", "Dry Bulb Temperature"]
+        expected = read_epw_file(self.epw_file, columns)
+
+        # only the requested fields are parsed, and no sidecar is written for them
+        cache = EpwFileCache(sidecar_dir=self.sidecar_dir)
+        pd.testing.assert_frame_equal(cache.read(self.epw_file, columns), expected)
+        self.assertFalse(os.path.exists(cache.sidecar_path(self.epw_file)))
+        with mock.patch.object(epw_cache, "read_epw_file", side_effect=AssertionError):
+            pd.testing.assert_frame_equal(cache.read(self.epw_file, columns), expected)
+
+        # projected from a file cached with all its fields, in process or in its sidecar
+        cache.read(self.epw_file)
+        with mock.patch.object(epw_cache, "read_epw_file", side_effect=AssertionError):
+            pd.testing.assert_frame_equal(
+                cache.read(self.epw_file, columns[::-1]), expected[columns[::-1]]
+            )
+            cache = EpwFileCache(sidecar_dir=self.sidecar_dir)
+            pd.testing.assert_frame_equal(cache.read(self.epw_file, columns), expected)
+        self.assertEqual((cache.hits, cache.misses), (1, 0))
+
+        with self.assertRaises(ValueError):
+            cache.read(self.epw_file, ["Unknown"])
+
+    def test_shared_cache(self):
+        with mock.patch.dict(os.environ, {EPW_CACHE_DIR_ENV_VAR: self.sidecar_dir}):
+            cache = get_epw_file_cache()
+            self.assertIs(get_epw_file_cache(), cache)
+            self.assertEqual(cache.sidecar_dir, self.sidecar_dir)
+        with mock.patch.dict(os.environ, {EPW_CACHE_DIR_ENV_VAR: ""}):
+            self.assertIsNone(get_epw_file_cache().sidecar_dir)
+
+
+if __name__ == "__main__":
+    unittest.main()
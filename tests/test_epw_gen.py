@@ -1,16 +1,42 @@
+import os
+import tempfile
 import unittest
 
 import numpy as np
 import pandas as pd
 
+from era5epw.epw import write_epw_file
 from era5epw.main import (
+    CAMS_FIELDS_VARIABLES,
+    ERA5_FIELDS_VARIABLES,
+    calc_horizontal_infrared_radiation,
     calc_monthly_soil_temperature,
     calc_rh,
     get_first_weekday_of_year,
     make_data_period_end_date,
+    make_epw_dataframe,
+    make_epw_dataframes,
+    make_epw_files,
+    make_epw_header,
 )
 
 
+def make_site_data(seed: int, hours: int = 72) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Random ERA5 and CAMS data of a site."""
+    rng = np.random.default_rng(seed)
+    index = pd.date_range("2023-01-01", periods=hours, freq="h")
+    era5_df = pd.DataFrame(
+        {var: rng.uniform(0, 1, hours) for var in ERA5_FIELDS_VARIABLES + ["stl1"]}, index=index
+    )
+    era5_df[["t2m", "stl1"]] += 270
+    era5_df["d2m"] = era5_df["t2m"] - 5
+    era5_df["sp"] *= 101325
+    cams_df = pd.DataFrame(
+        {var: rng.uniform(0, 500, hours) for var in CAMS_FIELDS_VARIABLES}, index=index
+    )
+    return era5_df, cams_df
+
+
 class TestEpwGeneration(unittest.TestCase):
     def test_monthly_soil_temperature(self):
         # Create a sample DataFrame with soil temperature data
@@ -38,6 +64,24 @@ class TestEpwGeneration(unittest.TestCase):
         self.assertTrue((rh >= 0).all())
         self.assertTrue((rh <= 100).all())
 
+    def test_calc_horizontal_infrared_radiation(self):
+        # clear sky, then increasing cloud cover
+        ir = calc_horizontal_infrared_radiation(
+            np.array([20.0, 20.0, 20.0]), np.array([10.0, 10.0, 10.0]), np.array([0, 5, 10])
+        )
+        self.assertEqual(ir[0], 341)
+        self.assertTrue((np.diff(ir) > 0).all())
+
+        # stacked sites
+        dry_bulb_temp = np.array([[20.0, -5.0], [30.0, 0.0]])
+        dew_point_temp = dry_bulb_temp - 5
+        sky_cover = np.array([[0, 10], [3, 7]])
+        ir = calc_horizontal_infrared_radiation(dry_bulb_temp, dew_point_temp, sky_cover)
+        self.assertEqual(ir.shape, (2, 2))
+        self.assertEqual(
+            ir[1, 1], calc_horizontal_infrared_radiation(0.0, -5.0, 7), "same as single site"
+        )
+
     def test_first_day_of_year(self):
         self.assertEqual(get_first_weekday_of_year(2023), "Sunday")
         self.assertEqual(get_first_weekday_of_year(2024), "Monday")
@@ -51,3 +95,70 @@ class TestEpwGeneration(unittest.TestCase):
         )
         dp_end_date = make_data_period_end_date(df)
         self.assertEqual(dp_end_date, "3/3")
+
+
+class TestMultiSiteEpwGeneration(unittest.TestCase):
+    def setUp(self):
+        self.era5_dfs, self.cams_dfs = zip(*[make_site_data(seed) for seed in range(5)])
+        self.sites = [
+            {
+                "city_name": f"Site {i}",
+                "latitude": 40.0 + i,
+                "longitude": -10.0 * i,
+                "time_zone": 0,
+                "elevation": 10 * i,
+            }
+            for i in range(5)
+        ]
+        self.latitudes = [site["latitude"] for site in self.sites]
+        self.longitudes = [site["longitude"] for site in self.sites]
+
+    def test_make_epw_dataframes(self):
+        dfs = list(
+            make_epw_dataframes(
+                list(self.era5_dfs),
+                list(self.cams_dfs),
+                self.latitudes,
+                self.longitudes,
+                time_shift=1,
+                block_size=2,
+            )
+        )
+        self.assertEqual(len(dfs), 5)
+        for df, era5_df, cams_df, site in zip(dfs, self.era5_dfs, self.cams_dfs, self.sites):
+            pd.testing.assert_frame_equal(
+                df,
+                make_epw_dataframe(
+                    era5_df, cams_df, site["latitude"], site["longitude"], time_shift=1
+                ),
+            )
+
+    def test_make_epw_files(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            output_files = [os.path.join(tmpdir, f"{i}.epw") for i in range(5)]
+            make_epw_files(
+                list(self.era5_dfs),
+                list(self.cams_dfs),
+                year=2023,
+                sites=self.sites,
+                output_files=output_files,
+                block_size=2,
+            )
+            for output_file, era5_df, cams_df, site in zip(
+                output_files, self.era5_dfs, self.cams_dfs, self.sites
+            ):
+                df = make_epw_dataframe(era5_df, cams_df, site["latitude"], site["longitude"])
+                expected_file = os.path.join(tmpdir, "expected.epw")
+                write_epw_file(expected_file, make_epw_header(df, era5_df, year=2023, **site), df)
+                with open(output_file) as f, open(expected_file) as expected:
+                    self.assertEqual(f.read(), expected.read())
+
+    def test_different_time_indexes(self):
+        era5_df, cams_df = make_site_data(0, hours=48)
+        with self.assertRaises(ValueError):
+            make_epw_dataframes(
+                list(self.era5_dfs) + [era5_df],
+                list(self.cams_dfs) + [cams_df],
+                self.latitudes + [0.0],
+                self.longitudes + [0.0],
+            )
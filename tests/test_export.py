@@ -0,0 +1,111 @@
+import os
+import tempfile
+import unittest
+
+from plotly.offline import get_plotlyjs
+
+from era5epw.export import (
+    expand_epw_files,
+    export_plots,
+    make_epw_names,
+    make_plot_file_name,
+)
+from tests.sample_epw import write_sample_epw_file
+
+
+class TestExport(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.epw_files = [
+            os.path.join(self.tmpdir.name, "epw", f"{year}.epw") for year in (2023, 2024)
+        ]
+        os.makedirs(os.path.dirname(self.epw_files[0]))
+        for epw_file in self.epw_files:
+            write_sample_epw_file(epw_file)
+        self.output_dir = os.path.join(self.tmpdir.name, "plots")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_expand_epw_files(self):
+        pattern = os.path.join(self.tmpdir.name, "**", "*.epw")
+        self.assertEqual(expand_epw_files([pattern, self.epw_files[1]]), self.epw_files)
+        self.assertEqual(expand_epw_files([os.path.join(self.tmpdir.name, "*.epw")]), [])
+
+    def test_make_plot_file_name(self):
+        self.assertEqual(
+            make_plot_file_name("paris_2024", "Dry Bulb Temperature", "2D"),
+            "paris_2024_dry_bulb_temperature_2d",
+        )
+
+    def test_make_epw_names(self):
+        self.assertEqual(make_epw_names(["x/a.epw", "y/b.epw"]), ["a", "b"])
+        self.assertEqual(
+            make_epw_names(["out/site_a/2024.epw", "out/site_b/2024.epw", "out/2023.epw"]),
+            ["site_a_2024", "site_b_2024", "2023"],
+        )
+        with self.assertRaises(ValueError):
+            make_epw_names(["x/a.epw", "x/a.epw"])
+
+    def test_export_plots(self):
+        errors = export_plots(
+            self.epw_files,
+            self.output_dir,
+            series_names=["Dry Bulb Temperature", "Wind Speed"],
+            plot_types=["2D", "radar"],
+            processes=2,
+        )
+        self.assertEqual(errors, {})
+        expected = [
+            make_plot_file_name(epw_name, series_name, plot_type) + ".html"
+            for epw_name in ["2023", "2024"]
+            for series_name in ["Dry Bulb Temperature", "Wind Speed"]
+            for plot_type in ["2D", "radar"]
+        ]
+        self.assertEqual(sorted(os.listdir(self.output_dir)), sorted(expected + ["plotly.min.js"]))
+        with open(os.path.join(self.output_dir, expected[0])) as f:
+            html = f.read()
+        self.assertIn('src="plotly.min.js"', html)
+        self.assertLess(len(html), 100_000)
+
+    def test_export_plots_replaces_bundle(self):
+        # e.g. written by another plotly version
+        os.makedirs(self.output_dir)
+        bundle_file = os.path.join(self.output_dir, "plotly.min.js")
+        with open(bundle_file, "w") as f:
+            f.write("stale")
+        self.assertEqual(export_plots(self.epw_files[:1], self.output_dir, processes=1), {})
+        with open(bundle_file, encoding="utf-8") as f:
+            self.assertEqual(f.read(), get_plotlyjs())
+
+    def test_export_plots_same_file_names(self):
+        # e.g. a recursive glob over a directory per site
+        epw_files = [os.path.join(self.tmpdir.name, site, "2024.epw") for site in ("a", "b")]
+        for epw_file in epw_files:
+            os.makedirs(os.path.dirname(epw_file))
+            write_sample_epw_file(epw_file)
+        self.assertEqual(export_plots(epw_files, self.output_dir, processes=1), {})
+        self.assertEqual(
+            sorted(os.listdir(self.output_dir)),
+            [
+                "a_2024_dry_bulb_temperature_2d.html",
+                "b_2024_dry_bulb_temperature_2d.html",
+                "plotly.min.js",
+            ],
+        )
+
+    def test_errors(self):
+        os.remove(self.epw_files[1])
+        errors = export_plots(self.epw_files, self.output_dir, processes=1)
+        self.assertEqual(list(errors), [self.epw_files[1]])
+        self.assertTrue(errors[self.epw_files[1]].startswith("FileNotFoundError"))
+        self.assertEqual(len(os.listdir(self.output_dir)), 2)
+
+        with self.assertRaises(ValueError):
+            export_plots(self.epw_files, self.output_dir, plot_types=["4D"])
+        with self.assertRaises(ValueError):
+            export_plots(self.epw_files, self.output_dir, image_format="gif")
+
+
+if __name__ == "__main__":
+    unittest.main()
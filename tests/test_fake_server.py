@@ -0,0 +1,58 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from benchmarks.fake_server import FAKE_API_KEY, run_fake_server
+from era5epw import ads, cds
+from era5epw.utils import execute_download_request, unzip_and_load_netcdf_to_df
+
+
+class TestFakeServer(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        patcher = mock.patch.dict(os.environ, {"ERA5EPW_REQUEST_JITTER": "0"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch("era5epw.utils._api_key", FAKE_API_KEY)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_download_era5_timeseries(self):
+        request = cds.make_era5_requests(["2m_temperature"], 2021, 49.4, 0.1)[1]
+        target_file = os.path.join(self.tmpdir.name, "era5.zip")
+
+        with run_fake_server() as server:
+            execute_download_request(
+                server.cds_url, request["dataset"], request, target_file, cache_dir=None
+            )
+            self.assertEqual(server.datastore.stats()["by_status"], {"successful": 1})
+
+        df = unzip_and_load_netcdf_to_df(target_file, clean_up=True)
+        self.assertIn("t2m", df.columns)
+        self.assertEqual(len(df), 31 * 24)
+
+    def test_download_cams(self):
+        request = ads.make_cams_solar_radiation_request(0.1, 49.4, 2021)
+        target_file = os.path.join(self.tmpdir.name, "cams.nc")
+
+        with run_fake_server(queue_latency=0.1, processing_time=0.1) as server:
+            execute_download_request(server.ads_url, ads.dataset, request, target_file)
+
+        self.assertGreater(os.path.getsize(target_file), 0)
+
+    def test_failed_job(self):
+        request = ads.make_cams_solar_radiation_request(0.1, 49.4, 2021)
+        target_file = os.path.join(self.tmpdir.name, "cams.nc")
+
+        with run_fake_server(error_rate=1.0) as server:
+            with self.assertRaises(Exception):
+                execute_download_request(server.ads_url, ads.dataset, request, target_file)
+            self.assertEqual(server.datastore.stats()["by_status"], {"failed": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
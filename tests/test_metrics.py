@@ -0,0 +1,149 @@
+import os
+import tempfile
+import unittest
+import urllib.request
+
+from era5epw import metrics
+from era5epw.cache import MissingCacheEntriesError
+from era5epw.main import download_and_make_epw
+from era5epw.metrics import MetricsRegistry, read_textfile, serve_metrics, track_run
+from era5epw.report import RunReport
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = MetricsRegistry()
+        self.requests = self.registry.counter(
+            "test_requests_total", "Requests.", ("dataset", "outcome")
+        )
+        self.latency = self.registry.histogram(
+            "test_latency_seconds", "Latency.", ("dataset",), buckets=(1, 10)
+        )
+
+    def test_render(self):
+        self.requests.inc(dataset="era5", outcome="downloaded")
+        self.requests.inc(2, dataset="era5", outcome="downloaded")
+        self.requests.inc(dataset='a "b"', outcome="error")
+        self.latency.observe(0.5, dataset="era5")
+        self.latency.observe(5.25, dataset="era5")
+
+        self.assertEqual(self.requests.get(dataset="era5", outcome="downloaded"), 3)
+        self.assertEqual(self.latency.get(dataset="era5"), 2)
+        self.assertEqual(
+            self.registry.render(),
+            "# HELP test_requests_total Requests.\n"
+            "# TYPE test_requests_total counter\n"
+            'test_requests_total{dataset="era5",outcome="downloaded"} 3\n'
+            'test_requests_total{dataset="a \\"b\\"",outcome="error"} 1\n'
+            "# HELP test_latency_seconds Latency.\n"
+            "# TYPE test_latency_seconds histogram\n"
+            'test_latency_seconds_bucket{dataset="era5",le="1"} 1\n'
+            'test_latency_seconds_bucket{dataset="era5",le="10"} 2\n'
+            'test_latency_seconds_bucket{dataset="era5",le="+Inf"} 2\n'
+            'test_latency_seconds_sum{dataset="era5"} 5.75\n'
+            'test_latency_seconds_count{dataset="era5"} 2\n',
+        )
+
+    def test_invalid_labels(self):
+        with self.assertRaises(AssertionError):
+            self.requests.inc(dataset="era5")
+
+    def test_write_textfile(self):
+        other_process = MetricsRegistry()
+        other_requests = other_process.counter(
+            "test_requests_total", "Requests.", ("dataset", "outcome")
+        )
+        other_process.histogram("test_latency_seconds", "Latency.", ("dataset",), buckets=(1, 10))
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            metrics_file = os.path.join(tmpdir, "era5epw.prom")
+            self.requests.inc(dataset="era5", outcome="downloaded")
+            self.latency.observe(2, dataset="era5")
+            self.registry.write_textfile(metrics_file)
+            # counts already written aren't added again
+            self.requests.inc(dataset="era5", outcome="downloaded")
+            self.registry.write_textfile(metrics_file)
+            # counts of other processes add up
+            other_requests.inc(5, dataset="era5", outcome="downloaded")
+            other_requests.inc(dataset="cams", outcome="cache_hit")
+            other_process.write_textfile(metrics_file)
+
+            samples = read_textfile(metrics_file)
+            with open(metrics_file) as f:
+                content = f.read()
+
+        self.assertEqual(samples['test_requests_total{dataset="era5",outcome="downloaded"}'], 7)
+        self.assertEqual(samples['test_requests_total{dataset="cams",outcome="cache_hit"}'], 1)
+        self.assertEqual(samples['test_latency_seconds_bucket{dataset="era5",le="+Inf"}'], 1)
+        # samples are grouped by metric
+        self.assertLess(content.index("cache_hit"), content.index("# TYPE test_latency_seconds"))
+
+    def test_serve_metrics(self):
+        server = serve_metrics(0)
+        # local endpoint only by default
+        self.assertEqual(server.server_address[0], "127.0.0.1")
+        try:
+            url = f"http://127.0.0.1:{server.server_port}/metrics"
+            with urllib.request.urlopen(url) as response:
+                self.assertEqual(response.headers["Content-Type"], metrics.CONTENT_TYPE)
+                content = response.read().decode()
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertIn("# TYPE era5epw_requests_total counter", content)
+
+
+class TestTrackRun(unittest.TestCase):
+    def test_track_run(self):
+        report = RunReport()
+        report.add_request(
+            {
+                "dataset": "test-era5",
+                "cache_hit": False,
+                "queue_wait": 40.0,
+                "processing": 10.0,
+                "transfer_time": 1.5,
+                "bytes": 1000,
+            }
+        )
+        report.add_request({"dataset": "test-era5", "cache_hit": True, "bytes": 500})
+        report.add_failure("test-cams", ConnectionError("ADS is down"))
+        runs = metrics.epw_files_total.get(outcome="error")
+
+        with self.assertRaises(ConnectionError):
+            with track_run(report, cache_enabled=True):
+                raise ConnectionError("ADS is down")
+
+        self.assertEqual(metrics.requests_total.get(dataset="test-era5", outcome="downloaded"), 1)
+        self.assertEqual(metrics.requests_total.get(dataset="test-era5", outcome="cache_hit"), 1)
+        self.assertEqual(metrics.requests_total.get(dataset="test-cams", outcome="error"), 1)
+        self.assertEqual(metrics.cache_lookups_total.get(dataset="test-era5", result="miss"), 1)
+        self.assertEqual(metrics.downloaded_bytes_total.get(dataset="test-era5"), 1000)
+        self.assertEqual(metrics.queue_wait_seconds.get(dataset="test-era5"), 1)
+        self.assertEqual(metrics.epw_files_total.get(outcome="error"), runs + 1)
+
+    def test_download_and_make_epw_metrics(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            metrics_file = os.path.join(tmpdir, "era5epw.prom")
+            # nothing is cached: the offline run fails
+            with self.assertRaises(MissingCacheEntriesError):
+                download_and_make_epw(
+                    year=2021,
+                    latitude=49.5,
+                    longitude=0.0,
+                    city_name="Test",
+                    time_zone=0,
+                    elevation=0,
+                    output_file=os.path.join(tmpdir, "test.epw"),
+                    cache_dir=os.path.join(tmpdir, "cache"),
+                    offline=True,
+                    metrics_file=metrics_file,
+                )
+            samples = read_textfile(metrics_file)
+
+        self.assertEqual(samples['era5epw_epw_files_total{outcome="error"}'], 1)
+        self.assertEqual(samples['era5epw_run_duration_seconds_count{outcome="error"}'], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from era5epw.ads import dataset as cams_dataset
+from era5epw.ads import make_cams_solar_radiation_request
+from era5epw.cache import DownloadCache, MissingCacheEntriesError
+from era5epw.main import check_offline_cache
+from era5epw.utils import describe_request, execute_download_request
+
+
+class TestOfflineMode(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache_dir = self.tmpdir.name
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_describe_timeseries_request(self):
+        entries = describe_request(
+            "reanalysis-era5-single-levels-timeseries",
+            {
+                "variable": ["2m_temperature"],
+                "date": ["2020-12-31/2021-02-28"],
+                "location": {"longitude": 10.0, "latitude": 50.0},
+            },
+        )
+        self.assertEqual(
+            entries,
+            [
+                ("reanalysis-era5-single-levels-timeseries", "2m_temperature", month, "50.0,10.0")
+                for month in ["2020-12", "2021-01", "2021-02"]
+            ],
+        )
+
+    def test_describe_single_levels_request(self):
+        entries = describe_request(
+            "reanalysis-era5-single-levels",
+            {
+                "variable": ["total_cloud_cover", "snow_depth"],
+                "year": ["2021"],
+                "month": ["03"],
+                "area": [50.1, 9.9, 49.9, 10.1],
+            },
+        )
+        self.assertEqual(
+            entries,
+            [
+                (
+                    "reanalysis-era5-single-levels",
+                    "total_cloud_cover",
+                    "2021-03",
+                    "50.1/9.9/49.9/10.1",
+                ),
+                ("reanalysis-era5-single-levels", "snow_depth", "2021-03", "50.1/9.9/49.9/10.1"),
+            ],
+        )
+
+    def test_describe_cams_request(self):
+        request = make_cams_solar_radiation_request(longitude=10.0, latitude=50.0, year=2021)
+        entries = describe_request(cams_dataset, request)
+        self.assertEqual(len(entries), 13)
+        self.assertEqual(entries[0], (cams_dataset, "*", "2020-12", "50.0,10.0"))
+
+    def test_check_offline_cache_lists_missing_entries(self):
+        with self.assertRaises(MissingCacheEntriesError) as ctx:
+            check_offline_cache(
+                year=2021, latitude=50.0, longitude=10.0, time_zone=None, cache_dir=self.cache_dir
+            )
+
+        # 13 months (previous year's last day included) for CAMS and each of the 10 ERA5 variables
+        self.assertEqual(len(ctx.exception.missing), 13 * 11)
+        self.assertIn(
+            ("reanalysis-era5-single-levels-timeseries", "2m_temperature", "2021-03", "50.0,10.0"),
+            ctx.exception.missing,
+        )
+        self.assertIn(
+            ("reanalysis-era5-single-levels", "snow_depth", "2021-12", "50.1/9.9/49.9/10.1"),
+            ctx.exception.missing,
+        )
+
+    def test_check_offline_cache_partially_cached(self):
+        cache = DownloadCache(self.cache_dir)
+        request = make_cams_solar_radiation_request(longitude=10.0, latitude=50.0, year=2021)
+        source_file = os.path.join(self.tmpdir.name, "cams.nc")
+        with open(source_file, "wb") as f:
+            f.write(b"cams")
+        cache.put(cams_dataset, request, source_file)
+
+        with self.assertRaises(MissingCacheEntriesError) as ctx:
+            check_offline_cache(
+                year=2021, latitude=50.0, longitude=10.0, time_zone=None, cache_dir=self.cache_dir
+            )
+        self.assertEqual(len(ctx.exception.missing), 13 * 10)
+        self.assertNotIn(cams_dataset, {entry[0] for entry in ctx.exception.missing})
+
+    def test_check_offline_cache_requires_cache(self):
+        with mock.patch.dict(os.environ, {"ERA5EPW_CACHE_DIR": ""}):
+            with self.assertRaises(ValueError):
+                check_offline_cache(year=2021, latitude=50.0, longitude=10.0, time_zone=None)
+
+    def test_execute_download_request_offline_never_calls_api(self):
+        request = {
+            "variable": ["2m_temperature"],
+            "date": ["2021-01-01/2021-01-31"],
+            "location": {"longitude": 10.0, "latitude": 50.0},
+        }
+        with mock.patch("cdsapi.Client") as client:
+            with self.assertRaises(MissingCacheEntriesError) as ctx:
+                execute_download_request(
+                    "http://localhost",
+                    "reanalysis-era5-single-levels-timeseries",
+                    request,
+                    os.path.join(self.tmpdir.name, "target.nc"),
+                    cache_dir=self.cache_dir,
+                    offline=True,
+                )
+            client.assert_not_called()
+        self.assertEqual(len(ctx.exception.missing), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from era5epw.ads import dataset as cams_dataset
+from era5epw.cache import DownloadCache
+from era5epw.prefetch import (
+    load_manifest,
+    make_prefetch_plan,
+    make_sites_grid,
+    prefetch,
+)
+
+
+def fake_download(url, dataset, request, target_file, verbose=False, cache_dir=None):
+    with open(target_file, "wb") as f:
+        f.write(b"data")
+    DownloadCache(cache_dir).put(dataset, request, target_file)
+    return {"dataset": dataset, "cache_hit": False, "bytes": 4}
+
+
+def failing_cams_download(url, dataset, request, target_file, verbose=False, cache_dir=None):
+    if dataset == cams_dataset:
+        raise ConnectionError("ADS is down")
+    return fake_download(url, dataset, request, target_file, verbose, cache_dir)
+
+
+class TestPrefetch(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmpdir.name, "cache")
+        self.manifest_file = os.path.join(self.tmpdir.name, "manifest.json")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_make_sites_grid(self):
+        sites = make_sites_grid(north=50.0, west=2.0, south=49.5, east=2.25)
+        self.assertEqual(len(sites), 3 * 2)
+        self.assertIn((49.75, 2.25), sites)
+        # points are snapped to the grid, inside the box
+        self.assertEqual(make_sites_grid(45.2, 2.1, 45.0, 2.1), [])
+        self.assertEqual(make_sites_grid(45.2, 2.1, 45.0, 2.3), [(45.0, 2.25)])
+        self.assertEqual(
+            make_sites_grid(-0.1, -0.6, -0.6, -0.2),
+            [(-0.5, -0.5), (-0.5, -0.25), (-0.25, -0.5), (-0.25, -0.25)],
+        )
+        self.assertEqual(make_sites_grid(0.3, 0.3, 0.3, 0.3, step=0.1), [(0.3, 0.3)])
+
+    def test_make_prefetch_plan(self):
+        plan = make_prefetch_plan(
+            sites=[(49.4, 0.1), (48.8, 2.4)],
+            years=[2020, 2021],
+            variables=["2m_temperature", "total_cloud_cover"],
+        )
+        # per site-year: 1 CAMS request, and 13 requests per variable (12 months + previous day)
+        self.assertEqual(len(plan), 2 * 2 * (1 + 2 * 13))
+        self.assertEqual(
+            {cell_id for cell_id, _, _, _ in plan},
+            {"49.4,0.1/2020", "49.4,0.1/2021", "48.8,2.4/2020", "48.8,2.4/2021"},
+        )
+
+        plan = make_prefetch_plan(
+            sites=[(49.4, 0.1)], years=[2021], variables=["2m_temperature"], include_cams=False
+        )
+        self.assertNotIn(cams_dataset, {dataset for _, _, dataset, _ in plan})
+
+    def test_prefetch_resumes_from_manifest(self):
+        kwargs = dict(
+            sites=[(49.4, 0.1)],
+            years=[2021],
+            variables=["2m_temperature"],
+            cache_dir=self.cache_dir,
+            manifest_file=self.manifest_file,
+            parallel_exec_nb=2,
+        )
+
+        with mock.patch("era5epw.prefetch.execute_download_request", failing_cams_download):
+            manifest = prefetch(**kwargs)
+        cell = manifest["cells"]["49.4,0.1/2021"]
+        self.assertEqual(cell["total"], 14)
+        self.assertEqual(len(cell["done"]), 13)
+        self.assertEqual(len(cell["failed"]), 1)
+        self.assertIn("ADS is down", list(cell["failed"].values())[0])
+        self.assertEqual(load_manifest(self.manifest_file)["cells"], manifest["cells"])
+
+        # only the failed request is downloaded again
+        with mock.patch("era5epw.prefetch.execute_download_request", fake_download):
+            manifest = prefetch(**kwargs)
+        cell = manifest["cells"]["49.4,0.1/2021"]
+        self.assertEqual(len(cell["done"]), 14)
+        self.assertEqual(cell["failed"], {})
+        self.assertEqual(DownloadCache(self.cache_dir).stats()["entries"], 14)
+
+
+if __name__ == "__main__":
+    unittest.main()
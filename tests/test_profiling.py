@@ -0,0 +1,102 @@
+import contextlib
+import io
+import os
+import pstats
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from era5epw import profiling
+from era5epw.profiling import Profiler, profile_section
+from era5epw.visualize import visualize_cli, visualize_epw
+from tests.sample_epw import write_sample_epw_file
+
+
+class TestProfiler(unittest.TestCase):
+    def test_profile_section_without_profiler(self):
+        self.assertIsNone(profiling._active_profiler)
+        with profile_section("decode"):
+            pass
+        self.assertIsNone(profiling._active_profiler)
+
+    def test_compute_only(self):
+        with Profiler(memory=True) as profiler:
+            # outside of compute sections: not profiled
+            time.sleep(0.01)
+            with profile_section("assembly"):
+                data = [list(range(1000)) for _ in range(100)]
+                # nested sections are part of the outermost one
+                with profile_section("decode"):
+                    sorted(data[0])
+            del data
+        self.assertIsNone(profiling._active_profiler)
+
+        self.assertEqual(list(profiler.sections), ["assembly"])
+        seconds, peak_memory = profiler.sections["assembly"]
+        self.assertGreater(seconds, 0)
+        self.assertGreater(peak_memory, 100 * 1000 * 8)
+
+        stats = pstats.Stats(profiler.profile)
+        functions = {name for _, _, name in stats.stats}
+        self.assertIn("<built-in method builtins.sorted>", functions)
+        self.assertNotIn("<built-in method time.sleep>", functions)
+
+        summary = profiler.summary()
+        self.assertIn("assembly:", summary)
+        self.assertIn("peak memory", summary)
+
+    def test_no_nested_profilers(self):
+        with Profiler():
+            with self.assertRaises(AssertionError):
+                with Profiler():
+                    pass
+
+    def test_summary_without_sections(self):
+        with Profiler() as profiler:
+            pass
+        self.assertEqual(profiler.summary(), "Compute sections:")
+
+    def test_visualize_epw(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            epw_file_path = os.path.join(temp_dir, "test.epw")
+            write_sample_epw_file(epw_file_path)
+            prof_file = os.path.join(temp_dir, "visualize.prof")
+
+            with Profiler(prof_file, top=5) as profiler:
+                visualize_epw(epw_file_path, plot_type="radar", show=False)
+
+            self.assertEqual(list(profiler.sections), ["read_epw", "plot"])
+            self.assertTrue(os.path.exists(prof_file))
+            functions = {name for _, _, name in pstats.Stats(prof_file).stats}
+            self.assertIn("create_radar_plot", functions)
+
+    def test_visualize_cli(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            epw_file_path = os.path.join(temp_dir, "test.epw")
+            write_sample_epw_file(epw_file_path)
+            html_file = os.path.join(temp_dir, "plot.html")
+            prof_file = os.path.join(temp_dir, "visualize.prof")
+            argv = [
+                "era5epw_visualize",
+                epw_file_path,
+                "--output",
+                html_file,
+                "--profile",
+                prof_file,
+                "--profile-top",
+                "3",
+            ]
+
+            output = io.StringIO()
+            with mock.patch("sys.argv", argv), contextlib.redirect_stdout(output):
+                visualize_cli()
+
+            self.assertTrue(os.path.exists(html_file))
+            self.assertTrue(os.path.exists(prof_file))
+            self.assertIn("write_html:", output.getvalue())
+            self.assertIn(f"Profile written as {prof_file}.", output.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from benchmarks.fake_server import FAKE_API_KEY, FakeDataStore, run_fake_server
+from era5epw import ads
+from era5epw.recorder import RECORD_DIR_ENV_VAR, get_recorded_timings, load_cassette
+from era5epw.utils import execute_download_request
+
+
+class TestRecorder(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.record_dir = os.path.join(self.tmpdir.name, "cassette")
+        patcher = mock.patch.dict(os.environ, {"ERA5EPW_REQUEST_JITTER": "0"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch("era5epw.utils._api_key", FAKE_API_KEY)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.request = ads.make_cams_solar_radiation_request(0.1, 49.4, 2021)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _download(self, server_url: str, target_file: str) -> float:
+        start = time.time()
+        execute_download_request(server_url, ads.dataset, self.request, target_file)
+        return time.time() - start
+
+    def test_record_and_replay(self):
+        recorded_file = os.path.join(self.tmpdir.name, "recorded.nc")
+        with mock.patch.dict(os.environ, {RECORD_DIR_ENV_VAR: self.record_dir}):
+            with run_fake_server(queue_latency=1.0, processing_time=1.0) as server:
+                self._download(server.ads_url, recorded_file)
+
+        cassette = load_cassette(self.record_dir)
+        self.assertEqual(len(cassette), 1)
+        entry = list(cassette.values())[0]
+        self.assertEqual(entry["dataset"], ads.dataset)
+        self.assertEqual(entry["request"], self.request)
+        self.assertEqual(entry["size"], os.path.getsize(recorded_file))
+        self.assertEqual([event for event, _ in entry["events"]][-2:], ["results", "downloaded"])
+        self.assertIn("successful", dict(entry["events"]))
+
+        # job timestamps come from the server, which updates job status when polled
+        self.assertIsNotNone(entry["job"]["started"])
+        queue_time, processing_time, _ = get_recorded_timings(entry)
+        self.assertGreaterEqual(queue_time, 1.0)
+        self.assertGreaterEqual(processing_time, 1.0)
+
+        # replay: same payload, with scaled down timings
+        replayed_file = os.path.join(self.tmpdir.name, "replayed.nc")
+        datastore = FakeDataStore(cassette=cassette, time_scale=0.01)
+        with run_fake_server(datastore=datastore) as server:
+            self._download(server.ads_url, replayed_file)
+        job = list(datastore.jobs.values())[0]
+        self.assertLess(job.queue_latency + job.processing_time, 0.05)
+        self.assertEqual(datastore.stats()["unrecorded"], 0)
+        with open(recorded_file, "rb") as f1, open(replayed_file, "rb") as f2:
+            self.assertEqual(f1.read(), f2.read())
+
+    def test_no_recording_by_default(self):
+        with mock.patch.dict(os.environ, {RECORD_DIR_ENV_VAR: ""}):
+            with run_fake_server() as server:
+                self._download(server.ads_url, os.path.join(self.tmpdir.name, "data.nc"))
+        self.assertFalse(os.path.exists(self.record_dir))
+
+    def test_get_recorded_timings_from_client_events(self):
+        entry = {
+            "events": [
+                ["accepted", 0.5],
+                ["running", 3.5],
+                ["successful", 10.0],
+                ["results", 10.2],
+                ["downloaded", 12.2],
+            ],
+            "job": None,
+        }
+        self.assertEqual(get_recorded_timings(entry), (3.0, 6.5, 2.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
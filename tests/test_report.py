@@ -0,0 +1,127 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from benchmarks.bench_pipeline import make_site_year_fixtures
+from era5epw import ads, cds
+from era5epw.cache import DownloadCache, MissingCacheEntriesError
+from era5epw.main import download_and_make_epw
+from era5epw.report import PHASES, RunReport
+from era5epw.utils import describe_request
+
+
+class TestRunReport(unittest.TestCase):
+    def test_nested_phases(self):
+        report = RunReport(year=2021)
+        with report.phase("era5"):
+            time.sleep(0.02)
+            with report.phase("assembly"):
+                time.sleep(0.05)
+        with report.phase("assembly"):
+            time.sleep(0.01)
+        report.finish()
+
+        result = report.to_dict()
+        self.assertEqual(result["parameters"], {"year": 2021})
+        self.assertEqual(list(result["phases"]), ["era5", "assembly"])
+        # time spent in nested phases is only counted once
+        self.assertLess(result["phases"]["era5"], 0.05)
+        self.assertGreaterEqual(result["phases"]["assembly"], 0.06)
+        self.assertAlmostEqual(sum(result["phases"].values()), result["total_time"], delta=0.01)
+
+    def test_summary(self):
+        report = RunReport()
+        report.add_request(
+            {"cache_hit": False, "queue_wait": 10.0, "processing": 5.0, "bytes": 100},
+            decode_time=0.5,
+        )
+        report.add_request({"cache_hit": True, "transfer_time": 0.1, "bytes": 50})
+        self.assertEqual(
+            report.summary(),
+            {
+                "requests": 2,
+                "cache_hits": 1,
+                "queue_wait": 10.0,
+                "processing": 5.0,
+                "transfer_time": 0.1,
+                "decode_time": 0.5,
+                "bytes": 150,
+            },
+        )
+
+    def test_download_and_make_epw_report(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            # fill the download cache with fixtures, and generate the EPW file offline
+            cache = DownloadCache(os.path.join(tmpdir, "cache"))
+            era5_files, cams_file = make_site_year_fixtures(tmpdir, 49.5, 0.0, 2021)
+            era5_requests = cds.make_era5_requests(cds.epw_variables, 2021, 49.5, 0.0, None)
+            for request, file_path in zip(era5_requests, era5_files):
+                cache.put(request["dataset"], request, file_path)
+            cams_request = ads.make_cams_solar_radiation_request(0.0, 49.5, 2021)
+            cache.put(ads.dataset, cams_request, cams_file)
+            nb_bytes = sum(os.path.getsize(f) for f in era5_files + [cams_file])
+
+            report_file = os.path.join(tmpdir, "report.json")
+            report = download_and_make_epw(
+                year=2021,
+                latitude=49.5,
+                longitude=0.0,
+                city_name="Test",
+                time_zone=0,
+                elevation=0,
+                output_file=os.path.join(tmpdir, "test.epw"),
+                parallel_exec_nb=2,
+                cache_dir=cache.cache_dir,
+                offline=True,
+                report_file=report_file,
+            )
+            with open(report_file) as f:
+                self.assertEqual(json.load(f)["summary"], report["summary"])
+
+        self.assertEqual(list(report["phases"]), PHASES)
+        self.assertEqual(report["summary"]["requests"], len(era5_requests) + 1)
+        self.assertEqual(report["summary"]["cache_hits"], len(era5_requests) + 1)
+        self.assertGreater(report["summary"]["decode_time"], 0)
+        self.assertEqual(report["summary"]["bytes"], nb_bytes)
+
+    def test_download_era5_data_failures(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = DownloadCache(os.path.join(tmpdir, "cache"))
+            era5_files, _ = make_site_year_fixtures(tmpdir, 49.5, 0.0, 2021)
+            era5_requests = cds.make_era5_requests(cds.epw_variables, 2021, 49.5, 0.0, None)
+            # a request of another dataset than the first one isn't cached: it fails offline,
+            # the others are cache hits
+            missing = next(
+                request
+                for request in era5_requests
+                if request["dataset"] != era5_requests[0]["dataset"]
+            )
+            for request, file_path in zip(era5_requests, era5_files):
+                if request is not missing:
+                    cache.put(request["dataset"], request, file_path)
+
+            report = RunReport()
+            with self.assertRaises(MissingCacheEntriesError) as ctx:
+                cds.download_era5_data(
+                    cds.epw_variables,
+                    2021,
+                    49.5,
+                    0.0,
+                    dataset=None,
+                    parallel_exec_nb=2,
+                    cache_dir=cache.cache_dir,
+                    offline=True,
+                    report=report,
+                )
+
+        self.assertEqual(len(report.requests), len(era5_requests) - 1)
+        self.assertEqual([failure["dataset"] for failure in report.failures], [missing["dataset"]])
+        # the error raised in the worker keeps its entries once re-raised in the parent
+        self.assertEqual(ctx.exception.missing, describe_request(missing["dataset"], missing))
+        self.assertTrue(str(ctx.exception).startswith(f"{len(ctx.exception.missing)} entries"))
+
+
+if __name__ == "__main__":
+    unittest.main()
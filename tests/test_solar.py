@@ -0,0 +1,87 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from era5epw.solar import (
+    SOLAR_CONSTANT,
+    calc_declination,
+    calc_eccentricity_correction,
+    calc_extraterrestrial_radiation,
+    calc_solar_position,
+)
+
+
+def daily_extraterrestrial_radiation(days: pd.DatetimeIndex, latitude: float) -> np.ndarray:
+    """Daily extraterrestrial horizontal radiation in Wh/m^2, equation 1.10.3 of Duffie &
+    Beckman."""
+    day_angle = 2 * np.pi * (days.dayofyear.values - 0.5) / 365
+    declination = calc_declination(day_angle)
+    latitude = np.radians(latitude)
+    sunset = np.arccos(np.clip(-np.tan(latitude) * np.tan(declination), -1, 1))
+    return (
+        24
+        / np.pi
+        * SOLAR_CONSTANT
+        * calc_eccentricity_correction(day_angle)
+        * (
+            np.cos(latitude) * np.cos(declination) * np.sin(sunset)
+            + sunset * np.sin(latitude) * np.sin(declination)
+        )
+    )
+
+
+class TestSolar(unittest.TestCase):
+    def setUp(self):
+        self.times = pd.date_range("2024-01-01", "2024-12-31 23:00", freq="h")
+        self.days = pd.date_range("2024-01-01", "2024-12-31", freq="D")
+
+    def test_solar_position(self):
+        # solar noon at the summer solstice
+        times = pd.DatetimeIndex(["2024-06-20 12:00", "2024-06-20 00:00"])
+        zenith, azimuth = calc_solar_position(times, 48.85, 0.0)
+        self.assertAlmostEqual(zenith[0], 48.85 - 23.44, delta=0.2)
+        self.assertAlmostEqual(azimuth[0], 180, delta=1)
+        self.assertGreater(zenith[1], 90)
+
+    def test_extraterrestrial_radiation(self):
+        for latitude in [48.85, -33.9, 0.0, 78.2, -89.9]:
+            horizontal, direct_normal = calc_extraterrestrial_radiation(self.times, latitude, 0.0)
+            self.assertEqual(horizontal.shape, (len(self.times),))
+            self.assertTrue((horizontal >= 0).all())
+            # the daily formula assumes a constant declination during the day
+            np.testing.assert_allclose(
+                horizontal.reshape(-1, 24).sum(axis=1),
+                daily_extraterrestrial_radiation(self.days, latitude),
+                atol=10,
+            )
+            # the sun is down at night, and direct normal radiation follows
+            self.assertTrue((direct_normal[horizontal == 0] == 0).all())
+            self.assertTrue((direct_normal[horizontal > 0] > 1300).all())
+
+    def test_polar_night_and_day(self):
+        horizontal, _ = calc_extraterrestrial_radiation(self.times, 78.2, 15.6)
+        december = horizontal[self.times.month == 12]
+        june = horizontal[self.times.month == 6]
+        self.assertEqual(december.max(), 0)
+        self.assertTrue((june > 0).all())
+
+    def test_sites(self):
+        latitudes = np.array([48.85, -33.9, 40.7])
+        longitudes = np.array([2.35, 151.2, -74.0])
+        horizontal, direct_normal = calc_extraterrestrial_radiation(
+            self.times, latitudes, longitudes
+        )
+        self.assertEqual(horizontal.shape, (3, len(self.times)))
+        self.assertEqual(direct_normal.shape, (3, len(self.times)))
+        for i, (latitude, longitude) in enumerate(zip(latitudes, longitudes)):
+            np.testing.assert_array_equal(
+                horizontal[i], calc_extraterrestrial_radiation(self.times, latitude, longitude)[0]
+            )
+        # sites along another dimension, e.g. a grid
+        horizontal, _ = calc_extraterrestrial_radiation(self.times[:24], [[48.85], [0.0]], 0.0)
+        self.assertEqual(horizontal.shape, (2, 1, 24))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,19 +1,32 @@
 """Tests for the EPW visualization module."""
 
+import importlib.util
 import os
 import tempfile
 import unittest
+from datetime import date
 
+import numpy as np
 import pandas as pd
 
+from era5epw.epw import make_epw_datetime_index
 from era5epw.visualize import (
+    HEATMAP_DECIMALS,
+    RADAR_COLOR_BINS,
     create_2d_plot,
+    create_2d_plot_widget,
     create_3d_plot,
+    create_heatmap_plot,
     create_radar_plot,
+    downsample_min_max,
+    downsample_series,
     get_visible_series,
+    make_day_hour_grid,
     read_epw_file,
+    update_downsampled_trace,
     visualize_epw,
 )
+from tests.sample_epw import write_sample_epw_file
 
 
 class TestEPWVisualization(unittest.TestCase):
@@ -22,30 +35,10 @@ class TestEPWVisualization(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
         """Create a test EPW file for all tests."""
-        cls.test_epw_file = tempfile.NamedTemporaryFile(mode="w", delete=False, suffix=".epw")
-        cls.test_epw_path = cls.test_epw_file.name
-
-        # Write minimal EPW header and data
-        cls.test_epw_file.write("LOCATION,Test City,,,ERA5,n/a,48.86,2.35,1,35\n")
-        cls.test_epw_file.write("DESIGN CONDITIONS,0\n")
-        cls.test_epw_file.write("TYPICAL/EXTREME PERIODS,0\n")
-        cls.test_epw_file.write("GROUND TEMPERATURES,0\n")
-        cls.test_epw_file.write("HOLIDAYS/DAYLIGHT SAVINGS,No,0,0,0\n")
-        cls.test_epw_file.write("COMMENTS 1,Test data\n")
-        cls.test_epw_file.write("COMMENTS 2,Test data\n")
-        cls.test_epw_file.write("DATA PERIODS,1,1,Data,Monday,1/1,1/2\n")
-
-        # Write 48 hours of data (2 days)
-        for day in range(1, 3):
-            for hour in range(1, 25):
-                temp = 10.0 + (hour % 12)  # Temperature varies with hour
-                wind = 2.0 + (hour % 6)  # Wind speed varies
-                cls.test_epw_file.write(
-                    f"2024,1,{day},{hour},0,9,{temp},{temp - 2},80,101325,"
-                    f"9999,9999,9999,100,50,40,11000,5250,4760,9999,"
-                    f"180,{wind},5,5,9999,77777,0,999999999,999,999,0,99,0.5,0,1\n"
-                )
+        cls.test_epw_file = tempfile.NamedTemporaryFile(delete=False, suffix=".epw")
         cls.test_epw_file.close()
+        cls.test_epw_path = cls.test_epw_file.name
+        write_sample_epw_file(cls.test_epw_path)
 
     @classmethod
     def tearDownClass(cls):
@@ -70,6 +63,33 @@ class TestEPWVisualization(unittest.TestCase):
         self.assertIn("Dry Bulb Temperature", df.columns)
         self.assertIn("Wind Speed", df.columns)
 
+    def test_read_epw_file_index_and_dtypes(self):
+        """Test the datetime index, hour 24 being midnight of the next day, and column types."""
+        df = read_epw_file(self.test_epw_path)
+        self.assertEqual(df.index[0], pd.Timestamp("2024-01-01 01:00"))
+        self.assertEqual(df.index[23], pd.Timestamp("2024-01-02 00:00"))
+        self.assertEqual(df.index[-1], pd.Timestamp("2024-01-03 00:00"))
+        self.assertTrue((df.index[1:] - df.index[:-1] == pd.Timedelta(hours=1)).all())
+        self.assertEqual(df["Hour"].dtype, "int64")
+        self.assertEqual(df["Relative Humidity"].dtype, "float64")
+        self.assertEqual(df["Present Weather Codes"].iloc[0], "999999999")
+        self.assertEqual(df["Dry Bulb Temperature"].iloc[0], 11.0)
+
+    def test_read_epw_file_invalid_values(self):
+        """Test that invalid numbers are read as missing values."""
+        with open(self.test_epw_path) as f:
+            lines = f.readlines()
+        lines[8] = lines[8].replace(",80,", ",abc,", 1)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            epw_file = os.path.join(tmpdir, "invalid.epw")
+            with open(epw_file, "w") as f:
+                f.writelines(lines)
+            df = read_epw_file(epw_file)
+        self.assertEqual(len(df), 48)
+        self.assertTrue(pd.isna(df["Relative Humidity"].iloc[0]))
+        self.assertEqual(df["Relative Humidity"].iloc[1], 80)
+        self.assertEqual(df["Relative Humidity"].dtype, "float64")
+
     def test_get_visible_series(self):
         """Test getting visible series names."""
         df = read_epw_file(self.test_epw_path)
@@ -101,6 +121,63 @@ class TestEPWVisualization(unittest.TestCase):
         # Check that the figure has a title
         self.assertIn("Dry Bulb Temperature", fig.layout.title.text)
 
+    def test_downsample_min_max(self):
+        """Test that downsampling keeps the extremes of each bucket, in order, and gaps."""
+        x = np.arange(1000)
+        y = np.sin(x / 10) + (x == 500) * 5
+        y[100:120] = np.nan
+        x_down, y_down = downsample_min_max(x, y, buckets=50)
+        self.assertLessEqual(len(x_down), 100)
+        self.assertTrue((np.diff(x_down) > 0).all())
+        np.testing.assert_array_equal(y_down, y[x_down])
+        self.assertEqual(np.nanmax(y_down), y[500])
+        self.assertEqual(np.nanmin(y_down), np.nanmin(y))
+        self.assertTrue(np.isnan(y_down[(x_down >= 100) & (x_down < 120)]).all())
+
+        # short lines are kept as is
+        x_down, y_down = downsample_min_max(x, y, buckets=500)
+        self.assertEqual(len(x_down), 1000)
+
+    def test_create_2d_plot_downsample(self):
+        """Test that long series are downsampled, and zooming in gives full resolution."""
+        index = pd.date_range("2020-01-01 01:00", "2030-01-01 00:00", freq="h")
+        df = pd.DataFrame({"Dry Bulb Temperature": np.arange(len(index)) % 1000}, index=index)
+        fig = create_2d_plot(df, "Dry Bulb Temperature", width=800)
+        self.assertLessEqual(len(fig.data[0].y), 1600)
+        self.assertEqual(max(fig.data[0].y), 999)
+        fig = create_2d_plot(df, "Dry Bulb Temperature", width=800, downsample=False)
+        self.assertEqual(len(fig.data[0].y), len(index))
+
+        x, y = downsample_series(df["Dry Bulb Temperature"], 800, ("2025-01-01", "2025-01-10"))
+        self.assertEqual(len(y), 9 * 24 + 1)
+        self.assertEqual(x[0], pd.Timestamp("2025-01-01"))
+
+        # zooming in updates the line with the points of the displayed range
+        update_downsampled_trace(
+            fig, df["Dry Bulb Temperature"], 800, ("2025-01-01 00:30", "2025-01-10")
+        )
+        self.assertEqual(len(fig.data[0].y), 9 * 24)
+        self.assertEqual(pd.Timestamp(fig.data[0].x[0]), pd.Timestamp("2025-01-01 01:00"))
+
+    def test_downsample_series_unsorted_index(self):
+        """Test zooming in on typical year files, whose index isn't sorted."""
+        index = pd.date_range("2020-01-01 01:00", periods=48, freq="h")
+        index = index[24:].append(index[:24])
+        series = pd.Series(np.arange(48.0), index=index)
+        x, y = downsample_series(series, 800, ("2020-01-01 10:30", "2020-01-02 03:30"))
+        self.assertEqual(list(y), [0.0, 1.0, 2.0] + list(range(34, 48)))
+        self.assertEqual(x[0], pd.Timestamp("2020-01-02 01:00"))
+
+    @unittest.skipUnless(importlib.util.find_spec("ipywidgets"), "requires ipywidgets")
+    def test_create_2d_plot_widget(self):
+        """Test that the widget is downsampled again when zooming in."""
+        index = pd.date_range("2020-01-01 01:00", "2030-01-01 00:00", freq="h")
+        df = pd.DataFrame({"Dry Bulb Temperature": np.arange(len(index)) % 1000}, index=index)
+        fig = create_2d_plot_widget(df, "Dry Bulb Temperature", width=800)
+        self.assertLessEqual(len(fig.data[0].y), 1600)
+        fig.layout.xaxis.range = ("2025-01-01", "2025-01-10")
+        self.assertEqual(len(fig.data[0].y), 9 * 24 + 1)
+
     def test_create_3d_plot(self):
         """Test creating a 3D plot."""
         df = read_epw_file(self.test_epw_path)
@@ -115,6 +192,87 @@ class TestEPWVisualization(unittest.TestCase):
         # Check that it's a surface plot
         self.assertEqual(fig.data[0].type, "surface")
 
+    def test_make_day_hour_grid(self):
+        """Test arranging values by day and hour, with missing hours."""
+        df = read_epw_file(self.test_epw_path)
+        series = df["Dry Bulb Temperature"]
+        dates, grid = make_day_hour_grid(series)
+        self.assertEqual(grid.shape, (2, 24))
+        self.assertEqual(list(dates.date), [date(2024, 1, 1), date(2024, 1, 2)])
+        np.testing.assert_array_equal(grid.ravel(), series.to_numpy())
+
+        # missing hours are NaN, later hours stay in place, and a partial last day is kept
+        dates, grid = make_day_hour_grid(series.drop(series.index[[3, 4]]).iloc[:-6])
+        self.assertEqual(grid.shape, (2, 24))
+        self.assertTrue(np.isnan(grid[0, [3, 4]]).all())
+        self.assertTrue(np.isnan(grid[1, 18:]).all())
+        np.testing.assert_array_equal(grid[1, :18], series.to_numpy()[24:42])
+
+        dates, grid = make_day_hour_grid(series, period="W")
+        self.assertEqual(grid.shape, (1, 24))
+        np.testing.assert_array_equal(grid[0], series.to_numpy().reshape(2, 24).mean(axis=0))
+
+        with self.assertRaises(ValueError):
+            make_day_hour_grid(series, period="M")
+
+    def test_make_day_hour_grid_mixed_years(self):
+        """Test that days of typical year files are kept in file order."""
+        # hour ending timestamps of a non-leap year, months alternating between 2 source years
+        hour_start = pd.date_range("2001-01-01", periods=8760, freq="h")
+        hour_end = hour_start + pd.Timedelta(hours=1)
+        year = np.where(hour_start.month % 2, 1995, 2008)
+        index = make_epw_datetime_index(
+            year, hour_start.month, hour_start.day, np.where(hour_end.hour == 0, 24, hour_end.hour)
+        )
+        values = np.arange(8760.0)
+        dates, grid = make_day_hour_grid(pd.Series(values, index=index))
+        self.assertEqual(grid.shape, (365, 24))
+        np.testing.assert_array_equal(grid.ravel(), values)
+        self.assertEqual(dates[0], pd.Timestamp("1995-01-01"))
+        self.assertEqual(dates[-1], pd.Timestamp("1995-12-31"))
+
+        # typical years with increasing source years
+        year = 1990 + hour_start.month
+        index = make_epw_datetime_index(
+            year, hour_start.month, hour_start.day, np.where(hour_end.hour == 0, 24, hour_end.hour)
+        )
+        _, grid = make_day_hour_grid(pd.Series(values, index=index))
+        np.testing.assert_array_equal(grid.ravel(), values)
+
+        df = pd.DataFrame({"Dry Bulb Temperature": values}, index=index)
+        self.assertEqual(np.shape(create_3d_plot(df, "Dry Bulb Temperature").data[0].z), (365, 24))
+
+    def test_create_3d_plot_multi_year(self):
+        """Test that multi-year data is plotted with weekly means."""
+        index = pd.date_range("2020-01-01 01:00", "2024-01-01 00:00", freq="h")
+        df = pd.DataFrame({"Dry Bulb Temperature": np.arange(len(index)) % 24}, index=index)
+        fig = create_3d_plot(df, "Dry Bulb Temperature")
+        self.assertEqual(np.shape(fig.data[0].z), (-(-len(index) // (24 * 7)), 24))
+        fig = create_3d_plot(df, "Dry Bulb Temperature", period="D")
+        self.assertEqual(np.shape(fig.data[0].z), (len(index) // 24, 24))
+
+    def test_create_heatmap_plot(self):
+        """Test creating a heatmap of the day by hour grid."""
+        df = read_epw_file(self.test_epw_path)
+        fig = create_heatmap_plot(df, "Dry Bulb Temperature")
+        self.assertEqual(len(fig.data), 1)
+        self.assertEqual(fig.data[0].type, "heatmap")
+        _, grid = make_day_hour_grid(df["Dry Bulb Temperature"])
+        np.testing.assert_array_equal(fig.data[0].z, grid.T)
+        self.assertEqual((fig.data[0].x0, fig.data[0].dx), ("2024-01-01", 24 * 3600 * 1000))
+
+    def test_create_heatmap_plot_multi_year(self):
+        """Test that multi-year heatmaps show rounded weekly means."""
+        index = pd.date_range("2020-01-01 01:00", "2024-01-01 00:00", freq="h")
+        df = pd.DataFrame({"Wind Speed": np.arange(len(index)) % 7 / 3}, index=index)
+        fig = create_heatmap_plot(df, "Wind Speed")
+        z = np.asarray(fig.data[0].z, dtype=float)
+        self.assertEqual(z.shape, (24, -(-len(index) // (24 * 7))))
+        _, grid = make_day_hour_grid(df["Wind Speed"], period="W")
+        np.testing.assert_array_equal(z, np.round(grid.T, HEATMAP_DECIMALS))
+        self.assertEqual(fig.data[0].dx, 7 * 24 * 3600 * 1000)
+        self.assertEqual(fig.layout.xaxis.title.text, "Week")
+
     def test_create_radar_plot(self):
         """Test creating a radar plot."""
         df = read_epw_file(self.test_epw_path)
@@ -129,6 +287,24 @@ class TestEPWVisualization(unittest.TestCase):
         # Check that it's a polar plot
         self.assertEqual(fig.data[0].type, "scatterpolargl")
 
+        # Daily min/max segments are grouped by color in a few traces
+        self.assertLessEqual(len(fig.data), RADAR_COLOR_BINS)
+        days = len(set(df.index.date))
+        r = np.concatenate([trace.r for trace in fig.data]).astype(float)
+        self.assertEqual(len(r), 3 * days)
+        self.assertEqual(np.isnan(r).sum(), days)
+        self.assertEqual(np.nanmax(r), df["Dry Bulb Temperature"].max())
+
+        # hover data: date, then numeric min/max on both ends of each segment, none on separators
+        customdata = np.concatenate([trace.customdata for trace in fig.data])
+        self.assertEqual(customdata.shape, (3 * days, 3))
+        ends = customdata[~np.isnan(r)]
+        self.assertTrue(all(isinstance(value, str) for value in ends[:, 0]))
+        self.assertTrue(all(isinstance(value, float) for value in ends[:, 1:].ravel()))
+        np.testing.assert_array_equal(ends[:, 1] <= ends[:, 2], True)
+        self.assertEqual(ends[:, 2].max(), df["Dry Bulb Temperature"].max())
+        self.assertTrue((customdata[np.isnan(r)] == None).all())  # noqa: E711
+
     def test_visualize_epw_2d(self):
         """Test the main visualize_epw function with 2D plot."""
         fig = visualize_epw(self.test_epw_path, plot_type="2D", show=False)
@@ -141,6 +317,11 @@ class TestEPWVisualization(unittest.TestCase):
         self.assertIsNotNone(fig)
         self.assertTrue(len(fig.data) > 0)
 
+    def test_visualize_epw_heatmap(self):
+        """Test the main visualize_epw function with heatmap plot."""
+        fig = visualize_epw(self.test_epw_path, plot_type="heatmap", show=False)
+        self.assertEqual(fig.data[0].type, "heatmap")
+
     def test_visualize_epw_radar(self):
         """Test the main visualize_epw function with radar plot."""
         fig = visualize_epw(self.test_epw_path, plot_type="radar", show=False)